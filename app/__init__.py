@@ -4,10 +4,18 @@ from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import redis
 
 from app.core.config import config
+from app.core import rate_limit  # registers the leased+redis limiter storage
+from app.core.admission import init_admission
+from app.core.metrics import init_metrics
+from app.core.profiler import init_profiler
+from app.core.redis_client import init_redis
+from app.core.revocation import init_revocation
+from app.core.singleflight import init_cache
 from app.database.base import init_db
+from app.database.timestamps import init_timestamps
+from app.services.storage import init_storage
 
 # Initialize extensions
 jwt = JWTManager()
@@ -17,12 +25,14 @@ limiter = Limiter(
     default_limits=["100 per hour"]
 )
 
-def create_app(config_name='default'):
+def create_app(config_name='default', test_config=None):
     """Create and configure the Flask application."""
     app = Flask(__name__)
     
     # Load configuration
     app.config.from_object(config[config_name])
+    if test_config:
+        app.config.update(test_config)
     config[config_name].init_app(app)
     
     # Initialize CORS
@@ -35,18 +45,37 @@ def create_app(config_name='default'):
     bcrypt.init_app(app)
     limiter.init_app(app)
     init_db(app)
+    init_timestamps(app)
+    init_storage(app)
     
-    # Initialize Redis connection
-    app.redis = redis.from_url(app.config['REDIS_URL'])
+    # Initialize Redis connection pool, read cache and metrics
+    init_redis(app)
+    init_cache(app)
+    init_metrics(app)
+    init_revocation(app, jwt)
+    init_admission(app)
+    init_profiler(app)
     
     # Register blueprints
     from app.api.routes.auth import auth_bp
     from app.api.routes.documents import documents_bp
     from app.api.routes.users import users_bp
+    from app.api.routes.health import health_bp
+    from app.api.routes.uploads import uploads_bp
+    from app.api.routes.profiler import profiler_bp
+    from app.api.routes.groups import groups_bp
     
+    app.register_blueprint(health_bp)
     app.register_blueprint(auth_bp, url_prefix=f"{app.config['API_PREFIX']}/auth")
     app.register_blueprint(documents_bp, url_prefix=f"{app.config['API_PREFIX']}/documents")
     app.register_blueprint(users_bp, url_prefix=f"{app.config['API_PREFIX']}/users")
+    app.register_blueprint(uploads_bp, url_prefix=f"{app.config['API_PREFIX']}/uploads")
+    app.register_blueprint(profiler_bp, url_prefix=f"{app.config['API_PREFIX']}/admin/profiler")
+    app.register_blueprint(groups_bp, url_prefix=f"{app.config['API_PREFIX']}/groups")
+    
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
     
     # Register error handlers
     register_error_handlers(app)
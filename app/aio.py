@@ -0,0 +1,383 @@
+"""aiohttp server for document uploads and downloads."""
+import asyncio
+import os
+import re
+import tempfile
+
+from aiohttp import web
+from flask_jwt_extended import decode_token, verify_jwt_in_request
+from marshmallow import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.utils import secure_filename
+
+from app import create_app
+from app.core.config import Config
+from app.core.security import log_activity
+from app.database.session import mark_sticky
+from app.database.sharding import DEFAULT_SHARD
+from app.models.document import Document
+from app.models.document_share import DocumentVisibility
+from app.models.user import User
+from app.schemas.document import DocumentSchema
+
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+documents = Document.__table__
+users = User.__table__
+visibility = DocumentVisibility.__table__
+
+def async_database_uri(uri):
+    """Swap a sync SQLAlchemy URI onto its asyncio driver."""
+    scheme, sep, rest = uri.partition('://')
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def allowed_file(filename):
+    """Check if the file extension is allowed."""
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+
+def json_error(message, status):
+    """Build a JSON error response matching the Flask API format."""
+    return web.json_response({'message': message}, status=status)
+
+async def authenticate(request):
+    """Decode the bearer token and return the caller's user row."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        raise web.HTTPUnauthorized(
+            text='{"message": "Missing Authorization Header"}',
+            content_type='application/json'
+        )
+
+    flask_app = request.app['flask_app']
+    try:
+        with flask_app.app_context():
+            claims = decode_token(header[len('Bearer '):])
+    except Exception:
+        raise web.HTTPUnauthorized(
+            text='{"message": "Invalid token"}',
+            content_type='application/json'
+        )
+    if claims.get('type') != 'access':
+        raise web.HTTPUnauthorized(
+            text='{"message": "Only access tokens are allowed"}',
+            content_type='application/json'
+        )
+
+    # Only Bloom filter hits need the (blocking) authoritative lookup
+    revocations = flask_app.extensions['revocation']
+    if revocations.might_be_revoked(claims['jti']):
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, revocations.is_revoked, claims['jti']):
+            raise web.HTTPUnauthorized(
+                text='{"message": "Token has been revoked"}',
+                content_type='application/json'
+            )
+
+    async with request.app['db'].connect() as conn:
+        result = await conn.execute(
+            select(users.c.id, users.c.role).where(
+                users.c.id == int(claims[flask_app.config.get('JWT_IDENTITY_CLAIM', 'sub')]),
+                users.c.is_active == True
+            )
+        )
+        user = result.first()
+    if user is None:
+        raise web.HTTPUnauthorized(
+            text='{"message": "User not found"}',
+            content_type='application/json'
+        )
+    return user
+
+async def upload_document(request):
+    """Create a document, streaming the file to disk without blocking the loop."""
+    user = await authenticate(request)
+    loop = asyncio.get_running_loop()
+    chunk_size = request.app['chunk_size']
+    max_size = request.app['flask_app'].config['MAX_CONTENT_LENGTH']
+
+    form = {}
+    stored = None
+    try:
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name != 'file':
+                form[part.name] = await part.text()
+                continue
+
+            if stored is not None or not part.filename or not allowed_file(part.filename):
+                if stored is not None:
+                    await loop.run_in_executor(None, _remove_quietly, stored[2])
+                return json_error('Invalid file type', 400)
+
+            # The schema needs document_type for the filename, so form
+            # fields must precede the file part as browsers send them.
+            try:
+                data = DocumentSchema().load(form)
+            except ValidationError as e:
+                return web.json_response(
+                    {'message': 'Validation error', 'errors': e.messages},
+                    status=422
+                )
+
+            filename = Document.build_filename(user.id, data['document_type'], part.filename)
+            # Spool next to the upload folder; local backends then just rename it
+            upload_folder = request.app['flask_app'].config['UPLOAD_FOLDER']
+            fd, path = tempfile.mkstemp(dir=upload_folder, prefix='.upload-')
+            stored = (data, filename, path, part.headers.get('Content-Type', 'application/octet-stream'))
+            size = 0
+            with os.fdopen(fd, 'wb') as fh:
+                while True:
+                    chunk = await part.read_chunk(chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        break
+                    await loop.run_in_executor(None, fh.write, chunk)
+            if size > max_size:
+                break
+    except Exception:
+        if stored is not None:
+            await loop.run_in_executor(None, _remove_quietly, stored[2])
+        raise
+
+    if stored is None:
+        return json_error('No file provided', 400)
+
+    data, filename, path, mime_type = stored
+    if size > max_size:
+        await loop.run_in_executor(None, _remove_quietly, path)
+        return json_error('File too large', 413)
+
+    storage = request.app['storage']
+    try:
+        size = await loop.run_in_executor(None, storage.save_path, filename, path)
+    finally:
+        await loop.run_in_executor(None, _remove_quietly, path)
+
+    values = dict(
+        data,
+        owner_id=user.id,
+        file_path=filename,
+        file_size=size,
+        mime_type=mime_type,
+        file_type=os.path.splitext(filename)[1][1:].lower()
+    )
+    # The row is tiny next to the transfer; insert it through the ORM in a
+    # thread so the model hooks (lineage, facets, metadata index, cache
+    # invalidation) run exactly as they do for the Flask endpoint.
+    document = await loop.run_in_executor(None, _save_document, request.app['flask_app'], values)
+
+    await loop.run_in_executor(
+        None, _log_activity, request.app['flask_app'], _activity_request(request), 'document_create', 201
+    )
+    document['download_url'] = f"/api/v1/documents/{document['id']}/download"
+    response = web.json_response({
+        'message': 'Document created successfully',
+        'document': document
+    }, status=201)
+    # Read-your-writes for the Flask API's replica routing
+    flask_app = request.app['flask_app']
+    if flask_app.extensions.get('replica_router') is not None:
+        with flask_app.app_context():
+            mark_sticky(response, f'user:{user.id}')
+    return response
+
+def _activity_request(request):
+    """Capture what the activity log reads from a request, for use off the loop."""
+    return {
+        'path': request.path,
+        'method': request.method,
+        'headers': {
+            name: request.headers[name] for name in ('Authorization', 'User-Agent') if name in request.headers
+        },
+        'environ_base': {'REMOTE_ADDR': request.remote}
+    }
+
+def _log_activity(flask_app, activity_request, action, status, view_args=None):
+    # The same log_activity the Flask routes are decorated with, as this caller
+    with flask_app.test_request_context(**activity_request):
+        verify_jwt_in_request()
+        log_activity(action)(lambda **kwargs: flask_app.response_class(status=status))(**(view_args or {}))
+
+def _save_document(flask_app, values):
+    with flask_app.app_context():
+        document = Document(**values).save()
+        return DocumentSchema().dump(document)
+
+async def download_document(request):
+    """Serve a document file using the loop's non-blocking sendfile."""
+    user = await authenticate(request)
+    document_id = int(request.match_info['document_id'])
+
+    loop = asyncio.get_running_loop()
+    shards = await loop.run_in_executor(None, _document_shards, request.app['flask_app'], document_id)
+    document = None
+    for shard_id in shards:
+        async with request.app['document_dbs'][shard_id].connect() as conn:
+            result = await conn.execute(
+                select(
+                    documents.c.owner_id,
+                    documents.c.access_level,
+                    documents.c.title,
+                    documents.c.file_path,
+                    documents.c.file_type,
+                    documents.c.mime_type
+                ).where(documents.c.id == document_id, documents.c.is_active == True)
+            )
+            document = result.first()
+        if document is not None:
+            break
+
+    if document is None:
+        return json_error('Document not found', 404)
+    if document.owner_id != user.id and user.role != 'admin' and document.access_level != 'public':
+        if document.access_level != 'shared' or not await _is_shared_with(request.app, user.id, document_id):
+            return json_error('Access denied', 403)
+
+    storage = request.app['storage']
+    if not await loop.run_in_executor(None, storage.exists, document.file_path):
+        return json_error('Document file not found', 404)
+
+    safe_title = re.sub(r'[^\w\-\.]', '_', document.title)
+    download_name = secure_filename(f"{safe_title}.{document.file_type}")
+    headers = {
+        'Content-Type': document.mime_type,
+        'Content-Disposition': f'attachment; filename="{download_name}"'
+    }
+
+    await loop.run_in_executor(
+        None, _log_activity, request.app['flask_app'], _activity_request(request), 'document_download', 200,
+        {'document_id': document_id}
+    )
+    # Reads the file's header when compression is configured
+    path = await loop.run_in_executor(None, storage.local_path, document.file_path)
+    if path is not None:
+        return web.FileResponse(path, chunk_size=request.app['chunk_size'], headers=headers)
+    return await stream_file(request, storage, document.file_path, headers)
+
+async def _is_shared_with(app, user_id, document_id):
+    # The visibility index is on the primary, even when documents are sharded
+    async with app['db'].connect() as conn:
+        result = await conn.execute(
+            select(visibility.c.document_id).where(
+                visibility.c.viewer_id == user_id,
+                visibility.c.document_id == document_id
+            )
+        )
+        return result.first() is not None
+
+def _document_shards(flask_app, document_id):
+    # The shard map may need a (blocking) refresh from the primary
+    with flask_app.app_context():
+        sharding = flask_app.extensions.get('sharding')
+        if sharding is None:
+            return [DEFAULT_SHARD]
+        return sharding.shards_for_ids([document_id])
+
+def _byte_range(requested, size):
+    """Resolve a parsed Range header against a file size.
+
+    Returns (start, stop), or None if the range cannot be satisfied.
+    """
+    start, stop = requested.start, requested.stop
+    if start is None:
+        start = 0
+    elif start < 0:
+        start, stop = max(size + start, 0), size
+    stop = size if stop is None else min(stop, size)
+    if start >= stop:
+        return None
+    return start, stop
+
+async def stream_file(request, storage, key, headers):
+    """Stream a file from a non-local backend, reading off the event loop.
+
+    A single byte range is honoured by seeking, so for encrypted files only
+    the segments covering it are fetched and decrypted.
+    """
+    loop = asyncio.get_running_loop()
+    chunk_size = request.app['chunk_size']
+    fh = await loop.run_in_executor(None, storage.open, key)
+    try:
+        size = await loop.run_in_executor(None, fh.seek, 0, os.SEEK_END)
+        start, stop, status = 0, size, 200
+        try:
+            requested = request.http_range
+        except ValueError:
+            requested = slice(None, None)
+        if requested.start is not None or requested.stop is not None:
+            resolved = _byte_range(requested, size)
+            if resolved is None:
+                return web.Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+            (start, stop), status = resolved, 206
+            headers = {**headers, 'Content-Range': f'bytes {start}-{stop - 1}/{size}'}
+        await loop.run_in_executor(None, fh.seek, start)
+
+        response = web.StreamResponse(status=status, headers={**headers, 'Accept-Ranges': 'bytes'})
+        response.content_length = stop - start
+        await response.prepare(request)
+        remaining = stop - start
+        while remaining:
+            chunk = await loop.run_in_executor(None, fh.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            await response.write(chunk)
+            remaining -= len(chunk)
+        await response.write_eof()
+        return response
+    finally:
+        await loop.run_in_executor(None, fh.close)
+
+def _remove_quietly(path):
+    """Remove a partially written upload."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+async def _dispose_engine(app):
+    await app['db'].dispose()
+    for engine in app['document_dbs'].values():
+        if engine is not app['db']:
+            await engine.dispose()
+
+def _async_engine(flask_app, uri):
+    database_uri = async_database_uri(uri)
+    engine_options = {'pool_pre_ping': True}
+    if not database_uri.startswith('sqlite'):
+        engine_options.update(
+            pool_size=flask_app.config['ASYNC_DB_POOL_SIZE'],
+            pool_recycle=flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_recycle', 3600)
+        )
+    return create_async_engine(database_uri, **engine_options)
+
+def create_aio_app(config_name='default', test_config=None):
+    """Create the aiohttp application serving the document file endpoints."""
+    flask_app = create_app(config_name, test_config)
+    prefix = f"{flask_app.config['API_PREFIX']}/documents"
+
+    app = web.Application(client_max_size=flask_app.config['MAX_CONTENT_LENGTH'])
+    app['flask_app'] = flask_app
+    app['chunk_size'] = flask_app.config['ASYNC_FILE_CHUNK_SIZE']
+    app['storage'] = flask_app.extensions['storage']
+    # Uploads are spooled here before the storage backend takes them
+    os.makedirs(flask_app.config['UPLOAD_FOLDER'], mode=0o750, exist_ok=True)
+
+    app['db'] = _async_engine(flask_app, flask_app.config['SQLALCHEMY_DATABASE_URI'])
+    # Where documents rows live: the primary, or one engine per shard
+    shards = flask_app.config.get('SQLALCHEMY_SHARDS') or {}
+    app['document_dbs'] = {
+        name: _async_engine(flask_app, uri) for name, uri in shards.items()
+    } or {DEFAULT_SHARD: app['db']}
+    app.on_cleanup.append(_dispose_engine)
+
+    app.router.add_post(prefix, upload_document)
+    app.router.add_get(prefix + '/{document_id:\\d+}/download', download_document)
+    return app
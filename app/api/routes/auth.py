@@ -1,15 +1,18 @@
-from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import (
     jwt_required,
+    get_jwt,
     get_jwt_identity,
-    create_access_token
+    create_access_token,
+    decode_token
 )
 from marshmallow import ValidationError
+import redis
 
 from app.models.user import User
 from app.schemas.user import UserSchema, LoginSchema, TokenSchema
 from app.core.security import create_tokens, log_activity
+from app.database.timestamps import touch
 from app import limiter
 
 auth_bp = Blueprint('auth', __name__)
@@ -54,9 +57,8 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'message': 'Invalid credentials'}), 401
 
-    # Update last login
-    user.last_login = datetime.utcnow()
-    user.save()
+    # Update last login; written in a batch rather than committed here
+    touch(user, 'last_login')
 
     # Generate tokens
     tokens = create_tokens(user.id)
@@ -86,6 +88,32 @@ def refresh():
         'expires_in': current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
     })
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoke the presented token and, if given, the matching refresh token."""
+    claims = get_jwt()
+    revoke = [claims]
+
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if refresh_token:
+        try:
+            refresh_claims = decode_token(refresh_token)
+        except Exception:
+            return jsonify({'message': 'Invalid refresh token'}), 422
+        if refresh_claims.get('type') != 'refresh' or refresh_claims['sub'] != claims['sub']:
+            return jsonify({'message': 'Invalid refresh token'}), 422
+        revoke.append(refresh_claims)
+
+    revocations = current_app.extensions['revocation']
+    try:
+        for token in revoke:
+            revocations.revoke(token['jti'], token['exp'])
+    except redis.RedisError:
+        return jsonify({'message': 'Could not revoke token, try again'}), 503
+
+    return jsonify({'message': 'Logged out successfully'})
+
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 @log_activity('profile_view')
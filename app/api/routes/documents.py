@@ -1,18 +1,30 @@
-import os
-from flask import Blueprint, request, jsonify, send_file, current_app
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, stream_with_context, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 from werkzeug.utils import secure_filename
+import os
 import re
 
+from app.database.base import db
 from app.models.document import Document
+from app.models.document_share import DocumentShare, DocumentVisibility
+from app.models.group import Group
 from app.models.recent_view import RecentView
+from app.models.user import User
 from app.schemas.document import (
     DocumentSchema,
     DocumentUpdateSchema,
-    DocumentSearchSchema
+    DocumentSearchSchema,
+    DocumentArchiveSchema,
+    DocumentContentSchema,
+    DocumentShareSchema
 )
 from app.core.security import document_access_required, log_activity
+from app.services.archive import stream_archive
+from app.services.document_cache import get_document_payload, get_search_ids, normalize_query
+from app.services.download_links import accel_redirect_uri, sign_download, verify_download
+from app.services.storage import get_storage
 from app.core.config import Config
 
 documents_bp = Blueprint('documents', __name__)
@@ -22,6 +34,16 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+def _pagination(pagination):
+    return {
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev
+    }
+
 @documents_bp.route('', methods=['POST'])
 @jwt_required()
 @log_activity('document_create')
@@ -64,27 +86,56 @@ def list_documents():
         return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
 
     current_user_id = get_jwt_identity()
+    if params['scope'] != 'owned':
+        # Other users' documents come from the visibility index
+        pagination = DocumentVisibility.visible_ids(
+            current_user_id,
+            shared_only=params['scope'] == 'shared',
+            document_type=params.get('document_type'),
+            latest_only=params.get('latest_only', False),
+            page=params.get('page', 1),
+            per_page=params.get('per_page', Config.DEFAULT_PAGE_SIZE)
+        )
+        return jsonify({
+            'documents': DocumentSchema(many=True).dump(Document.get_many(list(pagination.items))),
+            'pagination': _pagination(pagination)
+        })
+
+    params['query'] = normalize_query(params.get('query'))
+    search = {
+        'query': params['query'],
+        'user_id': current_user_id,
+        'document_type': params.get('document_type'),
+        'include_content': params.get('include_content', False),
+        'metadata_filters': params.get('metadata_filters'),
+        'latest_only': params.get('latest_only', False)
+    }
     
-    # Get paginated documents
-    pagination = Document.search(
-        query=params.get('query'),
-        user_id=current_user_id,
-        document_type=params.get('document_type'),
-        page=params.get('page', 1),
-        per_page=params.get('per_page', Config.DEFAULT_PAGE_SIZE)
-    )
+    def load():
+        # Get a page of matching ids
+        pagination = Document.search_ids(
+            page=params.get('page', 1),
+            per_page=params.get('per_page', Config.DEFAULT_PAGE_SIZE),
+            **search
+        )
 
-    return jsonify({
-        'documents': DocumentSchema(many=True).dump(pagination.items),
-        'pagination': {
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
+        results = {
+            'ids': list(pagination.items),
+            'pagination': _pagination(pagination)
         }
-    })
+        if params.get('facets'):
+            results['facets'] = Document.facet_counts(**search)
+        return results
+
+    results = get_search_ids(current_user_id, params, load)
+    documents = Document.get_many(results['ids'], owner_id=current_user_id)
+    response = {
+        'documents': DocumentSchema(many=True).dump(documents),
+        'pagination': results['pagination']
+    }
+    if 'facets' in results:
+        response['facets'] = results['facets']
+    return jsonify(response)
 
 @documents_bp.route('/<int:document_id>', methods=['GET'])
 @jwt_required()
@@ -92,8 +143,13 @@ def list_documents():
 @log_activity('document_view')
 def get_document(document_id):
     """Get a specific document."""
-    document = Document.get_by_id(document_id)
-    if not document:
+    def load():
+        document = Document.get_by_id(document_id)
+        return DocumentSchema().dump(document) if document else None
+
+    # Concurrent requests for a hot document share one load and serialization
+    payload = get_document_payload(document_id, load)
+    if payload is None:
         return jsonify({'message': 'Document not found'}), 404
 
     current_user_id = get_jwt_identity()
@@ -101,7 +157,7 @@ def get_document(document_id):
     # Record view
     RecentView.add_view(current_user_id, document_id)
 
-    return jsonify(DocumentSchema().dump(document))
+    return jsonify(payload)
 
 @documents_bp.route('/<int:document_id>', methods=['PUT'])
 @jwt_required()
@@ -138,8 +194,8 @@ def delete_document(document_id):
 
     # Delete file
     try:
-        os.remove(document.get_full_path())
-    except OSError:
+        document.delete_file()
+    except Exception:
         current_app.logger.warning(f"Could not delete file for document {document_id}")
 
     # Delete document
@@ -147,6 +203,54 @@ def delete_document(document_id):
 
     return jsonify({'message': 'Document deleted successfully'})
 
+def _send_document_file(file_path, title, file_type, mime_type, accel=False):
+    """Respond with a stored file as an attachment named after the document.
+
+    With accel, a file on local disk is left to nginx (X-Accel-Redirect).
+    """
+    storage = get_storage()
+    try:
+        # Sanitize the original title
+        safe_title = re.sub(r'[^\w\-\.]', '_', title)
+        download_name = secure_filename(f"{safe_title}.{file_type}")
+
+        path = storage.local_path(file_path)
+        uri = accel_redirect_uri(path) if accel else None
+        if uri:
+            if not storage.exists(file_path):
+                return jsonify({'message': 'Document file not found'}), 404
+            # nginx keeps these headers and serves the body, ranges included
+            response = Response(mimetype=mime_type)
+            response.headers['X-Accel-Redirect'] = uri
+            response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+            return response
+
+        # Local plaintext files go through send_file's sendfile path
+        if path:
+            return send_file(
+                path,
+                mimetype=mime_type,
+                as_attachment=True,
+                download_name=download_name
+            )
+
+        # Other backends and encrypted files stream; a Range request seeks, so
+        # only the encrypted segments it covers are fetched and decrypted
+        fh = storage.open(file_path)
+        size = fh.seek(0, os.SEEK_END)
+        fh.seek(0)
+        response = send_file(
+            fh,
+            mimetype=mime_type,
+            as_attachment=True,
+            download_name=download_name,
+            conditional=False
+        )
+        response.content_length = size
+        return response.make_conditional(request, accept_ranges=True, complete_length=size)
+    except FileNotFoundError:
+        return jsonify({'message': 'Document file not found'}), 404
+
 @documents_bp.route('/<int:document_id>/download', methods=['GET'])
 @jwt_required()
 @document_access_required
@@ -157,19 +261,144 @@ def download_document(document_id):
     if not document:
         return jsonify({'message': 'Document not found'}), 404
 
+    return _send_document_file(document.file_path, document.title, document.file_type, document.mime_type)
+
+@documents_bp.route('/<int:document_id>/download-url', methods=['POST'])
+@jwt_required()
+@document_access_required
+@log_activity('document_download_url')
+def create_download_url(document_id):
+    """Issue a short-lived signed link that downloads a document without a token."""
+    document = Document.get_by_id(document_id)
+    if not document or not document.is_active:
+        return jsonify({'message': 'Document not found'}), 404
+
+    link = sign_download(document_id, int(get_jwt_identity()))
+    return jsonify({
+        'url': url_for('documents.download_signed', document_id=document_id, **link),
+        'expires_at': datetime.utcfromtimestamp(link['expires']).isoformat() + 'Z'
+    }), 201
+
+@documents_bp.route('/<int:document_id>/file', methods=['GET'])
+@log_activity('document_download')
+def download_signed(document_id):
+    """Download a document file with a signed link from create_download_url.
+
+    No JWT or access check: the signature stands for the check made when the
+    link was issued. The file itself is sent by nginx when it can be.
+    """
+    user_id = request.args.get('user', type=int)
+    expires = request.args.get('expires', type=int)
+    if user_id is None or expires is None or \
+            not verify_download(document_id, user_id, expires, request.args.get('signature')):
+        return jsonify({'message': 'Invalid or expired download link'}), 403
+
+    def load():
+        document = Document.get_by_id(document_id)
+        return DocumentSchema().dump(document) if document else None
+
+    # Usually served from the document cache, without a database read
+    payload = get_document_payload(document_id, load)
+    if payload is None or not payload.get('is_active', True):
+        return jsonify({'message': 'Document not found'}), 404
+
+    return _send_document_file(
+        payload['file_path'], payload['title'], payload['file_type'], payload['mime_type'], accel=True
+    )
+
+@documents_bp.route('/archive', methods=['POST'])
+@jwt_required()
+@log_activity('document_archive')
+def download_archive():
+    """Download many documents as one zip archive, streamed as it is built.
+
+    Takes either ``ids`` or the listing's search filters (plus ``date_from``,
+    ``date_to`` and, for admins, ``owner_id``). Access is checked for the
+    whole set in one query.
+    """
     try:
-        # Sanitize the original title
-        safe_title = re.sub(r'[^\w\-\.]', '_', document.title)
-        download_name = secure_filename(f"{safe_title}.{document.file_type}")
-        
-        return send_file(
-            document.get_full_path(),
-            mimetype=document.mime_type,
-            as_attachment=True,
-            download_name=download_name
+        params = DocumentArchiveSchema().load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    user = User.get_by_id(get_jwt_identity())
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    statement = db.select(
+        Document.id,
+        Document.title,
+        Document.file_type,
+        Document.file_path,
+        Document.file_size,
+        Document.created_at
+    ).where(Document.access_filter(user)).order_by(Document.id)
+    limit = current_app.config['ARCHIVE_MAX_DOCUMENTS']
+
+    if 'ids' in params:
+        ids = set(params['ids'])
+        documents = db.session.execute(
+            statement.where(Document.id.in_(ids), Document.is_active == True)
+        ).all()
+        missing = ids - {document.id for document in documents}
+        if missing:
+            return jsonify({'message': 'Documents not found', 'document_ids': sorted(missing)}), 404
+    else:
+        filters = Document.search_filters(
+            query=params.get('query'),
+            user_id=params.get('owner_id', user.id),
+            document_type=params.get('document_type'),
+            include_content=params.get('include_content', False),
+            metadata_filters=params.get('metadata_filters'),
+            latest_only=params.get('latest_only', False),
+            date_from=params.get('date_from'),
+            date_to=params.get('date_to')
         )
-    except FileNotFoundError:
-        return jsonify({'message': 'Document file not found'}), 404
+        documents = db.session.execute(statement.where(*filters).limit(limit + 1)).all()
+        if not documents:
+            return jsonify({'message': 'No documents match'}), 404
+        if len(documents) > limit:
+            return jsonify({'message': f'More than {limit} documents match, narrow the filters'}), 422
+
+    # Streaming can take minutes; do not hold a database connection for it
+    db.session.close()
+
+    response = Response(stream_with_context(stream_archive(documents)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="documents-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"'
+    # Let nginx pass chunks through instead of buffering the archive
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@documents_bp.route('/<int:document_id>/history', methods=['GET'])
+@jwt_required()
+@document_access_required
+def get_document_history(document_id):
+    """Get every version of a document, newest first."""
+    document = Document.get_by_id(document_id)
+    if not document:
+        return jsonify({'message': 'Document not found'}), 404
+
+    versions = [version for version in document.get_history() if version.is_active]
+
+    return jsonify({
+        'root_id': document.root_id or document.id,
+        'versions': DocumentSchema(many=True).dump(versions)
+    })
+
+@documents_bp.route('/<int:document_id>/content', methods=['GET'])
+@jwt_required()
+@document_access_required
+def get_document_content(document_id):
+    """Get text and fields extracted from a document file."""
+    document = Document.get_by_id(document_id)
+    if not document:
+        return jsonify({'message': 'Document not found'}), 404
+
+    if document.content is None:
+        return jsonify({'message': 'Content not extracted yet', 'status': 'pending'}), 202
+
+    return jsonify(DocumentContentSchema().dump(document.content))
 
 @documents_bp.route('/recent', methods=['GET'])
 @jwt_required()
@@ -182,4 +411,91 @@ def get_recent_documents():
     
     return jsonify({
         'documents': DocumentSchema(many=True).dump(documents)
-    }) 
\ No newline at end of file
+    })
+
+def _shareable_document(document_id):
+    """Return (user, document, error) for a document the caller may share."""
+    user = User.get_by_id(get_jwt_identity())
+    if not user:
+        return None, None, (jsonify({'message': 'User not found'}), 404)
+    document = Document.get_by_id(document_id)
+    if not document or not document.is_active:
+        return user, None, (jsonify({'message': 'Document not found'}), 404)
+    if document.owner_id != user.id and not user.is_admin:
+        return user, None, (jsonify({'message': 'Access denied'}), 403)
+    return user, document, None
+
+@documents_bp.route('/<int:document_id>/shares', methods=['GET'])
+@jwt_required()
+def list_document_shares(document_id):
+    """List the users and groups a document is shared with."""
+    _, document, error = _shareable_document(document_id)
+    if error:
+        return error
+
+    return jsonify({
+        'access_level': document.access_level,
+        'shares': DocumentShareSchema(many=True).dump(DocumentShare.for_document(document_id))
+    })
+
+@documents_bp.route('/<int:document_id>/shares', methods=['POST'])
+@jwt_required()
+@log_activity('document_share')
+def share_document(document_id):
+    """Grant a user or a group read access to a document.
+
+    A private document becomes 'shared'. Grants on a document that is later
+    made private are kept, but hidden until it is shared again.
+    """
+    try:
+        data = DocumentShareSchema().load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    user, document, error = _shareable_document(document_id)
+    if error:
+        return error
+
+    user_id, group_id = data.get('grantee_user_id'), data.get('grantee_group_id')
+    if user_id is not None:
+        if user_id == document.owner_id:
+            return jsonify({'message': 'Cannot share a document with its owner'}), 400
+        if not User.get_by_id(user_id):
+            return jsonify({'message': 'User not found'}), 404
+    elif not Group.get_by_id(group_id):
+        return jsonify({'message': 'Group not found'}), 404
+    if DocumentShare.find(document_id, user_id=user_id, group_id=group_id):
+        return jsonify({'message': 'Document is already shared with this grantee'}), 409
+
+    share = DocumentShare(
+        document_id=document_id,
+        grantee_user_id=user_id,
+        grantee_group_id=group_id,
+        granted_by=user.id
+    )
+    db.session.add(share)
+    if document.access_level in (None, 'private'):
+        document.access_level = 'shared'
+    # Both writes and the visibility index commit together
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Document shared successfully',
+        'share': DocumentShareSchema().dump(share)
+    }), 201
+
+@documents_bp.route('/<int:document_id>/shares/<int:share_id>', methods=['DELETE'])
+@jwt_required()
+@log_activity('document_unshare')
+def unshare_document(document_id, share_id):
+    """Revoke a grant."""
+    _, _, error = _shareable_document(document_id)
+    if error:
+        return error
+
+    share = DocumentShare.get_by_id(share_id)
+    if not share or share.document_id != document_id:
+        return jsonify({'message': 'Share not found'}), 404
+    share.delete()
+
+    return jsonify({'message': 'Share revoked successfully'})
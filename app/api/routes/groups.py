@@ -0,0 +1,110 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+
+from app.database.base import db
+from app.models.group import Group, GroupMember
+from app.models.user import User
+from app.schemas.group import GroupSchema, GroupMemberSchema
+from app.core.security import log_activity
+
+groups_bp = Blueprint('groups', __name__)
+
+def _managed_group(group_id):
+    """Return (group, error) for a group the caller may change."""
+    user = User.get_by_id(get_jwt_identity())
+    if not user:
+        return None, (jsonify({'message': 'User not found'}), 404)
+    group = Group.get_by_id(group_id)
+    if not group:
+        return None, (jsonify({'message': 'Group not found'}), 404)
+    if not group.can_manage(user):
+        return None, (jsonify({'message': 'Access denied'}), 403)
+    return group, None
+
+@groups_bp.route('', methods=['GET'])
+@jwt_required()
+def list_groups():
+    """List groups the current user created or belongs to."""
+    groups = Group.for_user(get_jwt_identity())
+    return jsonify({'groups': GroupSchema(many=True).dump(groups)})
+
+@groups_bp.route('', methods=['POST'])
+@jwt_required()
+@log_activity('group_create')
+def create_group():
+    """Create a group, with its creator as the first member."""
+    try:
+        data = GroupSchema().load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    user = User.get_by_id(get_jwt_identity())
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+    if Group.query.filter_by(created_by=user.id, name=data['name']).first():
+        return jsonify({'message': 'You already have a group with this name'}), 409
+
+    group = Group(name=data['name'], created_by=user.id)
+    group.members.append(GroupMember(user_id=user.id))
+    group.save()
+
+    return jsonify({
+        'message': 'Group created successfully',
+        'group': GroupSchema().dump(group)
+    }), 201
+
+@groups_bp.route('/<int:group_id>', methods=['DELETE'])
+@jwt_required()
+@log_activity('group_delete')
+def delete_group(group_id):
+    """Delete a group, revoking every share made to it."""
+    group, error = _managed_group(group_id)
+    if error:
+        return error
+
+    group.delete()
+    return jsonify({'message': 'Group deleted successfully'})
+
+@groups_bp.route('/<int:group_id>/members', methods=['POST'])
+@jwt_required()
+@log_activity('group_member_add')
+def add_group_member(group_id):
+    """Add a user to a group; they can see documents shared with it."""
+    try:
+        data = GroupMemberSchema().load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    group, error = _managed_group(group_id)
+    if error:
+        return error
+    if not User.get_by_id(data['user_id']):
+        return jsonify({'message': 'User not found'}), 404
+    if db.session.get(GroupMember, (group_id, data['user_id'])):
+        return jsonify({'message': 'User is already a member'}), 409
+
+    db.session.add(GroupMember(group_id=group_id, user_id=data['user_id']))
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Member added successfully',
+        'group': GroupSchema().dump(group)
+    }), 201
+
+@groups_bp.route('/<int:group_id>/members/<int:user_id>', methods=['DELETE'])
+@jwt_required()
+@log_activity('group_member_remove')
+def remove_group_member(group_id, user_id):
+    """Remove a user from a group."""
+    group, error = _managed_group(group_id)
+    if error:
+        return error
+
+    member = db.session.get(GroupMember, (group_id, user_id))
+    if not member:
+        return jsonify({'message': 'Member not found'}), 404
+    db.session.delete(member)
+    db.session.commit()
+
+    return jsonify({'message': 'Member removed successfully'})
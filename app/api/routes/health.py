@@ -0,0 +1,15 @@
+from flask import Blueprint, jsonify, current_app
+
+from app import limiter
+from app.core.admission import priority
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/health', methods=['GET'])
+@limiter.exempt
+@priority
+def health():
+    """Report whether this worker has finished warming up."""
+    if not current_app.config.get('WARMED_UP', True):
+        return jsonify({'status': 'starting'}), 503
+    return jsonify({'status': 'ok'})
\ No newline at end of file
@@ -0,0 +1,60 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+
+from app.core.admission import priority
+from app.core.security import admin_required, log_activity
+from app.schemas.profiler import ProfileStartSchema
+
+profiler_bp = Blueprint('profiler', __name__)
+
+def _profiler():
+    return current_app.extensions.get('profiler')
+
+@profiler_bp.route('', methods=['POST'])
+@priority
+@jwt_required()
+@admin_required()
+@log_activity('profiler_start')
+def start_profile():
+    """Start sampling every worker for a time window (admin only)."""
+    profiler = _profiler()
+    if profiler is None:
+        return jsonify({'message': 'Profiler is disabled'}), 404
+
+    try:
+        params = ProfileStartSchema().load(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    profile = profiler.start(params['duration'], params['interval'])
+    if profile is None:
+        return jsonify({'message': 'A profile is already running'}), 409
+
+    return jsonify({
+        'message': 'Profile started',
+        'profile': profile,
+        'results_url': f"{request.base_url}/{profile['id']}"
+    }), 202
+
+@profiler_bp.route('/<profile_id>', methods=['GET'])
+@priority
+@jwt_required()
+@admin_required()
+def get_profile(profile_id):
+    """Return a finished profile as collapsed stacks, optionally for one route (admin only)."""
+    profiler = _profiler()
+    if profiler is None:
+        return jsonify({'message': 'Profiler is disabled'}), 404
+
+    profile = profiler.profile(profile_id)
+    if profile is None:
+        return jsonify({'message': 'Profile not found'}), 404
+    if profiler.is_running(profile):
+        response = jsonify({'message': 'Profile is still running', 'profile': profile})
+        response.status_code = 202
+        response.headers['Retry-After'] = str(profiler.seconds_left(profile))
+        return response
+
+    stacks = profiler.results(profile_id, route=request.args.get('route'))
+    return Response(stacks, mimetype='text/plain')
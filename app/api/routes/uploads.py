@@ -0,0 +1,199 @@
+import re
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+
+from app import limiter
+from app.api.routes.documents import allowed_file
+from app.database.base import db
+from app.models.document import Document
+from app.models.upload_session import UploadSession
+from app.schemas.document import DocumentSchema
+from app.schemas.upload import UploadSessionCreateSchema
+from app.core.security import log_activity
+from app.services.uploads import (
+    ChunkError,
+    SpooledUpload,
+    create_partial,
+    discard_partial,
+    file_sha256,
+    partial_path,
+    write_chunk
+)
+
+uploads_bp = Blueprint('uploads', __name__)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+def _upload_response(upload, status=200):
+    data = upload.to_dict()
+    data['chunk_size'] = current_app.config['UPLOAD_CHUNK_SIZE']
+    return jsonify(data), status
+
+@uploads_bp.route('', methods=['POST'])
+@jwt_required()
+def create_upload():
+    """Start a resumable upload for a new document or a new version."""
+    payload = request.get_json() or {}
+    upload_keys = set(UploadSessionCreateSchema().fields)
+    try:
+        params = UploadSessionCreateSchema().load(
+            {key: value for key, value in payload.items() if key in upload_keys}
+        )
+        document_fields = {key: value for key, value in payload.items() if key not in upload_keys}
+        if 'document_id' not in params:
+            DocumentSchema().load(document_fields)
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    if not allowed_file(params['filename']):
+        return jsonify({'message': 'Invalid file type'}), 400
+
+    current_user_id = get_jwt_identity()
+    if 'document_id' in params:
+        parent = Document.get_by_id(params['document_id'])
+        if not parent or not parent.is_active:
+            return jsonify({'message': 'Document not found'}), 404
+        if str(parent.owner_id) != str(current_user_id):
+            return jsonify({'message': 'Access denied'}), 403
+        document_fields = None
+
+    upload = UploadSession(
+        owner_id=current_user_id,
+        parent_document_id=params.get('document_id'),
+        filename=params['filename'],
+        mime_type=params.get('mime_type') or 'application/octet-stream',
+        total_size=params['total_size'],
+        sha256=params.get('sha256'),
+        document_fields=document_fields,
+        received_ranges=[],
+        expires_at=datetime.utcnow() + current_app.config['UPLOAD_SESSION_TTL']
+    )
+    create_partial(upload.id, upload.total_size)
+    upload.save()
+
+    return _upload_response(upload, 201)
+
+@uploads_bp.route('/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Get the progress of an upload, e.g. to resume after a dropped connection."""
+    upload = UploadSession.get_for_owner(upload_id, get_jwt_identity())
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    return _upload_response(upload)
+
+@uploads_bp.route('/<upload_id>', methods=['PUT'])
+@jwt_required()
+@limiter.limit("1000 per hour")
+def upload_chunk(upload_id):
+    """Write one chunk at the offset given by its Content-Range header.
+
+    Send ``Content-Range: bytes <first>-<last>/<total>`` and optionally
+    ``X-Chunk-SHA256`` with the hex digest of the chunk.
+    """
+    current_user_id = get_jwt_identity()
+    upload = UploadSession.get_for_owner(upload_id, current_user_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    if upload.status != 'uploading':
+        return jsonify({'message': 'Upload already completed'}), 409
+    if upload.is_expired:
+        return jsonify({'message': 'Upload expired'}), 410
+
+    match = CONTENT_RANGE_RE.match(request.headers.get('Content-Range', ''))
+    if not match:
+        return jsonify({'message': 'Content-Range header must be "bytes <first>-<last>/<total>"'}), 400
+    start, last, total = (int(value) for value in match.groups())
+    length = last - start + 1
+    if total != upload.total_size or last >= total or length < 1:
+        return jsonify({'message': 'Content-Range does not fit the upload'}), 416
+    if length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        return jsonify({'message': f"Chunks are limited to {current_app.config['UPLOAD_CHUNK_SIZE']} bytes"}), 413
+    if request.content_length is not None and request.content_length != length:
+        return jsonify({'message': 'Content-Length does not match Content-Range'}), 400
+
+    # Release the read transaction before the (possibly slow) body transfer
+    db.session.commit()
+    try:
+        write_chunk(upload_id, start, length, request.stream, request.headers.get('X-Chunk-SHA256'))
+    except ChunkError as e:
+        return jsonify({'message': str(e)}), 422
+
+    # Ranges from concurrent chunks are merged under the row lock
+    upload = UploadSession.get_for_owner(upload_id, current_user_id, lock=True)
+    upload.record_range(start, last + 1)
+    upload.save()
+
+    return _upload_response(upload)
+
+@uploads_bp.route('/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+@log_activity('document_create')
+def complete_upload(upload_id):
+    """Turn a fully received upload into a document or a new version."""
+    current_user_id = get_jwt_identity()
+    upload = UploadSession.get_for_owner(upload_id, current_user_id, lock=True)
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    if upload.status == 'completed':
+        document = Document.get_by_id(upload.document_id)
+        return jsonify({
+            'message': 'Upload already completed',
+            'document': DocumentSchema().dump(document)
+        })
+    if not upload.is_complete:
+        db.session.rollback()
+        return jsonify({
+            'message': 'Upload is missing data',
+            'received_ranges': upload.received_ranges
+        }), 409
+
+    path = partial_path(upload_id)
+    if upload.sha256 and file_sha256(path) != upload.sha256.lower():
+        # Some chunk was corrupted without a per-chunk checksum; start over
+        upload.received_ranges = []
+        upload.save()
+        return jsonify({'message': 'File checksum mismatch, upload the file again'}), 422
+
+    # Committed together with the new document, so a retry cannot create two
+    upload.status = 'completed'
+    spooled = SpooledUpload(upload.filename, path, upload.mime_type)
+    if upload.parent_document_id:
+        parent = Document.get_by_id(upload.parent_document_id)
+        if not parent or not parent.is_active:
+            db.session.rollback()
+            return jsonify({'message': 'Document not found'}), 404
+        document = parent.create_version(spooled)
+    else:
+        document = Document(
+            owner_id=current_user_id,
+            file=spooled,
+            **DocumentSchema().load(upload.document_fields or {})
+        )
+        document.save()
+
+    upload.document_id = document.id
+    upload.save()
+
+    return jsonify({
+        'message': 'Document created successfully',
+        'document': DocumentSchema().dump(document)
+    }), 201
+
+@uploads_bp.route('/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload(upload_id):
+    """Abandon an upload and free its disk space."""
+    upload = UploadSession.get_for_owner(upload_id, get_jwt_identity())
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    if upload.status == 'completed':
+        return jsonify({'message': 'Upload already completed'}), 409
+
+    discard_partial(upload_id)
+    upload.delete()
+
+    return jsonify({'message': 'Upload aborted'})
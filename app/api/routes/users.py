@@ -3,20 +3,45 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 
 from app.models.user import User
-from app.schemas.user import UserSchema, UserUpdateSchema
+from app.schemas.user import UserSchema, UserUpdateSchema, UserDirectorySchema
+from app.core.admission import priority
 from app.core.security import admin_required, log_activity
 
 users_bp = Blueprint('users', __name__)
 
 @users_bp.route('', methods=['GET'])
+@priority
 @jwt_required()
 @admin_required()
 def list_users():
-    """List all users (admin only)."""
-    users = User.get_all()
-    return jsonify(UserSchema(many=True).dump(users))
+    """List users with cursor pagination and prefix search (admin only)."""
+    try:
+        params = UserDirectorySchema().load(request.args)
+    except ValidationError as e:
+        return jsonify({'message': 'Validation error', 'errors': e.messages}), 422
+
+    try:
+        users, next_cursor = User.search_directory(
+            prefix=params.get('query'),
+            role=params.get('role'),
+            is_verified=params.get('is_verified'),
+            cursor=params.get('cursor'),
+            limit=params['per_page']
+        )
+    except ValueError as e:
+        return jsonify({'message': 'Validation error', 'errors': {'cursor': [str(e)]}}), 422
+
+    return jsonify({
+        'users': UserSchema(many=True).dump(users),
+        'pagination': {
+            'per_page': params['per_page'],
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
+    })
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
+@priority
 @jwt_required()
 @admin_required()
 def get_user(user_id):
@@ -62,6 +87,7 @@ def update_profile():
     })
 
 @users_bp.route('/<int:user_id>/verify', methods=['POST'])
+@priority
 @jwt_required()
 @admin_required()
 @log_activity('user_verify')
@@ -80,6 +106,7 @@ def verify_user(user_id):
     })
 
 @users_bp.route('/<int:user_id>/role', methods=['PUT'])
+@priority
 @jwt_required()
 @admin_required()
 @log_activity('role_update')
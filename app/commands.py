@@ -0,0 +1,401 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.database.base import db
+
+storage_cli = AppGroup('storage', help='Manage document file storage.')
+extraction_cli = AppGroup('extraction', help='Extract text and fields from document files.')
+metadata_cli = AppGroup('metadata', help='Maintain the indexed document metadata keys.')
+facets_cli = AppGroup('facets', help='Maintain precomputed document facet counts.')
+versions_cli = AppGroup('versions', help='Maintain document version lineage.')
+uploads_cli = AppGroup('uploads', help='Maintain resumable upload sessions.')
+shards_cli = AppGroup('shards', help='Manage owner sharding of document data.')
+visibility_cli = AppGroup('visibility', help='Maintain the per-user document visibility index.')
+
+@storage_cli.command('migrate')
+@click.option('--source', 'source_name', default=None,
+              help='Backend to copy from (default: STORAGE_MIGRATE_FROM).')
+@click.option('--target', 'target_name', default=None,
+              help='Backend to copy to (default: STORAGE_MIGRATE_TO).')
+@click.option('--delete-source/--keep-source', default=False,
+              help='Remove each file from the source once verified in the target.')
+@click.option('--batch-size', default=500, show_default=True)
+def migrate_storage(source_name, target_name, delete_source, batch_size):
+    """Copy document files between storage backends without downtime.
+
+    Run the app with STORAGE_BACKEND=migrating first so it reads from both
+    backends and writes to the target, then run this command, then switch
+    STORAGE_BACKEND to the target. Re-running skips files already copied.
+    """
+    from app.models.document import Document
+    from app.services.storage import StorageError, build_backend, migrate_file
+
+    config = current_app.config
+    source = build_backend(source_name or config['STORAGE_MIGRATE_FROM'], config)
+    target = build_backend(target_name or config['STORAGE_MIGRATE_TO'], config)
+
+    copied = skipped = missing = failed = 0
+    keys = db.session.query(Document.file_path).yield_per(batch_size)
+    for (key,) in keys:
+        try:
+            if migrate_file(source, target, key, delete_source=delete_source):
+                copied += 1
+            else:
+                skipped += 1
+        except FileNotFoundError:
+            missing += 1
+            click.echo(f'missing: {key}', err=True)
+        except (OSError, StorageError) as e:
+            failed += 1
+            click.echo(f'failed: {key}: {e}', err=True)
+
+    click.echo(f'copied={copied} already_migrated={skipped} missing={missing} failed={failed}')
+    if failed:
+        raise SystemExit(1)
+
+@storage_cli.command('encrypt')
+@click.option('--batch-size', default=500, show_default=True)
+def encrypt_storage(batch_size):
+    """Encrypt document files stored before STORAGE_ENCRYPTION_KEY was set.
+
+    Each file is rewritten in place under the same key. Re-running skips
+    files that are already encrypted.
+    """
+    from app.models.document import Document
+    from app.services.encryption import EncryptedStorage
+    from app.services.storage import StorageError, get_storage
+
+    storage = get_storage()
+    if not isinstance(storage, EncryptedStorage):
+        raise click.ClickException('Set STORAGE_ENCRYPTION_KEY to enable encryption first')
+
+    encrypted = skipped = missing = failed = 0
+    keys = db.session.query(Document.file_path).yield_per(batch_size)
+    for (key,) in keys:
+        try:
+            if storage.is_encrypted(key):
+                skipped += 1
+                continue
+            with storage.inner.open(key) as fh:
+                storage.save(key, fh)
+            encrypted += 1
+        except FileNotFoundError:
+            missing += 1
+            click.echo(f'missing: {key}', err=True)
+        except (OSError, StorageError) as e:
+            failed += 1
+            click.echo(f'failed: {key}: {e}', err=True)
+
+    click.echo(f'encrypted={encrypted} already_encrypted={skipped} missing={missing} failed={failed}')
+    if failed:
+        raise SystemExit(1)
+
+@storage_cli.command('compression-stats')
+@click.option('--sample', default=50, show_default=True,
+              help='Files measured per file type.')
+def compression_stats(sample):
+    """Report compression ratio and CPU cost per file type.
+
+    Sizes come from a sample of each type's most recent files. CPU cost is
+    process time per uncompressed MB to read (decompress) each file and to
+    compress it with the method configured for its type.
+    """
+    from app.models.document import Document
+    from app.services.compression import CompressedStorage, compressor
+    from app.services.storage import COPY_BUFFER_SIZE, StorageError, get_storage
+
+    storage = get_storage()
+    if not isinstance(storage, CompressedStorage):
+        raise click.ClickException('STORAGE_COMPRESSION is not configured')
+
+    click.echo(f"{'type':<6} {'method':<8} {'files':>6} {'logical MB':>11} {'stored MB':>10} "
+               f"{'ratio':>6} {'compress ms/MB':>15} {'read ms/MB':>11}")
+    types = db.session.query(Document.file_type).distinct().order_by(Document.file_type)
+    for (file_type,) in types:
+        keys = [key for (key,) in db.session.query(Document.file_path).filter(
+            Document.file_type == file_type
+        ).order_by(Document.id.desc()).limit(sample)]
+        choice = storage.method_for(keys[0])
+        logical = stored = 0
+        compress_time = read_time = 0.0
+        for key in keys:
+            try:
+                stored += storage.stored_size(key)
+                packer = compressor(*choice) if choice else None
+                with storage.open(key) as fh:
+                    while True:
+                        started = time.process_time()
+                        data = fh.read(COPY_BUFFER_SIZE)
+                        read_time += time.process_time() - started
+                        if packer:
+                            started = time.process_time()
+                            if data:
+                                packer.compress(data)
+                            else:
+                                packer.flush()
+                            compress_time += time.process_time() - started
+                        if not data:
+                            break
+                        logical += len(data)
+            except (OSError, StorageError) as e:
+                click.echo(f'failed: {key}: {e}', err=True)
+
+        megabytes = logical / (1024 * 1024)
+        per_mb = 1000 / megabytes if megabytes else 0
+        method = ':'.join(map(str, choice)) if choice else 'raw'
+        click.echo(
+            f'{file_type:<6} {method:<8} {len(keys):>6} {megabytes:>11.2f} {stored / 1048576:>10.2f} '
+            f'{(stored / logical if logical else 1):>6.2f} {compress_time * per_mb:>15.1f} {read_time * per_mb:>11.1f}'
+        )
+
+@extraction_cli.command('run')
+@click.option('--workers', type=int, default=None,
+              help='Extraction processes (default: EXTRACTION_WORKERS or one per core).')
+@click.option('--batch-size', type=int, default=None,
+              help='Documents per batch (default: EXTRACTION_BATCH_SIZE).')
+@click.option('--follow', is_flag=True,
+              help='Keep polling for new documents instead of exiting when done.')
+@click.option('--poll-interval', default=5.0, show_default=True)
+def run_extraction_command(workers, batch_size, follow, poll_interval):
+    """Extract text and fields from documents that have not been processed."""
+    from app.services.extraction import run_extraction
+
+    config = current_app.config
+    batch_size = batch_size or config['EXTRACTION_BATCH_SIZE']
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers or config['EXTRACTION_WORKERS']) as pool:
+        while True:
+            processed = run_extraction(
+                pool,
+                batch_size=batch_size,
+                max_bytes=config['EXTRACTION_MAX_BYTES'],
+                logger=current_app.logger
+            )
+            total += processed
+            if processed:
+                continue
+            if not follow:
+                break
+            db.session.remove()
+            time.sleep(poll_interval)
+    click.echo(f'processed={total}')
+
+@metadata_cli.command('reindex')
+@click.option('--batch-size', default=500, show_default=True)
+def reindex_metadata(batch_size):
+    """Rebuild indexed metadata rows, e.g. after changing INDEXED_METADATA_KEYS."""
+    from app.models.document import Document
+    from app.models.document_metadata import DocumentMetadataValue
+
+    indexed_keys = current_app.config['INDEXED_METADATA_KEYS']
+    last_id, total = 0, 0
+    while True:
+        # Page by id and commit per batch so the session stays small
+        documents = Document.query.filter(
+            Document.id > last_id
+        ).order_by(Document.id).limit(batch_size).all()
+        if not documents:
+            break
+        for document in documents:
+            DocumentMetadataValue.sync(document, indexed_keys)
+        db.session.commit()
+        total += len(documents)
+        last_id = documents[-1].id
+        db.session.expunge_all()
+    click.echo(f'reindexed={total}')
+
+@facets_cli.command('rebuild')
+def rebuild_facets():
+    """Recompute facet counts from the documents table.
+
+    Counts are kept current on every ORM write; run this after bulk SQL
+    updates that bypass the ORM.
+    """
+    from app.models.document_facet import DocumentFacetCount
+
+    click.echo(f'buckets={DocumentFacetCount.rebuild()}')
+
+@versions_cli.command('backfill')
+@click.option('--batch-size', default=1000, show_default=True)
+def backfill_versions(batch_size):
+    """Fill root_id and is_latest for documents created before lineage was stored."""
+    from app.database.sharding import shard_ids
+    from app.models.document import Document
+
+    table = Document.__table__
+    documents = table.alias('d')
+    parents = table.alias('p')
+
+    # A chain never spans owners, so each shard is backfilled on its own
+    updated = chains = 0
+    for shard_id in shard_ids():
+        bind = {'shard_id': shard_id}
+
+        # Originals are their own root, then each pass reaches one level deeper
+        updated += db.session.execute(
+            db.update(table).where(
+                table.c.root_id.is_(None),
+                table.c.parent_id.is_(None)
+            ).values(root_id=table.c.id),
+            bind_arguments=bind
+        ).rowcount
+        db.session.commit()
+        while True:
+            rows = db.session.execute(
+                db.select(documents.c.id, parents.c.root_id).join(
+                    parents, documents.c.parent_id == parents.c.id
+                ).where(
+                    documents.c.root_id.is_(None),
+                    parents.c.root_id.isnot(None)
+                ).limit(batch_size),
+                bind_arguments=bind
+            ).all()
+            if not rows:
+                break
+            db.session.execute(
+                db.update(table).where(table.c.id == db.bindparam('b_id')).values(root_id=db.bindparam('b_root')),
+                [{'b_id': id, 'b_root': root_id} for id, root_id in rows],
+                bind_arguments=bind
+            )
+            db.session.commit()
+            updated += len(rows)
+
+        # At most one latest row per chain: the highest active version, as
+        # Document promotes, with the newest row winning a tied version
+        active = table.c.is_active == True
+        tops = db.select(
+            table.c.root_id, db.func.max(table.c.version).label('version')
+        ).where(active).group_by(table.c.root_id).subquery()
+        head_ids = [id for (id,) in db.session.execute(
+            db.select(db.func.max(table.c.id)).join(
+                tops,
+                db.and_(table.c.root_id == tops.c.root_id, table.c.version == tops.c.version)
+            ).where(active).group_by(table.c.root_id),
+            bind_arguments=bind
+        )]
+        db.session.execute(db.update(table).values(is_latest=False), bind_arguments=bind)
+        for start in range(0, len(head_ids), batch_size):
+            db.session.execute(
+                db.update(table).where(
+                    table.c.id.in_(head_ids[start:start + batch_size])
+                ).values(is_latest=True),
+                bind_arguments=bind
+            )
+        db.session.commit()
+        chains += len(head_ids)
+    click.echo(f'roots_filled={updated} chains={chains}')
+
+@uploads_cli.command('cleanup')
+@click.option('--batch-size', default=500, show_default=True)
+def cleanup_uploads(batch_size):
+    """Delete expired upload sessions and their partial files."""
+    from app.models.upload_session import UploadSession
+    from app.services.uploads import discard_partial
+
+    removed = 0
+    while True:
+        sessions = UploadSession.expired(limit=batch_size)
+        if not sessions:
+            break
+        for upload in sessions:
+            discard_partial(upload.id)
+            db.session.delete(upload)
+        db.session.commit()
+        removed += len(sessions)
+    click.echo(f'removed={removed}')
+
+@shards_cli.command('init')
+def init_shards():
+    """Create the sharded tables on every configured shard."""
+    from app.database.sharding import create_shard_schema
+
+    metadata = create_shard_schema()
+    click.echo(f'tables={len(metadata.tables)} shards={len(current_app.config["SQLALCHEMY_SHARDS"])}')
+
+@shards_cli.command('pin')
+@click.option('--batch-size', default=1000, show_default=True)
+def pin_owners(batch_size):
+    """Record every user's current shard so adding a shard does not move them.
+
+    Placement is a hash over the shard list; run this before appending a
+    shard, then move owners onto the new shard with move-owner.
+    """
+    from app.models.owner_shard import OwnerShard
+    from app.models.user import User
+
+    sharding = current_app.extensions.get('sharding')
+    if sharding is None:
+        raise click.UsageError('Sharding is not configured (set MYSQL_SHARD_URIS)')
+    pinned = set(db.session.scalars(db.select(OwnerShard.owner_id)))
+    last_id, total = 0, 0
+    while True:
+        user_ids = db.session.scalars(
+            db.select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).all()
+        if not user_ids:
+            break
+        for user_id in user_ids:
+            if user_id not in pinned:
+                OwnerShard.assign(user_id, sharding.map.default_shard(user_id))
+                total += 1
+        db.session.commit()
+        last_id = user_ids[-1]
+    sharding.map.invalidate()
+    click.echo(f'pinned={total}')
+
+@shards_cli.command('move-owner')
+@click.argument('owner_id', type=int)
+@click.argument('shard')
+@click.option('--settle', type=float, default=None,
+              help='Seconds to wait for workers to pick up the move (default: SHARD_MAP_TTL).')
+def move_owner_command(owner_id, shard, settle):
+    """Move one owner's documents to another shard while the app keeps serving."""
+    from app.database.sharding import ShardingError, move_owner
+
+    try:
+        move_owner(owner_id, shard, settle=settle, log=click.echo)
+    except ShardingError as e:
+        raise click.UsageError(str(e))
+    click.echo(f'owner={owner_id} shard={shard}')
+
+@shards_cli.command('status')
+def shards_status():
+    """Show how many owners and documents each shard holds."""
+    from app.database.sharding import shard_ids
+    from app.models.document import Document
+
+    for shard_id in shard_ids():
+        owners, documents = db.session.execute(
+            db.select(db.func.count(db.distinct(Document.owner_id)), db.func.count()).select_from(
+                Document.__table__
+            ),
+            bind_arguments={'shard_id': shard_id}
+        ).one()
+        click.echo(f'{shard_id or "primary"} owners={owners} documents={documents}')
+
+@visibility_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_visibility(batch_size):
+    """Recompute who can see each document from documents, shares and groups.
+
+    The index is kept current on every ORM write; run this once after
+    upgrading, and after bulk SQL updates that bypass the ORM.
+    """
+    from app.models.document_share import DocumentVisibility
+
+    click.echo(f'documents={DocumentVisibility.rebuild(batch_size)}')
+
+def register_commands(app):
+    """Register CLI command groups with the app."""
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(extraction_cli)
+    app.cli.add_command(metadata_cli)
+    app.cli.add_command(facets_cli)
+    app.cli.add_command(versions_cli)
+    app.cli.add_command(uploads_cli)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(visibility_cli)
@@ -0,0 +1,185 @@
+"""Adaptive per-class admission control for each worker."""
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from prometheus_client import Counter
+
+ADMISSION_REJECTED = Counter(
+    'admission_rejected_total',
+    'Requests shed by admission control',
+    ['route_class', 'reason']  # reason: limit, queue
+)
+
+# Endpoints, or blueprint names ending in '.', mapped to route classes
+ROUTE_CLASSES = {
+    'auth.': 'auth',
+    'documents.list_documents': 'search',
+    'documents.get_recent_documents': 'search',
+    'documents.create_document': 'files',
+    'documents.download_document': 'files',
+    'documents.download_archive': 'files',
+    'documents.get_document_content': 'files',
+    'uploads.': 'files'
+}
+
+PRIORITY_ENDPOINTS = {'metrics', 'static'}
+
+def priority(view):
+    """Mark a view as never shed by admission control."""
+    view._admission_priority = True
+    return view
+
+def route_class(endpoint):
+    """Return the route class for an endpoint name."""
+    if endpoint in ROUTE_CLASSES:
+        return ROUTE_CLASSES[endpoint]
+    blueprint = endpoint.rpartition('.')[0]
+    return ROUTE_CLASSES.get(f'{blueprint}.', 'default')
+
+class AdaptiveLimit:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease."""
+
+    def __init__(self, initial, min_limit=1, max_limit=64, tolerance=2.0, backoff=0.9,
+                 window=20, baseline_decay=0.05):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.baseline_decay = baseline_decay
+        self.baseline = None
+        self.inflight = 0
+        self._total = 0.0
+        self._count = 0
+        self._saturated = False
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a slot, or return False if the class is at its limit."""
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                self._saturated = True
+                return False
+            self.inflight += 1
+            if self.inflight >= int(self.limit):
+                self._saturated = True
+            return True
+
+    def release(self, latency):
+        """Return a slot and record how long the request took."""
+        with self._lock:
+            self.inflight -= 1
+            self._total += latency
+            self._count += 1
+            if self._count >= self.window:
+                self._adjust(self._total / self._count)
+                self._total = 0.0
+                self._count = 0
+                self._saturated = False
+
+    def _adjust(self, average):
+        if self.baseline is None or average < self.baseline:
+            self.baseline = average
+        else:
+            # Drift up so a backend that is slower for good becomes the new normal
+            self.baseline += (average - self.baseline) * self.baseline_decay
+
+        if average > self.baseline * self.tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self._saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+class AdmissionController:
+    """Per-worker limits for each route class."""
+
+    def __init__(self, classes, tolerance=2.0, retry_after=1):
+        self.retry_after = retry_after
+        self.queue_timeouts = {}
+        self.limits = {}
+        for name, options in classes.items():
+            self.queue_timeouts[name] = options.get('queue_timeout')
+            self.limits[name] = AdaptiveLimit(
+                options['limit'],
+                min_limit=options.get('min_limit', 1),
+                max_limit=options.get('max_limit', 64),
+                tolerance=options.get('tolerance', tolerance)
+            )
+
+    def admit(self, name, queued):
+        """Return a rejection reason, or None after taking a slot."""
+        timeout = self.queue_timeouts.get(name)
+        if timeout is not None and queued is not None and queued > timeout:
+            return 'queue'
+        if not self.limits[name].try_acquire():
+            return 'limit'
+        return None
+
+    def release(self, name, latency):
+        self.limits[name].release(latency)
+
+    def snapshot(self):
+        """Return the current limit and in-flight count of each class."""
+        return {
+            name: {'limit': int(limit.limit), 'inflight': limit.inflight}
+            for name, limit in self.limits.items()
+        }
+
+def queue_time(header, now):
+    """Return seconds since nginx received the request, or None if unknown."""
+    if not header:
+        return None
+    value = header[2:] if header.startswith('t=') else header
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # Some proxies send microseconds
+    if started > 1e11:
+        started /= 1e6
+    return max(0.0, now - started)
+
+def _is_priority():
+    endpoint = request.endpoint
+    if endpoint is None or endpoint in PRIORITY_ENDPOINTS:
+        return True
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, '_admission_priority', False)
+
+def init_admission(app):
+    """Shed excess requests before they reach a view."""
+    if not app.config.get('ADMISSION_CONTROL', True):
+        return None
+    controller = AdmissionController(
+        app.config['ADMISSION_CLASSES'],
+        tolerance=app.config['ADMISSION_LATENCY_TOLERANCE'],
+        retry_after=app.config['ADMISSION_RETRY_AFTER']
+    )
+    app.extensions['admission'] = controller
+
+    @app.before_request
+    def admit_request():
+        if request.method == 'OPTIONS' or _is_priority():
+            return None
+        name = route_class(request.endpoint)
+        if name not in controller.limits:
+            name = 'default'
+        reason = controller.admit(name, queue_time(request.headers.get('X-Request-Start'), time.time()))
+        if reason is not None:
+            ADMISSION_REJECTED.labels(name, reason).inc()
+            response = jsonify({'message': 'Server is busy, please retry'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(controller.retry_after)
+            return response
+        g.admission = (name, time.perf_counter())
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        admitted = g.pop('admission', None)
+        if admitted is not None:
+            name, start = admitted
+            controller.release(name, time.perf_counter() - start)
+
+    return controller
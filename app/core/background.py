@@ -0,0 +1,34 @@
+"""Background threads started lazily, once per process."""
+import os
+import threading
+
+class ProcessThread:
+    """A daemon thread running target, started at most once per process and key."""
+
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+        # (key, pid) of the thread this process is running, or None
+        self.running = None
+        self._lock = threading.Lock()
+
+    def start(self, *args, key=None):
+        """Start target(*args) unless this process already runs it for key; return whether it started."""
+        running = (key, os.getpid())
+        if self.running == running:
+            return False
+        with self._lock:
+            if self.running == running:
+                return False
+            self.running = running
+        thread = threading.Thread(target=self._run, args=(running, args), name=self.name, daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, running, args):
+        try:
+            self.target(*args)
+        finally:
+            # A later start() may run it again, unless it already moved on to another key
+            if self.running == running:
+                self.running = None
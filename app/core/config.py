@@ -22,14 +22,60 @@ class Config:
         'max_overflow': 5    # Added max overflow
     }
 
+    # Read replica (optional). GET requests read from the replica unless the
+    # caller wrote recently or the replica is lagging.
+    SQLALCHEMY_REPLICA_URI = os.getenv('MYSQL_REPLICA_URI')
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_MAX_LAG_SECONDS = int(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+    REPLICA_LAG_CHECK_INTERVAL = int(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+
+    # Owner sharding (optional, app.database.sharding): documents and their
+    # rows live on one of these databases. Only ever append to the list;
+    # run `flask shards pin` before adding one so existing owners stay put.
+    SQLALCHEMY_SHARDS = {
+        f'shard{index}': uri.strip()
+        for index, uri in enumerate(os.getenv('MYSQL_SHARD_URIS', '').split(','))
+        if uri.strip()
+    }
+    # How long workers cache the owner -> shard overrides
+    SHARD_MAP_TTL = float(os.getenv('SHARD_MAP_TTL', 30))
+    # Ids per shard range, and how many a worker reserves at a time
+    SHARD_ID_STRIDE = int(os.getenv('SHARD_ID_STRIDE', 100_000_000))
+    SHARD_ID_BLOCK = int(os.getenv('SHARD_ID_BLOCK', 1000))
+
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', SECRET_KEY)
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 30)))
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 7)))
     JWT_ERROR_MESSAGE_KEY = 'message'
+    # Revoked token ids are mirrored into a per-worker Bloom filter, resynced
+    # from Redis every REVOCATION_SYNC_INTERVAL seconds and on pub/sub
+    REVOCATION_SYNC_INTERVAL = float(os.getenv('REVOCATION_SYNC_INTERVAL', 30))
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv('REVOCATION_BLOOM_CAPACITY', 100000))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.getenv('REVOCATION_BLOOM_ERROR_RATE', 0.001))
 
     # Redis Configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # Per-process pool: gthread threads plus headroom for background threads
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 8))
+    REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 1.0))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.25))
+    REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', 0.25))
+    # Circuit breaker: open after N failures/slow calls, probe after the timeout
+    REDIS_BREAKER_FAILURES = int(os.getenv('REDIS_BREAKER_FAILURES', 5))
+    REDIS_BREAKER_RESET_TIMEOUT = float(os.getenv('REDIS_BREAKER_RESET_TIMEOUT', 10))
+    REDIS_SLOW_CALL_THRESHOLD = float(os.getenv('REDIS_SLOW_CALL_THRESHOLD', 0.1))
+
+    # Read cache for hot documents and listings: entries are fresh for
+    # CACHE_TTL seconds, then served stale for up to CACHE_STALE_TTL while one
+    # worker (holding a CACHE_LOCK_TTL lock) recomputes them
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 30))
+    CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', 300))
+    CACHE_LOCK_TTL = float(os.getenv('CACHE_LOCK_TTL', 5))
+    CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', 2))
+    # Searches cache only pages of ids and are invalidated exactly by the
+    # owner's generation, so they can stay fresh much longer
+    SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 300))
     
     # Security
     BCRYPT_LOG_ROUNDS = 13
@@ -43,12 +89,74 @@ class Config:
     # Pagination
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
+    ARCHIVE_MAX_DOCUMENTS = int(os.getenv('ARCHIVE_MAX_DOCUMENTS', 5000))
     
     # Document Upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx', 'xls', 'xlsx'}
 
+    # Resumable uploads (/api/v1/uploads): files are assembled in place under
+    # UPLOAD_PARTIAL_FOLDER (default: UPLOAD_FOLDER/.partial, so completing an
+    # upload is a rename) from chunks of at most UPLOAD_CHUNK_SIZE bytes
+    UPLOAD_PARTIAL_FOLDER = os.getenv('UPLOAD_PARTIAL_FOLDER')
+    UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv('UPLOAD_SESSION_TTL_HOURS', 24)))
+
+    # Signed download links (POST /api/v1/documents/<id>/download-url) are
+    # valid for DOWNLOAD_URL_TTL seconds. With DOWNLOAD_ACCEL_PREFIX set, files
+    # on local disk are handed to nginx with X-Accel-Redirect under that
+    # internal location (an alias of UPLOAD_FOLDER) instead of sent by Python
+    DOWNLOAD_URL_SECRET = os.getenv('DOWNLOAD_URL_SECRET', SECRET_KEY)
+    DOWNLOAD_URL_TTL = int(os.getenv('DOWNLOAD_URL_TTL', 60))
+    DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX')
+
+    # Document.metadata keys mirrored into document_metadata_values so they
+    # can be filtered with an index (meta.<key>=, meta.<key>.gte=, ...).
+    # Kinds: 'string', 'number', 'date'. Run `flask metadata reindex` after
+    # adding a key.
+    INDEXED_METADATA_KEYS = {
+        'account_number': 'string',
+        'invoice_number': 'string',
+        'currency': 'string',
+        'amount': 'number',
+        'tax_year': 'number',
+        'statement_date': 'date',
+        'due_date': 'date'
+    }
+
+    # Document storage backend: 'local' (flat UPLOAD_FOLDER), 'sharded'
+    # (hash-sharded UPLOAD_FOLDER), 's3', or 'migrating' (serve from both
+    # STORAGE_MIGRATE_FROM and STORAGE_MIGRATE_TO while files are moved)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    STORAGE_MIGRATE_FROM = os.getenv('STORAGE_MIGRATE_FROM', 'local')
+    STORAGE_MIGRATE_TO = os.getenv('STORAGE_MIGRATE_TO', 'sharded')
+    S3_BUCKET = os.getenv('S3_BUCKET', 'fintech-cms-documents')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'documents/')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # e.g. MinIO in development
+    S3_REGION = os.getenv('S3_REGION')
+    # Files are encrypted with AES-256-GCM when a key is set (urlsafe base64
+    # of 32 random bytes). Each SEGMENT_SIZE block is authenticated on its own,
+    # so range downloads decrypt only the blocks they cover.
+    STORAGE_ENCRYPTION_KEY = os.getenv('STORAGE_ENCRYPTION_KEY')
+    STORAGE_ENCRYPTION_SEGMENT_SIZE = int(os.getenv('STORAGE_ENCRYPTION_SEGMENT_SIZE', 64 * 1024))
+    # Compression at rest by file extension: 'zlib:<level>' or 'lzma:<preset>',
+    # e.g. {'pdf': 'zlib:6', 'doc': 'lzma:1', 'xls': 'lzma:1'}. Off by default:
+    # listed types can no longer be sent with sendfile or X-Accel-Redirect,
+    # only streamed through the app. Unlisted types (jpg, png) are untouched;
+    # `flask storage compression-stats` reports the ratio and CPU cost per type.
+    STORAGE_COMPRESSION = {}
+
+    # Content extraction (flask extraction run)
+    EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', 0)) or None  # None: one per core
+    EXTRACTION_BATCH_SIZE = int(os.getenv('EXTRACTION_BATCH_SIZE', 50))
+    EXTRACTION_MAX_BYTES = int(os.getenv('EXTRACTION_MAX_BYTES', 32 * 1024 * 1024))
+
+    # Async file server (app.aio)
+    ASYNC_FILE_CHUNK_SIZE = int(os.getenv('ASYNC_FILE_CHUNK_SIZE', 256 * 1024))
+    ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 5))
+
     # Cache Configuration
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = REDIS_URL
@@ -56,24 +164,88 @@ class Config:
 
     # Rate Limiting
     RATELIMIT_DEFAULT = "100/hour"
-    RATELIMIT_STORAGE_URL = REDIS_URL
+    RATELIMIT_STRATEGY = 'fixed-window'
+    # Workers lease quota from Redis in batches (app.core.rate_limit) instead
+    # of paying a round trip per request
+    RATELIMIT_STORAGE_URI = f'leased+{REDIS_URL}'
+    RATELIMIT_STORAGE_URL = RATELIMIT_STORAGE_URI
+    RATELIMIT_STORAGE_OPTIONS = {
+        # Largest fraction of a limit one worker may hold unspent
+        'error_bound': float(os.getenv('RATELIMIT_ERROR_BOUND', 0.1)),
+        'max_lease': int(os.getenv('RATELIMIT_MAX_LEASE', 50)),
+        # Seconds before a worker re-syncs its lease with Redis
+        'sync_interval': float(os.getenv('RATELIMIT_SYNC_INTERVAL', 1.0)),
+        # Keys holding a lease per worker, least recently used evicted first
+        'max_leases': int(os.getenv('RATELIMIT_MAX_LEASES', 10000)),
+        'socket_timeout': REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': REDIS_CONNECT_TIMEOUT
+    }
+    # Count in memory rather than failing requests while Redis is unreachable
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+
+    # Admission control (app.core.admission): per-worker concurrency limits
+    # per route class that adapt to latency, and the longest a request may
+    # have queued (per nginx's X-Request-Start) before it is shed with a 503
+    ADMISSION_CONTROL = os.getenv('ADMISSION_CONTROL', '1') == '1'
+    ADMISSION_CLASSES = {
+        'auth': {'limit': 2, 'max_limit': 8, 'queue_timeout': 2.0},
+        'search': {'limit': 2, 'max_limit': 8, 'queue_timeout': 5.0},
+        'files': {'limit': 1, 'max_limit': 4, 'queue_timeout': 10.0},
+        'default': {'limit': 2, 'max_limit': 8, 'queue_timeout': 5.0}
+    }
+    # Limits shrink once a window's mean latency exceeds this multiple of the best seen
+    ADMISSION_LATENCY_TOLERANCE = float(os.getenv('ADMISSION_LATENCY_TOLERANCE', 2.0))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+
+    # Sampling profiler (app.core.profiler): off unless enabled; admins then
+    # start time-boxed profiles through /api/v1/admin/profiler
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0') == '1'
+    PROFILER_MAX_DURATION = int(os.getenv('PROFILER_MAX_DURATION', 300))
+    # Shortest allowed time between samples (seconds)
+    PROFILER_MIN_INTERVAL = float(os.getenv('PROFILER_MIN_INTERVAL', 0.001))
+    PROFILER_MAX_STACKS = int(os.getenv('PROFILER_MAX_STACKS', 5000))
+    PROFILER_MAX_DEPTH = int(os.getenv('PROFILER_MAX_DEPTH', 64))
+    # How often a worker checks whether a profile was started elsewhere
+    PROFILER_POLL_INTERVAL = float(os.getenv('PROFILER_POLL_INTERVAL', 2.0))
+    PROFILER_RESULT_TTL = int(os.getenv('PROFILER_RESULT_TTL', 3600))
 
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
+    # Coalesced timestamp writes (app.database.timestamps): last_login and
+    # similar columns are buffered per worker and written in batches
+    TIMESTAMP_FLUSH_INTERVAL = float(os.getenv('TIMESTAMP_FLUSH_INTERVAL', 5.0))
+    # Flush early once this many rows are pending
+    TIMESTAMP_MAX_PENDING = int(os.getenv('TIMESTAMP_MAX_PENDING', 5000))
+    TIMESTAMP_BATCH_SIZE = int(os.getenv('TIMESTAMP_BATCH_SIZE', 500))
+
+    # Startup
+    # Connections each worker opens per engine before taking traffic
+    WARMUP_DB_CONNECTIONS = int(os.getenv('WARMUP_DB_CONNECTIONS', 2))
+
     @staticmethod
     def init_app(app):
         """Initialize application configuration"""
         # Create upload directory with secure permissions
-        os.makedirs(Config.UPLOAD_FOLDER, mode=0o750, exist_ok=True)
-        # Ensure upload directory has secure permissions even if it already existed
-        os.chmod(Config.UPLOAD_FOLDER, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP)
+        Config._ensure_private_dir(Config.UPLOAD_FOLDER)
 
         # Create logs directory
         log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
-        os.makedirs(log_dir, mode=0o750, exist_ok=True)
-        os.chmod(log_dir, stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP)
+        Config._ensure_private_dir(log_dir)
+
+    @staticmethod
+    def _ensure_private_dir(path):
+        """Create a directory with 0750 permissions, touching it only if needed."""
+        mode = stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP
+        try:
+            current = os.stat(path).st_mode
+        except FileNotFoundError:
+            os.makedirs(path, mode=0o750, exist_ok=True)
+            current = os.stat(path).st_mode
+        # Ensure secure permissions even if it already existed
+        if stat.S_IMODE(current) != mode:
+            os.chmod(path, mode)
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,56 @@
+"""Gunicorn process hooks for running with a preloaded app."""
+import time
+
+from sqlalchemy.orm import configure_mappers
+
+from app.database.base import db
+
+def prepare_for_fork(app):
+    """Do one-off work in the master so workers inherit it."""
+    with app.app_context():
+        # Resolve relationships and compile mapper state once, up front
+        configure_mappers()
+        # Nothing should be connected yet, but never hand sockets to children
+        for engine in db.engines.values():
+            engine.dispose()
+
+def reset_after_fork(app):
+    """Drop connection pools inherited from the master.
+
+    The worker reports itself as starting on /health until warm_up()
+    has opened its own connections.
+    """
+    app.config['WARMED_UP'] = False
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's connections alone
+            engine.dispose(close=False)
+    app.redis.reset_after_fork()
+
+def warm_up(app):
+    """Open pooled connections before the worker takes its first request."""
+    start = time.perf_counter()
+    with app.app_context():
+        for engine in db.engines.values():
+            size = min(engine.pool.size(), app.config['WARMUP_DB_CONNECTIONS'])
+            connections = []
+            try:
+                for _ in range(size):
+                    connections.append(engine.connect())
+            except Exception as e:
+                app.logger.warning(f"Database warmup failed: {str(e)}")
+            finally:
+                for connection in connections:
+                    connection.close()
+
+    try:
+        app.redis.ping()
+    except Exception as e:
+        app.logger.warning(f"Redis warmup failed: {str(e)}")
+
+    app.config['WARMED_UP'] = True
+    app.logger.info(f"Worker warmed up in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+def shutdown(app):
+    """Write anything still buffered before the worker exits."""
+    app.extensions['timestamps'].flush()
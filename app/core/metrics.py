@@ -0,0 +1,22 @@
+import os
+
+from flask import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess
+)
+
+def metrics():
+    """Expose Prometheus metrics for this worker or, in multiprocess mode, all workers."""
+    registry = REGISTRY
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+def init_metrics(app):
+    """Register the /metrics endpoint (not proxied by nginx)."""
+    app.add_url_rule('/metrics', 'metrics', metrics)
@@ -0,0 +1,178 @@
+"""On-demand sampling profiler for running workers."""
+import json
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import request
+
+from app.core.background import ProcessThread
+
+ACTIVE_KEY = 'profiler:active'
+
+def _stacks_key(profile_id):
+    return f'profiler:{profile_id}:stacks'
+
+def _profile_key(profile_id):
+    return f'profiler:{profile_id}'
+
+def collapse(frame, max_depth=64):
+    """Render a frame's stack root first as 'module:function;...'."""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    if frame is not None:
+        names.append('[deeper]')
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    """Per-worker sampler that follows the profile session published in Redis."""
+
+    def __init__(self, redis_client, max_duration=300, min_interval=0.001, max_stacks=5000,
+                 max_depth=64, poll_interval=2.0, result_ttl=3600):
+        self.redis = redis_client
+        self.max_duration = max_duration
+        self.min_interval = min_interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        # Thread ident -> endpoint of the request it is serving
+        self.routes = {}
+        self._sampler = ProcessThread(self._sample, 'profiler')
+        self._checked_at = 0.0
+
+    def start(self, duration, interval):
+        """Publish a new profile for every worker and start sampling here."""
+        duration = min(duration, self.max_duration)
+        interval = max(interval, self.min_interval)
+        now = time.time()
+        profile = {
+            'id': uuid.uuid4().hex,
+            'started_at': now,
+            'until': now + duration,
+            'interval': interval
+        }
+        data = json.dumps(profile)
+
+        def build(pipe):
+            pipe.set(ACTIVE_KEY, data, ex=max(1, int(duration)), nx=True)
+            pipe.set(_profile_key(profile['id']), data, ex=self.result_ttl + int(duration))
+
+        created, _ = self.redis.pipelined(build, transaction=True)
+        if not created:
+            return None
+        self._run(profile)
+        return profile
+
+    def poll(self):
+        """Pick up a profile started by another worker."""
+        now = time.monotonic()
+        if now - self._checked_at < self.poll_interval:
+            return
+        self._checked_at = now
+        try:
+            data = self.redis.get(ACTIVE_KEY)
+        except Exception:
+            return
+        if data:
+            self._run(json.loads(data))
+
+    def profile(self, profile_id):
+        """Return a profile's settings, or None if unknown or expired."""
+        data = self.redis.get(_profile_key(profile_id))
+        return json.loads(data) if data else None
+
+    def seconds_left(self, profile):
+        """Return whole seconds until every worker has saved its samples."""
+        # Workers save after their last sample; allow one interval for it
+        return max(0, math.ceil(profile['until'] + profile['interval'] + 1 - time.time()))
+
+    def is_running(self, profile):
+        return self.seconds_left(profile) > 0
+
+    def results(self, profile_id, route=None):
+        """Return collapsed stacks gathered from all workers, heaviest first."""
+        counts = self.redis.hgetall(_stacks_key(profile_id))
+        lines = []
+        for stack, count in counts.items():
+            stack = stack.decode('utf-8') if isinstance(stack, bytes) else stack
+            if route is None or stack.split(';', 1)[0] == route:
+                lines.append((int(count), stack))
+        lines.sort(reverse=True)
+        return '\n'.join(f'{stack} {count}' for count, stack in lines)
+
+    @property
+    def running(self):
+        """(profile id, pid) of the profile this process is sampling, or None."""
+        return self._sampler.running
+
+    def _run(self, profile):
+        if time.time() >= profile['until']:
+            return
+        self._sampler.start(profile, key=profile['id'])
+
+    def _sample(self, profile):
+        counts = Counter()
+        own = threading.get_ident()
+        interval = profile['interval']
+        while time.time() < profile['until']:
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                route = self.routes.get(ident)
+                if route is None or ident == own:
+                    continue
+                stack = f'{route};{collapse(frame, self.max_depth)}'
+                if stack not in counts and len(counts) >= self.max_stacks:
+                    stack = f'{route};[other]'
+                counts[stack] += 1
+            # Holding frames would keep their locals alive
+            del frames, frame
+            time.sleep(interval)
+        self._save(profile['id'], counts)
+
+    def _save(self, profile_id, counts):
+        if not counts:
+            return
+        key = _stacks_key(profile_id)
+
+        def build(pipe):
+            for stack, count in counts.items():
+                pipe.hincrby(key, stack, count)
+            pipe.expire(key, self.result_ttl)
+
+        try:
+            self.redis.pipelined(build)
+        except Exception:
+            # Losing a worker's share of an ad hoc profile is acceptable
+            pass
+
+def init_profiler(app):
+    """Register the profiler's request hooks when it is enabled."""
+    if not app.config.get('PROFILER_ENABLED'):
+        return None
+    profiler = SamplingProfiler(
+        app.redis,
+        max_duration=app.config['PROFILER_MAX_DURATION'],
+        min_interval=app.config['PROFILER_MIN_INTERVAL'],
+        max_stacks=app.config['PROFILER_MAX_STACKS'],
+        max_depth=app.config['PROFILER_MAX_DEPTH'],
+        poll_interval=app.config['PROFILER_POLL_INTERVAL'],
+        result_ttl=app.config['PROFILER_RESULT_TTL']
+    )
+    app.extensions['profiler'] = profiler
+
+    @app.before_request
+    def tag_request():
+        profiler.routes[threading.get_ident()] = request.endpoint or 'unknown'
+        profiler.poll()
+
+    @app.teardown_request
+    def untag_request(exc):
+        profiler.routes.pop(threading.get_ident(), None)
+
+    return profiler
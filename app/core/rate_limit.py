@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from limits.storage import Storage
+
+# Reserve a batch of units, returning any unused units from the previous
+# lease first. Runs atomically so concurrent leases never share a position.
+LEASE_SCRIPT = """
+local unused = tonumber(ARGV[1])
+if unused > 0 and redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('DECRBY', KEYS[1], unused)
+end
+local total = redis.call('INCRBY', KEYS[1], tonumber(ARGV[2]))
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+    ttl = tonumber(ARGV[3]) * 1000
+end
+return {total, ttl}
+"""
+
+class _Lease:
+    """A batch of rate limit units reserved in Redis by this worker."""
+
+    __slots__ = ('base', 'leased', 'used', 'window_end', 'synced_at')
+
+    def __init__(self, base, leased, used, window_end, synced_at):
+        self.base = base
+        self.leased = leased
+        self.used = used
+        self.window_end = window_end
+        self.synced_at = synced_at
+
+    @property
+    def unused(self):
+        return self.leased - self.used
+
+    def covers(self, amount, now, mono, sync_interval):
+        """Check whether this lease can serve ``amount`` more units locally."""
+        return (
+            self.used + amount <= self.leased
+            and now < self.window_end
+            and mono - self.synced_at < sync_interval
+        )
+
+class LeasedRedisStorage(Storage):
+    """Two-tier fixed window storage for flask-limiter.
+
+    Each worker reserves units from the shared Redis counter in batches and
+    spends them locally, so most hits are counted without a network round
+    trip. A batch is at most ``error_bound`` of the limit (capped at
+    ``max_lease``) and is re-synced every ``sync_interval`` seconds, when
+    any unspent units are handed back.
+
+    Every admitted hit owns a distinct position in the Redis counter, so a
+    limit is never exceeded. The error is one-sided: units leased by one
+    worker but not yet spent can cause another worker to reject early, by at
+    most one batch per worker.
+
+    Limits too small for a batch of two or more (login and register, with
+    the default ``error_bound``) are counted exactly in Redis on every hit;
+    a lease of one unit would cost the same round trip and hold local state
+    for nothing. At most ``max_leases`` keys keep a lease, least recently
+    used first out; the unspent units of an evicted lease are only
+    returned when its window ends.
+
+    Configure with ``RATELIMIT_STORAGE_URI = 'leased+redis://...'`` and pass
+    tuning through ``RATELIMIT_STORAGE_OPTIONS``.
+    """
+
+    STORAGE_SCHEME = ['leased+redis', 'leased+rediss']
+
+    def __init__(self, uri, wrap_exceptions=False, error_bound=0.1, max_lease=50,
+                 sync_interval=1.0, max_leases=10000, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.error_bound = float(error_bound)
+        self.max_lease = int(max_lease)
+        self.sync_interval = float(sync_interval)
+        self.max_leases = int(max_leases)
+        self.redis = redis.from_url(uri[len('leased+'):], **options)
+        self._lease_script = self.redis.register_script(LEASE_SCRIPT)
+        self._leases = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def base_exceptions(self):
+        return redis.RedisError
+
+    def lease_size(self, key):
+        """Size a lease from the limit amount encoded in the limits key."""
+        # Keys look like LIMITER/<identifiers>/<amount>/<multiples>/<granularity>
+        try:
+            limit = int(key.rsplit('/', 3)[1])
+        except (IndexError, ValueError):
+            return 1
+        return max(1, min(self.max_lease, int(limit * self.error_bound)))
+
+    def _evict(self, now):
+        """Drop leases past max_leases and expired ones at the cold end."""
+        while self._leases:
+            oldest = next(iter(self._leases.values()))
+            if len(self._leases) <= self.max_leases and oldest.window_end > now:
+                return
+            self._leases.popitem(last=False)
+
+    def incr(self, key, expiry, amount=1):
+        now, mono = time.time(), time.monotonic()
+        size = self.lease_size(key)
+        if size < 2:
+            total, _ = self._lease_script(keys=[key], args=[0, amount, int(expiry)])
+            return int(total)
+
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.covers(amount, now, mono, self.sync_interval):
+                lease.used += amount
+                self._leases.move_to_end(key)
+                return lease.base + lease.used
+
+            # Only hand back units while their window is clearly still open,
+            # otherwise they would be subtracted from the next window.
+            unused = 0
+            if lease is not None and lease.window_end - now > 1:
+                unused = lease.unused
+
+            batch = max(amount, size)
+            total, ttl = self._lease_script(keys=[key], args=[unused, batch, int(expiry)])
+            lease = _Lease(
+                base=int(total) - batch,
+                leased=batch,
+                used=amount,
+                window_end=now + int(ttl) / 1000,
+                synced_at=mono
+            )
+            self._leases[key] = lease
+            self._leases.move_to_end(key)
+            self._evict(now)
+            return lease.base + lease.used
+
+    def get(self, key):
+        now, mono = time.time(), time.monotonic()
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.covers(0, now, mono, self.sync_interval):
+                return lease.base + lease.used
+        return int(self.redis.get(key) or 0)
+
+    def get_expiry(self, key):
+        lease = self._leases.get(key)
+        if lease is not None and lease.window_end > time.time():
+            return lease.window_end
+        return time.time() + max(0, self.redis.pttl(key)) / 1000
+
+    def check(self):
+        try:
+            return self.redis.ping()
+        except redis.RedisError:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._leases.clear()
+        count = 0
+        for key in self.redis.scan_iter(match='LIMITER*'):
+            count += self.redis.delete(key)
+        return count
+
+    def clear(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+        self.redis.delete(key)
@@ -0,0 +1,291 @@
+import fnmatch
+import threading
+import time
+
+import redis
+from prometheus_client import Counter, Gauge, Histogram
+
+REDIS_LATENCY = Histogram(
+    'redis_command_duration_seconds',
+    'Latency of Redis commands issued through RedisClient',
+    ['command'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1)
+)
+REDIS_ERRORS = Counter(
+    'redis_command_errors_total',
+    'Redis commands that failed or were rejected by the circuit breaker',
+    ['command', 'reason']
+)
+REDIS_BREAKER_STATE = Gauge(
+    'redis_circuit_state',
+    'Redis circuit breaker state (0=closed, 1=half-open, 2=open)',
+    multiprocess_mode='max'
+)
+
+class RedisUnavailable(redis.ConnectionError):
+    """Raised when Redis is skipped by the circuit breaker and no fallback exists."""
+
+class CircuitBreaker:
+    """Trip after consecutive failures or slow calls and probe again later.
+
+    Closed: calls go to Redis. Open: calls are short-circuited for
+    ``reset_timeout`` seconds. Half-open: a single probe call is let through
+    and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+    _GAUGE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, slow_call_threshold=0.1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        REDIS_BREAKER_STATE.set(self._GAUGE_VALUES[state])
+
+    def allow(self):
+        """Return whether a call may go to Redis right now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, duration, ok):
+        """Record the outcome of a call that was allowed through."""
+        failed = not ok or duration > self.slow_call_threshold
+        with self._lock:
+            self._probing = False
+            if not failed:
+                self._failures = 0
+                if self._state != self.CLOSED:
+                    self._set_state(self.CLOSED)
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+class LocalFallback:
+    """Per-process stand-in for the Redis commands the app degrades onto.
+
+    Values live only in this worker and are bounded by ``max_keys``; the
+    oldest keys are evicted first. It keeps caches working while Redis is
+    down, so it only serves commands whose answer is still safe to act on
+    when no other worker sees it: get, mget, set, setex, delete, expire and
+    scan_iter. Commands that exist to coordinate workers are not served and
+    raise RedisUnavailable instead: exists (replica stickiness), incr
+    (listing generations) and set with nx (locks). Their callers already
+    fail safe on Redis errors.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _store(self, key, value, ttl=None):
+        if key not in self._data and len(self._data) >= self.max_keys:
+            oldest = next(iter(self._data))
+            self._data.pop(oldest)
+            self._expires.pop(oldest, None)
+        self._data[key] = value
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode('utf-8')
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key) if self._alive(key) else None
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, px=None, nx=False, **kwargs):
+        if nx:
+            # A lock held only in this worker excludes nobody
+            raise RedisUnavailable('Redis unavailable, set nx needs shared state')
+        ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+        with self._lock:
+            self._store(key, self._encode(value), ttl)
+            return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def delete(self, *keys):
+        with self._lock:
+            deleted = 0
+            for key in keys:
+                if self._alive(key):
+                    del self._data[key]
+                    self._expires.pop(key, None)
+                    deleted += 1
+            return deleted
+
+    def expire(self, key, ttl):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + ttl
+            return True
+
+    def scan_iter(self, match=None, **kwargs):
+        with self._lock:
+            keys = [key for key in list(self._data) if self._alive(key)]
+        return iter(key for key in keys if match is None or fnmatch.fnmatchcase(key, match))
+
+class RedisClient:
+    """Redis access layer shared by caches, limits, markers and queues.
+
+    Wraps one explicitly sized blocking connection pool per process. Every
+    command is bounded by the socket timeout, timed into Prometheus and
+    guarded by a circuit breaker. When the breaker is open, commands
+    ``LocalFallback`` implements are served from it; anything else raises
+    RedisUnavailable (a redis.ConnectionError) without touching the network.
+
+    Any redis-py command can be called directly on the client, e.g.
+    ``client.get(key)``; use ``pipelined`` for batches.
+    """
+
+    def __init__(self, url, max_connections=8, pool_timeout=1.0, socket_timeout=0.25,
+                 connect_timeout=0.25, breaker=None, fallback=None):
+        self.pool = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=connect_timeout,
+            health_check_interval=30
+        )
+        self.raw = redis.Redis(connection_pool=self.pool)
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback = fallback or LocalFallback()
+
+    @classmethod
+    def from_app(cls, app):
+        """Build the client from application config."""
+        return cls(
+            app.config['REDIS_URL'],
+            max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+            pool_timeout=app.config['REDIS_POOL_TIMEOUT'],
+            socket_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+            connect_timeout=app.config['REDIS_CONNECT_TIMEOUT'],
+            breaker=CircuitBreaker(
+                failure_threshold=app.config['REDIS_BREAKER_FAILURES'],
+                reset_timeout=app.config['REDIS_BREAKER_RESET_TIMEOUT'],
+                slow_call_threshold=app.config['REDIS_SLOW_CALL_THRESHOLD']
+            )
+        )
+
+    def execute(self, command, fn, fallback):
+        """Run ``fn`` against Redis under the breaker, or ``fallback`` when it is open."""
+        if not self.breaker.allow():
+            REDIS_ERRORS.labels(command, 'circuit_open').inc()
+            if fallback is None:
+                raise RedisUnavailable(f'Redis circuit open, {command} skipped')
+            return fallback()
+
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except redis.RedisError:
+            duration = time.perf_counter() - start
+            self.breaker.record(duration, ok=False)
+            REDIS_ERRORS.labels(command, 'error').inc()
+            if fallback is None:
+                raise
+            return fallback()
+
+        duration = time.perf_counter() - start
+        self.breaker.record(duration, ok=True)
+        REDIS_LATENCY.labels(command).observe(duration)
+        return result
+
+    def __getattr__(self, name):
+        command = getattr(self.raw, name)
+        if not callable(command):
+            return command
+        local = getattr(self.fallback, name, None)
+
+        def call(*args, **kwargs):
+            fallback = (lambda: local(*args, **kwargs)) if local is not None else None
+            return self.execute(name, lambda: command(*args, **kwargs), fallback)
+
+        return call
+
+    def pipelined(self, build, transaction=False, fallback=None):
+        """Queue commands with ``build(pipe)`` and send them in one round trip.
+
+        Returns the list of replies, or ``fallback()`` if Redis is unavailable
+        and a fallback was given.
+        """
+        def run():
+            pipe = self.raw.pipeline(transaction=transaction)
+            build(pipe)
+            return pipe.execute()
+
+        return self.execute('pipeline', run, fallback)
+
+    def get_many(self, keys):
+        """Fetch several keys in one round trip."""
+        keys = list(keys)
+        if not keys:
+            return []
+        return self.execute(
+            'mget',
+            lambda: self.raw.mget(keys),
+            lambda: self.fallback.mget(keys)
+        )
+
+    def set_many(self, mapping, ttl=None):
+        """Set several keys, with an optional shared TTL, in one round trip."""
+        def build(pipe):
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=ttl)
+
+        def fallback():
+            return [self.fallback.set(key, value, ex=ttl) for key, value in mapping.items()]
+
+        return self.pipelined(build, fallback=fallback)
+
+    def reset_after_fork(self):
+        """Drop connections inherited from a parent process."""
+        self.pool.reset()
+
+def init_redis(app):
+    """Attach the shared Redis client to the app."""
+    app.redis = RedisClient.from_app(app)
+    return app.redis
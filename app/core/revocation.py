@@ -0,0 +1,151 @@
+"""Revocation of JWTs without a Redis round trip per request."""
+import hashlib
+import math
+import threading
+import time
+
+import redis
+from flask import current_app
+from prometheus_client import Counter
+
+from app.core.background import ProcessThread
+
+REVOKED_KEY = 'auth:revoked'
+REVOKED_CHANNEL = 'auth:revoked'
+
+REVOCATION_CHECKS = Counter(
+    'token_revocation_checks_total',
+    'Token revocation checks by how they were answered',
+    ['result']  # filter_miss, revoked, false_positive, unavailable
+)
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationList:
+    """Per-process view of revoked JTIs, backed by Redis."""
+
+    def __init__(self, redis_client, redis_url, capacity=100000, error_rate=0.001, sync_interval=30.0):
+        self.redis = redis_client
+        self.redis_url = redis_url
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.filter = BloomFilter(capacity, error_rate)
+        self.synced = False
+        self._listener = ProcessThread(self._listen, 'token-revocation')
+
+    def revoke(self, jti, expires_at):
+        """Revoke a token until its expiry (a Unix timestamp)."""
+        def build(pipe):
+            pipe.zadd(REVOKED_KEY, {jti: expires_at})
+            # Expired tokens are rejected anyway; keep the set small
+            pipe.zremrangebyscore(REVOKED_KEY, '-inf', time.time())
+            pipe.publish(REVOKED_CHANNEL, jti)
+
+        self.redis.pipelined(build, transaction=True)
+        self.filter.add(jti)
+
+    def might_be_revoked(self, jti):
+        """Return False if the token is certainly not revoked."""
+        self._ensure_listening()
+        if not self.synced:
+            return True
+        return jti in self.filter
+
+    def is_revoked(self, jti):
+        """Return whether a token has been revoked."""
+        if not self.might_be_revoked(jti):
+            REVOCATION_CHECKS.labels('filter_miss').inc()
+            return False
+        try:
+            expires_at = self.redis.zscore(REVOKED_KEY, jti)
+        except redis.RedisError:
+            REVOCATION_CHECKS.labels('unavailable').inc()
+            # A filter hit is almost always a real revocation; before the
+            # first sync we know nothing, so keep serving
+            return self.synced
+        revoked = expires_at is not None and expires_at > time.time()
+        REVOCATION_CHECKS.labels('revoked' if revoked else 'false_positive').inc()
+        return revoked
+
+    def sync(self):
+        """Rebuild the filter from the authoritative set."""
+        now = time.time()
+        jtis = self.redis.zrangebyscore(REVOKED_KEY, now, '+inf')
+        rebuilt = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            rebuilt.add(jti.decode('utf-8') if isinstance(jti, bytes) else jti)
+        self.filter = rebuilt
+        self.synced = True
+
+    def _ensure_listening(self):
+        self._listener.start()
+
+    def _listen(self):
+        """Apply published revocations and periodically resync, forever."""
+        # A forked worker's filter gets no updates until its own first sync
+        self.synced = False
+        pubsub = None
+        next_sync = 0.0
+        while True:
+            try:
+                if pubsub is None:
+                    # A dedicated connection so the subscription does not
+                    # hold one of the pool's few connections
+                    pubsub = redis.Redis.from_url(self.redis_url).pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(REVOKED_CHANNEL)
+                    next_sync = 0.0
+                if time.monotonic() >= next_sync:
+                    self.sync()
+                    next_sync = time.monotonic() + self.sync_interval
+                message = pubsub.get_message(timeout=1.0)
+                if message and message['type'] == 'message':
+                    data = message['data']
+                    self.filter.add(data.decode('utf-8') if isinstance(data, bytes) else data)
+            except redis.RedisError:
+                if pubsub is not None:
+                    pubsub.close()
+                pubsub = None
+                time.sleep(min(self.sync_interval, 5.0))
+
+def init_revocation(app, jwt):
+    """Attach the revocation list to the app and check it on every JWT."""
+    revocations = RevocationList(
+        app.redis,
+        app.config['REDIS_URL'],
+        capacity=app.config['REVOCATION_BLOOM_CAPACITY'],
+        error_rate=app.config['REVOCATION_BLOOM_ERROR_RATE'],
+        sync_interval=app.config['REVOCATION_SYNC_INTERVAL']
+    )
+    app.extensions['revocation'] = revocations
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return current_app.extensions['revocation'].is_revoked(jwt_payload['jti'])
+
+    return revocations
@@ -0,0 +1,170 @@
+"""Request coalescing for expensive read paths."""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import redis
+
+# Delete the lock only if we still hold it
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """Run at most one computation per key at a time within a process.
+
+    Callers arriving while a computation is in flight block on its future
+    and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn(), sharing one call among concurrent callers for key."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+class CoalescingCache:
+    """JSON cache with stale-while-revalidate and cross-worker recompute locks.
+
+    Entries are fresh for ``ttl`` seconds and kept for another
+    ``stale_ttl`` seconds. When an entry is stale, the worker that takes the
+    Redis lock recomputes it; everyone else is served the stale value. With
+    no entry at all, the others poll for up to ``wait`` seconds before
+    computing themselves. Redis errors degrade to per-process coalescing.
+    """
+
+    def __init__(self, redis_client, prefix='cache', ttl=30, stale_ttl=300,
+                 lock_ttl=5.0, wait=2.0, poll_interval=0.025):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.flight = SingleFlight()
+
+    @classmethod
+    def from_app(cls, app):
+        """Build the cache from application config."""
+        return cls(
+            app.redis,
+            ttl=app.config['CACHE_TTL'],
+            stale_ttl=app.config['CACHE_STALE_TTL'],
+            lock_ttl=app.config['CACHE_LOCK_TTL'],
+            wait=app.config['CACHE_LOCK_WAIT']
+        )
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """Return the cached value for key, computing it at most once at a time."""
+        return self.flight.do(key, lambda: self._load(key, compute, ttl or self.ttl))
+
+    def delete(self, *keys):
+        """Drop entries so the next read recomputes them."""
+        if keys:
+            try:
+                self.redis.delete(*[self._key(key) for key in keys])
+            except redis.RedisError:
+                pass
+
+    def _read(self, key):
+        try:
+            raw = self.redis.get(self._key(key))
+        except redis.RedisError:
+            return None
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _write(self, key, value, ttl):
+        entry = json.dumps({'value': value, 'fresh_until': time.time() + ttl})
+        try:
+            self.redis.set(self._key(key), entry, ex=int(ttl + self.stale_ttl))
+        except redis.RedisError:
+            pass
+
+    def _acquire(self, key):
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.redis.set(
+                self._key(f'{key}:lock'), token, nx=True, px=int(self.lock_ttl * 1000)
+            )
+        except redis.RedisError:
+            # Cannot coordinate across workers; recompute here
+            return token
+        return token if acquired else None
+
+    def _release(self, key, token):
+        try:
+            self.redis.eval(RELEASE_SCRIPT, 1, self._key(f'{key}:lock'), token)
+        except redis.RedisError:
+            pass
+
+    def _compute(self, key, compute, ttl, token):
+        try:
+            value = compute()
+            self._write(key, value, ttl)
+            return value
+        finally:
+            self._release(key, token)
+
+    def _load(self, key, compute, ttl):
+        entry = self._read(key)
+        if entry is not None and entry['fresh_until'] > time.time():
+            return entry['value']
+
+        token = self._acquire(key)
+        if token is not None:
+            return self._compute(key, compute, ttl, token)
+
+        # Another worker is recomputing
+        if entry is not None:
+            return entry['value']
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self._read(key)
+            if entry is not None:
+                return entry['value']
+
+        value = compute()
+        self._write(key, value, ttl)
+        return value
+
+def init_cache(app):
+    """Attach the coalescing cache to the app."""
+    app.extensions['cache'] = CoalescingCache.from_app(app)
+    return app.extensions['cache']
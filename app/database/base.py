@@ -1,15 +1,45 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 
-db = SQLAlchemy()
-migrate = Migrate()
+from app.database.session import RoutingSession, REPLICA_BIND_KEY, init_replica_routing
+from app.database.sharding import init_sharding
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
 
 def init_db(app):
     """Initialize the database with the Flask app."""
+    replica_uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if replica_uri:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND_KEY] = replica_uri
+        app.config['SQLALCHEMY_BINDS'] = binds
+    shards = app.config.get('SQLALCHEMY_SHARDS')
+    if shards:
+        app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), **shards}
+
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_replica_routing(app)
+
+    # Migrations are only used by the `flask db` CLI. Importing alembic is a
+    # large share of worker boot time, so skip it when serving requests.
+    if os.getenv('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
 
     # Import models here to ensure they are registered with SQLAlchemy
     from app.models.user import User
     from app.models.document import Document
-    from app.models.recent_view import RecentView 
\ No newline at end of file
+    from app.models.recent_view import RecentView
+    from app.models.document_content import DocumentContent
+    from app.models.document_metadata import DocumentMetadataValue
+    from app.models.document_facet import DocumentFacetCount
+    from app.models.upload_session import UploadSession
+    from app.models.owner_shard import OwnerShard, ShardSequence
+    from app.models.group import Group, GroupMember
+    from app.models.document_share import DocumentShare, DocumentVisibility
+
+    # Needs every model registered
+    init_sharding(app)
@@ -0,0 +1,55 @@
+"""Add owner sharding
+
+Revision ID: b89069041911
+Revises: 971b48295e98
+Create Date: 2026-10-19 09:36:45.903021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b89069041911'
+down_revision = '971b48295e98'
+branch_labels = None
+depends_on = None
+
+# Names SQLite's unnamed foreign keys get when batch mode reflects them
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _document_foreign_keys():
+    inspector = sa.inspect(op.get_bind())
+    for fk in inspector.get_foreign_keys('upload_sessions'):
+        if fk['referred_table'] == 'documents':
+            yield fk['name'] or f"fk_upload_sessions_{fk['constrained_columns'][0]}_documents"
+
+
+def upgrade():
+    op.create_table('shard_sequences',
+    sa.Column('name', sa.String(length=128), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('owner_shards',
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=64), nullable=False),
+    sa.Column('moved_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('owner_id')
+    )
+    # Documents may live on another database once sharding is enabled
+    names = list(_document_foreign_keys())
+    with op.batch_alter_table('upload_sessions', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        for name in names:
+            batch_op.drop_constraint(name, type_='foreignkey')
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_upload_sessions_parent_document_id_documents', 'documents', ['parent_document_id'], ['id'])
+        batch_op.create_foreign_key('fk_upload_sessions_document_id_documents', 'documents', ['document_id'], ['id'])
+
+    op.drop_table('owner_shards')
+    op.drop_table('shard_sequences')
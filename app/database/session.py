@@ -0,0 +1,206 @@
+import base64
+import hashlib
+import hmac
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+
+from app.database.sharding import (
+    DEFAULT_SHARD,
+    choose_execute_shards,
+    choose_identity_shards,
+    choose_shard,
+    merge_scattered_select,
+    shard_for_clause
+)
+
+REPLICA_BIND_KEY = 'replica'
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+STICKY_COOKIE = 'db_sticky'
+STICKY_HEADER = 'X-DB-Sticky'
+
+class RoutingSession(ShardedSession, Session):
+    """Session that routes sharded models to shards and reads to the replica.
+
+    Models with ``__shard_by__`` go to their owner's shard when sharding is
+    configured (see app.database.sharding); everything else is the default
+    shard. On the default shard, writes, flushes and anything outside a
+    GET/HEAD request always use the primary. The replica is only chosen when
+    a ReplicaRouter is registered and allows it for the current request.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(
+            shard_chooser=choose_shard,
+            identity_chooser=choose_identity_shards,
+            execute_chooser=choose_execute_shards,
+            db=db,
+            **kwargs
+        )
+        # Ahead of ShardedSession's own hook, which concatenates shard results
+        event.listen(self, 'do_orm_execute', merge_scattered_select, retval=True, insert=True)
+
+    @property
+    def connection_callable(self):
+        # Without shards the unit of work uses ordinary per-mapper connections
+        # (which also keeps ORM bulk inserts working)
+        if current_app.extensions.get('sharding') is None:
+            return None
+        return super().connection_callable
+
+    def _choose_shard_and_assign(self, mapper, instance, **kwargs):
+        # Like ShardedSession's, but DEFAULT_SHARD (None) is a valid token
+        if instance is not None:
+            state = inspect(instance)
+            if state.key is not None:
+                return state.key[2]
+            if state.identity_token is not None:
+                return state.identity_token
+        shard_id = self.shard_chooser(mapper, instance, **kwargs)
+        if instance is not None:
+            state.identity_token = shard_id
+        return shard_id
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard_id=None, instance=None, **kwargs):
+        if bind is None and shard_id is DEFAULT_SHARD:
+            if mapper is not None:
+                shard_id = self._choose_shard_and_assign(inspect(mapper), instance, clause=clause)
+            else:
+                shard_id = shard_for_clause(clause)
+        if bind is None and shard_id is not DEFAULT_SHARD:
+            return self._db.engines[shard_id]
+
+        if bind is None and not self._flushing:
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None and _use_replica():
+                return engine
+        return Session.get_bind(self, mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _use_replica():
+    """Decide once per request whether reads may go to the replica."""
+    if not has_request_context() or request.method not in SAFE_METHODS:
+        return False
+    if '_db_use_replica' not in g:
+        router = current_app.extensions.get('replica_router')
+        g._db_use_replica = router is not None and router.allow_replica()
+    return g._db_use_replica
+
+def _request_identity():
+    """Identify the caller for read-your-writes stickiness."""
+    decoded_jwt = g.get('_jwt_extended_jwt')
+    if decoded_jwt:
+        identity = decoded_jwt.get(current_app.config.get('JWT_IDENTITY_CLAIM', 'sub'))
+        if identity is not None:
+            return f'user:{identity}'
+    return f'addr:{request.remote_addr}'
+
+def _sticky_signature(identity, expires):
+    secret = current_app.config['SECRET_KEY'].encode('utf-8')
+    message = f'sticky:{identity}:{expires}'.encode('utf-8')
+    digest = hmac.new(secret, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+def mark_sticky(response, identity, now=None):
+    """Pin identity to the primary for REPLICA_STICKY_SECONDS on a Flask or aiohttp response.
+
+    The marker is a signed expiry, set as a cookie for browsers and echoed in
+    a header for API clients to send back, so reads need no lookup to check it.
+    """
+    seconds = current_app.config['REPLICA_STICKY_SECONDS']
+    expires = int(now if now is not None else time.time()) + seconds
+    token = f'{expires}.{_sticky_signature(identity, expires)}'
+    response.set_cookie(
+        STICKY_COOKIE, token, max_age=seconds, httponly=True, samesite='Lax',
+        secure=current_app.config.get('SESSION_COOKIE_SECURE', False)
+    )
+    response.headers[STICKY_HEADER] = token
+    return response
+
+def verify_sticky(identity, token, now=None):
+    """Check a stickiness marker was issued to identity and has not expired."""
+    expires, _, signature = (token or '').partition('.')
+    if not expires.isdigit() or int(expires) < (now if now is not None else time.time()):
+        return False
+    return hmac.compare_digest(_sticky_signature(identity, int(expires)), signature)
+
+def mysql_replica_lag(engine):
+    """Return replication lag in seconds, or None if replication is broken."""
+    with engine.connect() as conn:
+        try:
+            row = conn.execute(text('SHOW REPLICA STATUS')).mappings().first()
+            key = 'Seconds_Behind_Source'
+        except Exception:
+            row = conn.execute(text('SHOW SLAVE STATUS')).mappings().first()
+            key = 'Seconds_Behind_Master'
+    if row is None:
+        # Not configured as a replica; treat as caught up
+        return 0
+    return row[key]
+
+def default_lag_probe(engine):
+    """Pick a lag probe for the replica's dialect."""
+    if engine.dialect.name == 'mysql':
+        return mysql_replica_lag(engine)
+    return 0
+
+class ReplicaRouter:
+    """Per-process routing state for the read replica.
+
+    Reads go to the replica unless the caller sends a stickiness marker from
+    a write in the last ``REPLICA_STICKY_SECONDS`` (see mark_sticky) or the
+    last lag probe found the replica more than ``REPLICA_MAX_LAG_SECONDS``
+    behind. The lag probe runs at most once per
+    ``REPLICA_LAG_CHECK_INTERVAL`` per worker.
+    """
+
+    def __init__(self, app, lag_probe=default_lag_probe):
+        self.app = app
+        self.lag_probe = lag_probe
+        self.max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+        self.check_interval = app.config['REPLICA_LAG_CHECK_INTERVAL']
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._healthy = False
+
+        app.after_request(self.after_request)
+
+    def replica_healthy(self):
+        """Return whether the replica is within the allowed lag."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._healthy
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                from app.database.base import db
+                try:
+                    lag = self.lag_probe(db.engines[REPLICA_BIND_KEY])
+                    self._healthy = lag is not None and lag <= self.max_lag
+                except Exception as e:
+                    current_app.logger.warning(f"Replica lag probe failed: {str(e)}")
+                    self._healthy = False
+                self._checked_at = now
+        return self._healthy
+
+    def is_sticky(self):
+        """Check whether the caller wrote within the stickiness window."""
+        token = request.cookies.get(STICKY_COOKIE) or request.headers.get(STICKY_HEADER)
+        return verify_sticky(_request_identity(), token)
+
+    def allow_replica(self):
+        """Return whether the current request may read from the replica."""
+        return self.replica_healthy() and not self.is_sticky()
+
+    def after_request(self, response):
+        """Pin the caller to the primary after a successful write."""
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            mark_sticky(response, _request_identity())
+        return response
+
+def init_replica_routing(app):
+    """Register the read replica router when a replica is configured."""
+    if app.config.get('SQLALCHEMY_REPLICA_URI'):
+        app.extensions['replica_router'] = ReplicaRouter(app)
@@ -0,0 +1,583 @@
+"""Optional horizontal sharding of document data by owner."""
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import MetaData, event, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import set_shard_id
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    BooleanClauseList,
+    ColumnElement,
+    Label,
+    UnaryExpression
+)
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.selectable import AliasedReturnsRows, Select
+from sqlalchemy.sql.util import find_tables
+
+# Shard id for everything that is not sharded (primary, or the replica for
+# reads). None is also the identity token a plain Session gives objects.
+DEFAULT_SHARD = None
+
+class ShardingError(RuntimeError):
+    """Raised when a statement cannot be routed to a shard."""
+
+def jump_hash(key, buckets):
+    """Map an integer key to one of ``buckets`` (Lamping and Veach).
+
+    Growing the bucket count moves only the keys that land on the new bucket.
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+def shard_by(mapper):
+    """Return a mapper's ``__shard_by__`` column name, or None if not sharded."""
+    return getattr(mapper.class_, '__shard_by__', None) if mapper is not None else None
+
+def _colocated(parent, child):
+    # Rows keyed by a document's owner share a shard; recent views follow the viewer
+    owners = ('owner_id', 'document')
+    return shard_by(parent) in owners and shard_by(child) in owners
+
+class ShardMap:
+    """Owner to shard placement, with overrides cached from the primary."""
+
+    def __init__(self, names, engine, ttl=30.0):
+        self.names = list(names)
+        self.engine = engine
+        self.ttl = ttl
+        self._overrides = {}
+        self._move_targets = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def default_shard(self, owner_id):
+        return self.names[jump_hash(int(owner_id), len(self.names))]
+
+    def shard_for(self, owner_id):
+        """Return the shard holding an owner's rows."""
+        owner_id = int(owner_id)
+        return self.overrides().get(owner_id) or self.default_shard(owner_id)
+
+    def move_targets(self):
+        """Return shards that owners have been moved onto."""
+        self.overrides()
+        return self._move_targets
+
+    def overrides(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._overrides
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._load()
+        return self._overrides
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _load(self):
+        from app.models.owner_shard import OwnerShard
+
+        table = OwnerShard.__table__
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(select(table.c.owner_id, table.c.shard, table.c.moved_at)).all()
+        except Exception as e:
+            # Keep routing with what we had rather than failing every query
+            current_app.logger.warning(f"Could not load shard map: {str(e)}")
+            self._loaded_at = time.monotonic()
+            return
+        self._overrides = {owner_id: shard for owner_id, shard, _ in rows}
+        self._move_targets = frozenset(shard for _, shard, moved_at in rows if moved_at is not None)
+        self._loaded_at = time.monotonic()
+
+class IdAllocator:
+    """Hand out ids for sharded tables from per-shard ranges, a block at a time."""
+
+    def __init__(self, names, engine, stride, block_size=1000):
+        self.names = list(names)
+        self.engine = engine
+        self.stride = stride
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def home_shard(self, id):
+        """Return the shard an id was allocated for, or None if out of range."""
+        index = (int(id) - 1) // self.stride
+        return self.names[index] if 0 <= index < len(self.names) else None
+
+    def next_id(self, table_name, shard):
+        key = f'{table_name}:{shard}'
+        with self._lock:
+            next_id, end = self._blocks.get(key, (0, 0))
+            if next_id >= end:
+                next_id, end = self._reserve(key, self.names.index(shard) * self.stride + 1)
+            self._blocks[key] = (next_id + 1, end)
+            return next_id
+
+    def _reserve(self, key, start):
+        from app.models.owner_shard import ShardSequence
+
+        table = ShardSequence.__table__
+        for _ in range(3):
+            with self.engine.begin() as conn:
+                updated = conn.execute(
+                    update(table).where(table.c.name == key).values(next_id=table.c.next_id + self.block_size)
+                ).rowcount
+                if updated:
+                    end = conn.execute(select(table.c.next_id).where(table.c.name == key)).scalar_one()
+                    return end - self.block_size, end
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(table.insert().values(name=key, next_id=start + self.block_size))
+                return start, start + self.block_size
+            except IntegrityError:
+                # Another worker created the sequence first; take the next block
+                continue
+        raise ShardingError(f'Could not reserve ids for {key}')
+
+class Sharding:
+    """Routing decisions for the sharded session."""
+
+    def __init__(self, app, shard_map, ids):
+        self.app = app
+        self.map = shard_map
+        self.ids = ids
+
+    @property
+    def names(self):
+        return self.map.names
+
+    def shard_for_instance(self, mapper, instance):
+        key = shard_by(mapper)
+        if key != 'document':
+            owner_id = getattr(instance, key)
+            if owner_id is None:
+                raise ShardingError(f'{mapper.class_.__name__}.{key} must be set before it is saved')
+            return self.map.shard_for(owner_id)
+
+        # Follow the document without loading it in the middle of a flush
+        state = inspect(instance)
+        document = state.dict.get('document')
+        if document is None and state.session is not None:
+            for token in self.shards_for_ids([instance.document_id]):
+                document = state.session.identity_map.get(
+                    state.session.identity_key(type(instance).document.property.mapper.class_,
+                                               instance.document_id, identity_token=token)
+                )
+                if document is not None:
+                    break
+        if document is not None:
+            return shard_of(document)
+        candidates = self.shards_for_ids([instance.document_id])
+        if len(candidates) == 1:
+            return candidates[0]
+        raise ShardingError(f'Load document {instance.document_id} before saving its {mapper.class_.__name__}')
+
+    def shards_for_ids(self, ids):
+        """Return the shards rows with these ids can be on."""
+        shards = {self.ids.home_shard(id) for id in ids} | self.map.move_targets()
+        shards.discard(None)
+        return [name for name in self.names if name in shards] or list(self.names)
+
+    def shards_for_statement(self, statement, mapper):
+        key = shard_by(mapper)
+        owner_ids = _criteria_values(statement, mapper, key) if key != 'document' else None
+        if owner_ids:
+            return sorted({self.map.shard_for(owner_id) for owner_id in owner_ids})
+        id_column = 'document_id' if key == 'document' else 'id'
+        ids = _criteria_values(statement, mapper, id_column)
+        if ids:
+            return self.shards_for_ids(ids)
+        return list(self.names)
+
+def _criteria_statement(statement):
+    # Query.count() and friends wrap the real query in a subquery
+    while isinstance(statement, Select) and statement.whereclause is None:
+        froms = statement.get_final_froms()
+        if len(froms) != 1 or not isinstance(froms[0], AliasedReturnsRows):
+            break
+        inner = froms[0]
+        while isinstance(inner, AliasedReturnsRows):
+            inner = inner.element
+        statement = inner
+    return statement
+
+def _conjuncts(clause):
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        for element in clause.clauses:
+            yield from _conjuncts(element)
+    elif clause is not None:
+        yield clause
+
+def _criteria_values(statement, mapper, column_name):
+    """Return values a statement's top-level AND pins a column to, or None."""
+    statement = _criteria_statement(statement)
+    whereclause = getattr(statement, 'whereclause', None)
+    column = mapper.local_table.c.get(column_name)
+    if whereclause is None or column is None:
+        return None
+    for clause in _conjuncts(whereclause):
+        if not isinstance(clause, BinaryExpression) or not isinstance(clause.right, BindParameter):
+            continue
+        left = clause.left
+        if getattr(left, 'table', None) is None or getattr(left, 'key', None) != column_name:
+            continue
+        if left.table is not column.table and getattr(left.table, 'element', None) is not column.table:
+            continue
+        value = clause.right.effective_value
+        if clause.operator is operators.eq and value is not None:
+            return [value]
+        if clause.operator is operators.in_op and value:
+            return list(value)
+    return None
+
+def _sharding():
+    return current_app.extensions.get('sharding') if has_app_context() else None
+
+def choose_shard(mapper, instance, clause=None, **kwargs):
+    """Shard chooser: where to write an instance (or run a statement on a mapper)."""
+    sharding = _sharding()
+    if sharding is None or shard_by(mapper) is None:
+        return DEFAULT_SHARD
+    if instance is not None:
+        return sharding.shard_for_instance(mapper, instance)
+    raise ShardingError(f'No shard given for a statement on {mapper.class_.__name__}')
+
+def choose_identity_shards(mapper, primary_key, *, lazy_loaded_from=None, **kwargs):
+    """Identity chooser: where a primary key may be found."""
+    sharding = _sharding()
+    if sharding is None or shard_by(mapper) is None:
+        return [DEFAULT_SHARD]
+    if lazy_loaded_from is not None and _colocated(lazy_loaded_from.mapper, mapper) and lazy_loaded_from.key:
+        return [lazy_loaded_from.key[2]]
+    if len(primary_key) == 1 and isinstance(primary_key[0], int):
+        return sharding.shards_for_ids(primary_key)
+    return list(sharding.names)
+
+def choose_execute_shards(orm_context):
+    """Execute chooser: the shards an ORM statement runs on."""
+    sharding = _sharding()
+    mapper = orm_context.bind_mapper
+    if sharding is None or shard_by(mapper) is None:
+        return [DEFAULT_SHARD]
+    parent = orm_context.lazy_loaded_from if orm_context.is_select else None
+    if parent is not None and parent.key and _colocated(parent.mapper, mapper):
+        return [parent.key[2]]
+    return sharding.shards_for_statement(orm_context.statement, mapper)
+
+def _pinned(orm_context):
+    """Tell whether a statement already names its shard."""
+    if any(isinstance(option, set_shard_id) for option in orm_context._non_compile_orm_options):
+        return True
+    if orm_context.load_options._identity_token is not None:
+        return True
+    return '_sa_shard_id' in orm_context.execution_options or 'shard_id' in orm_context.bind_arguments
+
+def _is_count(statement):
+    columns = list(statement.selected_columns)
+    if len(columns) != 1:
+        return False
+    column = columns[0].element if isinstance(columns[0], Label) else columns[0]
+    return isinstance(column, FunctionElement) and column.name == 'count'
+
+def _sort_keys(statement):
+    """Return [(expression, descending)] for a statement's ORDER BY."""
+    keys = []
+    for clause in statement._order_by_clauses:
+        descending = False
+        if isinstance(clause, UnaryExpression) and clause.modifier in (operators.desc_op, operators.asc_op):
+            descending = clause.modifier is operators.desc_op
+            clause = clause.element
+        if not isinstance(clause, ColumnElement) or isinstance(clause, (Label, UnaryExpression)):
+            raise ShardingError(f'Cannot merge a scattered query ordered by {clause}; pin it to an owner')
+        keys.append((clause, descending))
+    return keys
+
+def merge_scattered_select(orm_context):
+    """do_orm_execute hook: run a multi-shard SELECT on each shard and merge the results.
+
+    Returns None (leaving the statement to ShardedSession) when the statement
+    is pinned, reaches one shard, or needs no merging.
+    """
+    sharding = _sharding()
+    statement = orm_context.statement
+    if sharding is None or not orm_context.is_select or not isinstance(statement, Select):
+        return None
+    if _pinned(orm_context):
+        return None
+    limit, offset = statement._limit, statement._offset
+    is_count = _is_count(statement)
+    if not (statement._order_by_clauses or limit is not None or offset or is_count):
+        return None
+    shards = orm_context.session.execute_chooser(orm_context)
+    if len(shards) < 2:
+        return None
+    if statement._group_by_clauses:
+        raise ShardingError('Cannot order or limit a scattered GROUP BY query; pin it to an owner')
+
+    def run(shard_id, shard_statement):
+        bind_arguments = dict(orm_context.bind_arguments, shard_id=shard_id)
+        return orm_context.invoke_statement(statement=shard_statement, bind_arguments=bind_arguments).freeze()
+
+    if is_count:
+        results = [run(shard_id, statement) for shard_id in shards]
+        total = sum(row[0] or 0 for result in results for row in result.rewrite_rows())
+        return results[0].with_new_rows([(total,)])()
+
+    # Each shard returns its first offset + limit rows, with the sort keys
+    # appended so the rows can be ordered across shards
+    keys = _sort_keys(statement)
+    width = len(statement.column_descriptions)
+    shard_statement = statement.add_columns(*(key for key, _ in keys)).offset(None)
+    if limit is not None:
+        shard_statement = shard_statement.limit(limit + (offset or 0))
+    results = [run(shard_id, shard_statement) for shard_id in shards]
+    rows = [row for result in results for row in result.rewrite_rows()]
+    for index in reversed(range(len(keys))):
+        column = width + index
+        rows.sort(key=lambda row: (row[column] is not None, row[column]), reverse=keys[index][1])
+    end = None if limit is None else (offset or 0) + limit
+    rows = rows[offset or 0:end]
+    merged = results[0].with_new_rows(rows)().columns(*range(width))
+    # The extra columns made legacy Query see tuples; restore its single-entity view
+    description = statement.column_descriptions[0]
+    single_entity = (
+        width == 1 and description['entity'] is not None and description['expr'] is description['entity']
+        and not orm_context.load_options._only_return_tuples
+    )
+    merged._attributes = merged._attributes.union({'is_single_entity': single_entity})
+    return merged
+
+def shard_for_clause(clause):
+    """Shard for a Core statement executed through the session without a shard id."""
+    sharding = _sharding()
+    if sharding is None or clause is None:
+        return DEFAULT_SHARD
+    for table in find_tables(clause, include_crud=True):
+        if table.name in sharded_tables():
+            raise ShardingError(
+                f"Statement on sharded table {table.name} needs bind_arguments={{'shard_id': ...}}"
+            )
+    return DEFAULT_SHARD
+
+def sharded_tables():
+    """Return {table name: mapper} for every sharded model."""
+    from app.database.base import db
+
+    return {
+        mapper.local_table.name: mapper
+        for mapper in db.Model.registry.mappers
+        if shard_by(mapper) is not None
+    }
+
+def shard_ids():
+    """Return every shard id to run a per-shard statement on."""
+    sharding = _sharding()
+    return list(sharding.names) if sharding is not None else [DEFAULT_SHARD]
+
+def shard_of(instance):
+    """Return the shard a persistent or pending instance belongs to."""
+    state = inspect(instance)
+    if state.key is not None:
+        return state.key[2]
+    if state.identity_token is not None:
+        return state.identity_token
+    return choose_shard(state.mapper, instance)
+
+def shard_for_owner(owner_id):
+    """Return the shard holding an owner's rows (the default shard when unsharded)."""
+    sharding = _sharding()
+    return sharding.map.shard_for(owner_id) if sharding is not None else DEFAULT_SHARD
+
+def engine_for(shard_id):
+    """Return the engine behind a shard id."""
+    from app.database.base import db
+
+    return db.engine if shard_id is DEFAULT_SHARD else db.engines[shard_id]
+
+def _assign_id(mapper, connection, target):
+    """Give new sharded rows an id from their shard's range."""
+    sharding = _sharding()
+    if sharding is None or target.id is not None:
+        return
+    target.id = sharding.ids.next_id(mapper.local_table.name, shard_of(target))
+
+_listeners_installed = False
+
+def _install_listeners():
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    for mapper in sharded_tables().values():
+        if 'id' in mapper.local_table.c and mapper.local_table.c.id.primary_key:
+            event.listen(mapper, 'before_insert', _assign_id)
+    _listeners_installed = True
+
+def shard_metadata():
+    """Copy the sharded tables, keeping only foreign keys between co-located rows."""
+    metadata = MetaData()
+    tables = sharded_tables()
+    for name, mapper in tables.items():
+        table = mapper.local_table.to_metadata(metadata)
+        for constraint in list(table.foreign_key_constraints):
+            referred = tables.get(constraint.elements[0].target_fullname.split('.')[0])
+            if referred is None or not _colocated(mapper, referred):
+                table.constraints.discard(constraint)
+                for element in constraint.elements:
+                    element.parent.foreign_keys.discard(element)
+                    table.foreign_keys.discard(element)
+    return metadata
+
+def create_shard_schema():
+    """Create the sharded tables on every shard that lacks them."""
+    from app.database.base import db
+
+    metadata = shard_metadata()
+    for name in shard_ids():
+        metadata.create_all(db.engines[name])
+    return metadata
+
+def owner_rows(owner_id):
+    """Yield (table, condition) selecting an owner's rows in each sharded table."""
+    tables = sharded_tables()
+    documents = tables['documents'].local_table
+    document_ids = select(documents.c.id).where(documents.c.owner_id == owner_id)
+    for name, mapper in tables.items():
+        table = mapper.local_table
+        key = shard_by(mapper)
+        if key == 'document':
+            yield table, table.c.document_id.in_(document_ids)
+        else:
+            yield table, table.c[key] == owner_id
+
+def _key_clause(primary_key, key):
+    return [column == value for column, value in zip(primary_key, key)]
+
+def copy_owner(owner_id, source, target, seen=None):
+    """Copy an owner's rows to another shard; return (rows changed, {table: keys on the source}).
+
+    A row already on the target is only replaced by a newer source copy (by
+    ``updated_at``), so writes made on the target after the map switch win.
+    Given the keys an earlier pass returned, rows that pass saw are not
+    brought back if the target deleted them, and are deleted from the target
+    if the source no longer has them. Facet counts are not copied; move_owner
+    rebuilds them on the target.
+    """
+    changed = 0
+    keys = {}
+    with engine_for(source).connect() as reader, engine_for(target).begin() as writer:
+        if writer.dialect.name == 'mysql':
+            # Tables are copied one at a time, so children may briefly lead parents
+            writer.exec_driver_sql('SET FOREIGN_KEY_CHECKS=0')
+        for table, condition in owner_rows(owner_id):
+            if table.name == 'document_facet_counts':
+                continue
+            primary_key = list(table.primary_key.columns)
+            stamped = 'updated_at' in table.c
+            columns = primary_key + ([table.c.updated_at] if stamped else [])
+            existing = {
+                tuple(row[:len(primary_key)]): row[-1] if stamped else None
+                for row in writer.execute(select(*columns).where(condition))
+            }
+            before = seen.get(table.name, set()) if seen is not None else set()
+            found = keys[table.name] = set()
+
+            result = reader.execution_options(stream_results=True).execute(select(table).where(condition))
+            for partition in result.mappings().partitions(500):
+                inserts = []
+                for row in partition:
+                    key = tuple(row[column.name] for column in primary_key)
+                    found.add(key)
+                    if key not in existing:
+                        if key not in before:
+                            inserts.append(dict(row))
+                    elif stamped and row['updated_at'] > existing[key]:
+                        writer.execute(table.update().where(*_key_clause(primary_key, key)).values(dict(row)))
+                        changed += 1
+                if inserts:
+                    writer.execute(table.insert(), inserts)
+                    changed += len(inserts)
+
+            # Deleted on the source since the earlier pass
+            for key in (before - found) & existing.keys():
+                writer.execute(table.delete().where(*_key_clause(primary_key, key)))
+                changed += 1
+        if writer.dialect.name == 'mysql':
+            writer.exec_driver_sql('SET FOREIGN_KEY_CHECKS=1')
+    return changed, keys
+
+def delete_owner(owner_id, shard):
+    """Delete an owner's rows from a shard; children first."""
+    tables = list(owner_rows(owner_id))
+    tables.sort(key=lambda item: item[0].name == 'documents')
+    deleted = 0
+    with engine_for(shard).begin() as conn:
+        for table, condition in tables:
+            deleted += conn.execute(table.delete().where(condition)).rowcount
+    return deleted
+
+def move_owner(owner_id, target, settle=None, log=None):
+    """Move an owner's rows to another shard while it stays online.
+
+    Rows are copied, the shard map is switched, and after ``settle``
+    seconds (long enough for every worker to reload the map) changes made
+    on the old shard in the meantime are caught up (see copy_owner) before
+    the old copies are deleted and the owner's facet counts are rebuilt.
+    """
+    from app.database.base import db
+    from app.models.document_facet import DocumentFacetCount
+    from app.models.owner_shard import OwnerShard
+
+    sharding = _sharding()
+    if sharding is None:
+        raise ShardingError('Sharding is not configured')
+    if target not in sharding.names:
+        raise ShardingError(f'Unknown shard {target}')
+    log = log or (lambda message: None)
+    source = sharding.map.shard_for(owner_id)
+    if source == target:
+        return 0
+
+    copied, seen = copy_owner(owner_id, source, target)
+    log(f'copied rows={copied} from={source} to={target}')
+
+    OwnerShard.assign(owner_id, target, moved=True)
+    db.session.commit()
+    sharding.map.invalidate()
+
+    time.sleep(sharding.map.ttl if settle is None else settle)
+    caught_up, _ = copy_owner(owner_id, source, target, seen=seen)
+    deleted = delete_owner(owner_id, source)
+    # Counts were not copied; recount from the documents now on the target
+    DocumentFacetCount.rebuild(owner_id)
+    log(f'caught up rows={caught_up} deleted={deleted} from={source}')
+    return copied + caught_up
+
+def init_sharding(app):
+    """Register the shard engines' routing when shards are configured."""
+    from app.database.base import db
+
+    shards = app.config.get('SQLALCHEMY_SHARDS') or {}
+    if not shards:
+        return None
+    with app.app_context():
+        primary = db.engine
+    names = list(shards)
+    sharding = Sharding(
+        app,
+        ShardMap(names, primary, ttl=app.config['SHARD_MAP_TTL']),
+        IdAllocator(names, primary, app.config['SHARD_ID_STRIDE'], app.config['SHARD_ID_BLOCK'])
+    )
+    app.extensions['sharding'] = sharding
+    _install_listeners()
+    return sharding
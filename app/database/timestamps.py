@@ -0,0 +1,118 @@
+"""Coalesced writes for low-value, high-frequency timestamps."""
+import atexit
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, inspect, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.background import ProcessThread
+from app.database.sharding import engine_for, shard_of
+
+class TimestampCoalescer:
+    """Buffer timestamp updates in memory and write them in batches."""
+
+    def __init__(self, app, interval=5.0, max_pending=5000, batch_size=500):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        # (table, column, shard) -> {primary key: newest value}
+        self._pending = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = ProcessThread(self._run, 'timestamp-flush')
+
+    def touch(self, instance, column, value=None):
+        """Set instance.column to value (default now) and write it later."""
+        value = value or datetime.utcnow()
+        set_committed_value(instance, column, value)
+        table = instance.__table__
+        key = inspect(instance).identity[0]
+        shard_id = shard_of(instance)
+        with self._lock:
+            rows = self._pending.setdefault((table, column, shard_id), {})
+            if key not in rows:
+                self._count += 1
+            if rows.get(key) is None or rows[key] < value:
+                rows[key] = value
+            full = self._count >= self.max_pending
+
+        if self.interval <= 0:
+            self.flush()
+            return
+        self._ensure_flushing()
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write every pending value now; return the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._count = 0
+            if not pending:
+                return 0
+            shards = {}
+            for (table, column, shard_id), rows in pending.items():
+                shards.setdefault(shard_id, []).append((table, column, rows))
+            try:
+                with self.app.app_context():
+                    for shard_id, groups in shards.items():
+                        with engine_for(shard_id).begin() as connection:
+                            for table, column, rows in groups:
+                                self._write(connection, table, column, rows)
+            except Exception as e:
+                self._restore(pending)
+                self.app.logger.warning(f"Timestamp flush failed: {str(e)}")
+                return 0
+            return sum(len(rows) for rows in pending.values())
+
+    def _write(self, connection, table, column, rows):
+        primary_key = table.primary_key.columns.values()[0]
+        items = sorted(rows.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = dict(items[start:start + self.batch_size])
+            values = {column: case(batch, value=primary_key, else_=table.c[column])}
+            if 'updated_at' in table.c:
+                # A touch is not a modification; keep onupdate from firing
+                values['updated_at'] = table.c.updated_at
+            connection.execute(update(table).where(primary_key.in_(batch)).values(values))
+
+    def _restore(self, pending):
+        # Merge a failed batch back so the next flush retries it
+        with self._lock:
+            for group, rows in pending.items():
+                current = self._pending.setdefault(group, {})
+                for key, value in rows.items():
+                    if key not in current:
+                        self._count += 1
+                        current[key] = value
+
+    def _ensure_flushing(self):
+        self._flusher.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+def touch(instance, column, value=None):
+    """Record a timestamp update for a model instance (see TimestampCoalescer)."""
+    current_app.extensions['timestamps'].touch(instance, column, value)
+
+def init_timestamps(app):
+    """Attach the coalescer to the app and flush it at interpreter exit."""
+    coalescer = TimestampCoalescer(
+        app,
+        interval=app.config['TIMESTAMP_FLUSH_INTERVAL'],
+        max_pending=app.config['TIMESTAMP_MAX_PENDING'],
+        batch_size=app.config['TIMESTAMP_BATCH_SIZE']
+    )
+    app.extensions['timestamps'] = coalescer
+    atexit.register(coalescer.flush)
+    return coalescer
@@ -1,12 +1,18 @@
 import os
 import uuid
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.utils import secure_filename
+from app.database.session import RoutingSession
+from app.database.sharding import shard_of
 from app.models.base import BaseModel, db
-from app.core.config import Config
+from app.services.storage import get_storage
 
 class Document(BaseModel):
     """Document model for financial document management."""
     
     __tablename__ = 'documents'
+    # Lives on the owner's shard when sharding is configured
+    __shard_by__ = 'owner_id'
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -19,7 +25,8 @@ class Document(BaseModel):
     # Document metadata
     document_type = db.Column(db.String(50), nullable=False)  # e.g., 'bank_statement', 'invoice', 'tax_form'
     document_date = db.Column(db.Date)
-    metadata = db.Column(db.JSON)  # Flexible metadata storage
+    # 'metadata' is reserved on declarative models, so the attribute is renamed
+    doc_metadata = db.Column('metadata', db.JSON)  # Flexible metadata storage
     
     # Security and access control
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -29,35 +36,73 @@ class Document(BaseModel):
     # Version control
     version = db.Column(db.Integer, default=1)
     parent_id = db.Column(db.Integer, db.ForeignKey('documents.id'))
+    # Materialized lineage: every version points at the first one (itself
+    # for the original) and exactly one row per chain is the latest
+    root_id = db.Column(db.Integer, db.ForeignKey('documents.id'))
+    is_latest = db.Column(db.Boolean, nullable=False, default=True)
     
     # Relationships
     recent_views = db.relationship('RecentView', backref='document', lazy='dynamic')
     versions = db.relationship(
         'Document',
         backref=db.backref('parent', remote_side=[id]),
+        foreign_keys=[parent_id],
         lazy='dynamic'
     )
 
+    __table_args__ = (
+        # History of a chain in version order, and its latest row
+        db.Index('idx_documents_root_version', 'root_id', 'version'),
+        # search() newest first, with and without a document_type filter
+        db.Index('idx_documents_owner_active_type_created', 'owner_id', 'is_active', 'document_type', 'created_at'),
+        db.Index('idx_documents_owner_active_created', 'owner_id', 'is_active', 'created_at'),
+    )
+
     def __init__(self, **kwargs):
         """Initialize a new document."""
+        file = kwargs.pop('file', None)
         super(Document, self).__init__(**kwargs)
-        if 'file' in kwargs:
-            self._process_file(kwargs['file'])
+        if file is not None:
+            self._process_file(file)
+
+    @staticmethod
+    def build_filename(owner_id, document_type, original_filename):
+        """Build the unique stored filename for an uploaded file."""
+        unique_id = str(uuid.uuid4())
+        return f"{owner_id}_{document_type}_{unique_id}_{secure_filename(original_filename)}"
 
     def _process_file(self, file):
         """Process and store the uploaded file."""
-        unique_id = str(uuid.uuid4())
-        filename = f"{self.owner_id}_{self.document_type}_{unique_id}_{file.filename}"
-        file_path = os.path.join(Config.UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        filename = self.build_filename(self.owner_id, self.document_type, file.filename)
         
         self.file_path = filename
-        self.file_size = os.path.getsize(file_path)
+        if getattr(file, 'path', None):
+            # Already assembled on local disk (resumable uploads): move it
+            self.file_size = get_storage().save_path(filename, file.path)
+        else:
+            self.file_size = get_storage().save(filename, file.stream)
         self.mime_type = file.content_type
         self.file_type = os.path.splitext(filename)[1][1:].lower()
 
     def create_version(self, file):
-        """Create a new version of the document."""
+        """Create a new version of the document.
+
+        The new row becomes the latest version of the chain. The chain's root
+        row is locked while the head is swapped so concurrent uploads queue
+        instead of producing two latest versions.
+        """
+        root_id = self.root_id or self.id
+        db.session.query(Document.id).filter(
+            Document.id == root_id
+        ).with_for_update().one()
+        head = Document.get_latest_version(root_id) or self
+        head.is_latest = False
+        # The head may not be the highest version once a newer one is deactivated
+        last_version = db.session.scalar(
+            db.select(db.func.max(Document.version)).where(Document.root_id == root_id),
+            bind_arguments={'shard_id': shard_of(self)}
+        ) or head.version
+
         new_version = Document(
             title=self.title,
             description=self.description,
@@ -65,20 +110,44 @@ class Document(BaseModel):
             owner_id=self.owner_id,
             is_confidential=self.is_confidential,
             access_level=self.access_level,
-            version=self.version + 1,
-            parent_id=self.id,
+            version=last_version + 1,
+            parent_id=head.id,
+            root_id=root_id,
+            is_latest=True,
             file=file
         )
         new_version.save()
         return new_version
 
+    @classmethod
+    def get_latest_version(cls, root_id):
+        """Get the latest version of a document chain."""
+        return cls.query.filter_by(root_id=root_id, is_latest=True).first()
+
+    def get_history(self):
+        """Get every version of this document's chain, newest first."""
+        return Document.query.filter_by(
+            root_id=self.root_id or self.id
+        ).order_by(
+            Document.version.desc()
+        ).all()
+
     def get_full_path(self):
-        """Get the full path to the document file."""
-        return os.path.join(Config.UPLOAD_FOLDER, self.file_path)
+        """Get the local path to the document file, or None if not on local disk."""
+        return get_storage().local_path(self.file_path)
+
+    def open_file(self):
+        """Open the document file from the storage backend."""
+        return get_storage().open(self.file_path)
+
+    def delete_file(self):
+        """Remove the document file from the storage backend."""
+        get_storage().delete(self.file_path)
 
     def to_dict(self):
         """Convert document instance to dictionary."""
         data = super().to_dict()
+        data['metadata'] = self.doc_metadata
         # Add additional computed fields
         data['owner'] = self.owner.to_dict() if self.owner else None
         data['download_url'] = f"/api/v1/documents/{self.id}/download"
@@ -97,20 +166,63 @@ class Document(BaseModel):
         )
 
     @classmethod
-    def search(cls, query, user_id=None, document_type=None, page=1, per_page=20):
-        """Search documents with optional filters."""
+    def search_filters(cls, query=None, user_id=None, document_type=None,
+                       include_content=False, metadata_filters=None, latest_only=False,
+                       date_from=None, date_to=None):
+        """Build the filter conditions shared by search, facet counts and archives."""
         filters = [cls.is_active == True]
         
         if user_id:
             filters.append(cls.owner_id == user_id)
+        if latest_only:
+            filters.append(cls.is_latest == True)
         if document_type:
             filters.append(cls.document_type == document_type)
         if query:
             search = f"%{query}%"
-            filters.append(db.or_(
+            conditions = [
                 cls.title.ilike(search),
                 cls.description.ilike(search)
-            ))
+            ]
+            if include_content:
+                from app.models.document_content import DocumentContent
+                conditions.append(cls.id.in_(DocumentContent.matching_document_ids(query)))
+            filters.append(db.or_(*conditions))
+        if date_from:
+            filters.append(cls.document_date >= date_from)
+        if date_to:
+            filters.append(cls.document_date <= date_to)
+        if metadata_filters:
+            from app.models.document_metadata import DocumentMetadataValue
+            for key, kind, op, value in metadata_filters:
+                filters.append(cls.id.in_(DocumentMetadataValue.matching_document_ids(key, kind, op, value)))
+        return filters
+
+    @classmethod
+    def access_filter(cls, user):
+        """Condition limiting documents to those a user may read."""
+        if user.is_admin:
+            return db.true()
+        from app.models.document_share import DocumentVisibility
+        return db.or_(
+            cls.owner_id == user.id,
+            cls.access_level == 'public',
+            cls.id.in_(DocumentVisibility.shared_with(user.id))
+        )
+
+    @classmethod
+    def search(cls, query, user_id=None, document_type=None, page=1, per_page=20,
+               include_content=False, metadata_filters=None, latest_only=False):
+        """Search documents with optional filters.
+
+        With include_content, the query also matches text extracted from the
+        document files. metadata_filters is a list of (key, kind, op, value)
+        comparisons on indexed metadata keys. latest_only skips superseded
+        versions.
+        """
+        filters = cls.search_filters(
+            query, user_id, document_type, include_content, metadata_filters, latest_only
+        )
         
         return cls.query.filter(
             *filters
@@ -120,4 +232,119 @@ class Document(BaseModel):
             page=page,
             per_page=per_page,
             error_out=False
-        ) 
\ No newline at end of file
+        )
+
+    @classmethod
+    def search_ids(cls, query, user_id=None, document_type=None, page=1, per_page=20,
+                   include_content=False, metadata_filters=None, latest_only=False):
+        """Like search, but paginate the matching ids only."""
+        filters = cls.search_filters(
+            query, user_id, document_type, include_content, metadata_filters, latest_only
+        )
+
+        return db.paginate(
+            db.select(cls.id).where(
+                *filters
+            ).order_by(
+                cls.created_at.desc()
+            ),
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+    @classmethod
+    def get_many(cls, ids, owner_id=None):
+        """Load documents by id in one query, in the given order, skipping missing ones."""
+        if not ids:
+            return []
+        query = cls.query.filter(cls.id.in_(ids))
+        if owner_id is not None:
+            # Also keeps the lookup on the owner's shard
+            query = query.filter(cls.owner_id == owner_id)
+        found = {document.id: document for document in query}
+        return [found[id] for id in ids if id in found]
+
+    @classmethod
+    def facet_counts(cls, query=None, user_id=None, document_type=None,
+                     include_content=False, metadata_filters=None, latest_only=False):
+        """Count matching documents in each facet bucket.
+
+        Facets are document_type, access_level, is_confidential and
+        document_month (document_date as YYYY-MM). A user's unfiltered counts are read from the precomputed rollup;
+        filtered counts come from one grouped query over the matching rows.
+        """
+        from app.models.document_facet import DocumentFacetCount, FACETS, facet_values, month_expression
+
+        if user_id and not (query or document_type or metadata_filters or latest_only):
+            return DocumentFacetCount.for_owner(user_id)
+
+        filters = cls.search_filters(
+            query, user_id, document_type, include_content, metadata_filters, latest_only
+        )
+        month = month_expression(cls.document_date)
+        rows = db.session.execute(
+            db.select(
+                cls.document_type,
+                cls.access_level,
+                cls.is_confidential,
+                month,
+                db.func.count()
+            ).where(
+                *filters
+            ).group_by(
+                cls.document_type,
+                cls.access_level,
+                cls.is_confidential,
+                month
+            )
+        )
+
+        facets = {facet: {} for facet in FACETS}
+        for document_type, access_level, is_confidential, document_month, count in rows:
+            buckets = facet_values(document_type, access_level, is_confidential, None)
+            buckets['document_month'] = document_month or 'none'
+            for facet, value in buckets.items():
+                facets[facet][value] = facets[facet].get(value, 0) + count
+        return facets
+
+@db.event.listens_for(Document, 'after_insert')
+def _set_root_id(mapper, connection, target):
+    """Make a new original document the root of its own version chain."""
+    if target.root_id is None:
+        connection.execute(
+            db.update(Document.__table__).where(
+                Document.__table__.c.id == target.id
+            ).values(root_id=target.id)
+        )
+        set_committed_value(target, 'root_id', target.id)
+
+@db.event.listens_for(RoutingSession, 'before_flush')
+def _promote_next_version(session, flush_context, instances):
+    """Make the newest remaining version latest when a chain's head is deleted or deactivated."""
+    heads = [
+        document for document in session.deleted
+        if isinstance(document, Document) and document.is_latest
+    ]
+    for document in session.dirty:
+        if not isinstance(document, Document) or document in session.deleted:
+            continue
+        if document.is_latest and not document.is_active and db.inspect(document).attrs.is_active.history.has_changes():
+            document.is_latest = False
+            heads.append(document)
+
+    removed = {document.id for document in heads}
+    for head in heads:
+        successor = session.scalars(
+            db.select(Document).where(
+                Document.root_id == (head.root_id or head.id),
+                Document.id.not_in(removed),
+                Document.is_active == True
+            ).order_by(
+                Document.version.desc()
+            ).limit(1),
+            # A chain shares its owner, so it lives on the head's shard
+            bind_arguments={'shard_id': shard_of(head)}
+        ).first()
+        if successor is not None:
+            successor.is_latest = True
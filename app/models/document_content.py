@@ -0,0 +1,47 @@
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+from app.models.base import BaseModel, db
+
+class DocumentContent(BaseModel):
+    """Text and fields extracted from a document file, one row per version."""
+
+    __tablename__ = 'document_contents'
+    __shard_by__ = 'document'
+
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='done')  # done, failed
+    text = db.Column(db.Text().with_variant(mysql.LONGTEXT(), 'mysql'))
+    fields = db.Column(db.JSON)
+    page_count = db.Column(db.Integer)
+    extractor = db.Column(db.String(50))
+    error = db.Column(db.String(500))
+    extracted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    document = db.relationship(
+        'Document',
+        backref=db.backref('content', uselist=False, cascade='all, delete-orphan')
+    )
+
+    __table_args__ = (
+        # One extraction per document version row
+        db.UniqueConstraint('document_id', name='uq_document_contents_document'),
+        # Full-text search over extracted text (MySQL)
+        db.Index('ft_document_contents_text', 'text', mysql_prefix='FULLTEXT'),
+    )
+
+    @classmethod
+    def matching_document_ids(cls, query):
+        """Select ids of documents whose extracted text matches the query."""
+        if db.engine.dialect.name == 'mysql':
+            condition = cls.text.match(query)
+        else:
+            condition = cls.text.ilike(f'%{query}%')
+        return db.select(cls.document_id).where(cls.status == 'done', condition)
+
+    def to_dict(self):
+        """Convert document content instance to dictionary."""
+        data = super().to_dict()
+        data.pop('id', None)
+        return data
@@ -0,0 +1,197 @@
+from collections import defaultdict
+from app.database.session import RoutingSession
+from app.database.sharding import shard_for_owner, shard_of
+from app.models.base import db
+
+FACETS = ('document_type', 'access_level', 'is_confidential', 'document_month')
+
+# Document columns that decide which facet buckets a document counts in
+FACET_COLUMNS = ('owner_id', 'is_active', 'document_type', 'access_level', 'is_confidential', 'document_date')
+
+def facet_values(document_type, access_level, is_confidential, document_date):
+    """Return {facet: bucket} for one document's column values."""
+    return {
+        'document_type': document_type or 'none',
+        'access_level': access_level or 'none',
+        'is_confidential': 'true' if is_confidential else 'false',
+        'document_month': document_date.strftime('%Y-%m') if document_date else 'none'
+    }
+
+def month_expression(column):
+    """SQL expression bucketing a date column by 'YYYY-MM'."""
+    if db.engine.dialect.name == 'mysql':
+        return db.func.date_format(column, '%Y-%m')
+    return db.func.strftime('%Y-%m', column)
+
+class DocumentFacetCount(db.Model):
+    """Per-owner count of active documents in each facet bucket.
+
+    Maintained incrementally in the same transaction as the document write,
+    so unfiltered facets are a single primary key range read.
+    """
+
+    __tablename__ = 'document_facet_counts'
+    __shard_by__ = 'owner_id'
+
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    facet = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def for_owner(cls, owner_id):
+        """Return {facet: {bucket: count}} for an owner's active documents."""
+        facets = {facet: {} for facet in FACETS}
+        rows = db.session.execute(
+            db.select(cls.facet, cls.value, cls.count).where(
+                cls.owner_id == owner_id,
+                cls.count > 0
+            )
+        )
+        for facet, value, count in rows:
+            facets[facet][value] = count
+        return facets
+
+    @classmethod
+    def apply(cls, deltas):
+        """Add {(owner_id, facet, value): delta} to the stored counts."""
+        # Counts live on their owner's shard
+        shards = defaultdict(list)
+        for (owner_id, facet, value), delta in sorted(deltas.items()):
+            if delta:
+                shards[shard_for_owner(owner_id)].append(
+                    {'owner_id': owner_id, 'facet': facet, 'value': value, 'count': delta}
+                )
+
+        for shard_id, rows in shards.items():
+            if db.engine.dialect.name == 'mysql':
+                from sqlalchemy.dialects.mysql import insert
+                stmt = insert(cls).values(rows)
+                stmt = stmt.on_duplicate_key_update(count=cls.count + stmt.inserted['count'])
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+                stmt = insert(cls).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['owner_id', 'facet', 'value'],
+                    set_={'count': cls.count + stmt.excluded['count']}
+                )
+            db.session.execute(stmt, bind_arguments={'shard_id': shard_id})
+
+    @classmethod
+    def rebuild(cls, owner_id=None):
+        """Recompute every owner's counts (or one owner's) from the documents table."""
+        from app.models.document import Document
+
+        owners = [Document.owner_id == owner_id] if owner_id is not None else []
+        month = month_expression(Document.document_date)
+        rows = db.session.execute(
+            db.select(
+                Document.owner_id,
+                Document.document_type,
+                Document.access_level,
+                Document.is_confidential,
+                month,
+                db.func.count()
+            ).where(
+                Document.is_active == True,
+                *owners
+            ).group_by(
+                Document.owner_id,
+                Document.document_type,
+                Document.access_level,
+                Document.is_confidential,
+                month
+            )
+        )
+
+        deltas = defaultdict(int)
+        for owner_id, document_type, access_level, is_confidential, document_month, count in rows:
+            buckets = facet_values(document_type, access_level, is_confidential, None)
+            buckets['document_month'] = document_month or 'none'
+            for facet, value in buckets.items():
+                deltas[(owner_id, facet, value)] += count
+
+        delete = db.delete(cls)
+        if owner_id is not None:
+            delete = delete.where(cls.owner_id == owner_id)
+        db.session.execute(delete)
+        cls.apply(deltas)
+        db.session.commit()
+        return len(deltas)
+
+def _column_default(document, name):
+    default = document.__table__.c[name].default
+    return default.arg if default is not None and default.is_scalar else None
+
+def _buckets(owner_id, values):
+    if owner_id is None or not values['is_active']:
+        return []
+    buckets = facet_values(
+        values['document_type'],
+        values['access_level'],
+        values['is_confidential'],
+        values['document_date']
+    )
+    return [(owner_id, facet, value) for facet, value in buckets.items()]
+
+def _current_values(document):
+    values = {}
+    for name in FACET_COLUMNS:
+        value = getattr(document, name)
+        values[name] = _column_default(document, name) if value is None else value
+    return values
+
+def _previous_values(session, document):
+    state = db.inspect(document)
+    values, missing = {}, False
+    for name in FACET_COLUMNS:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        elif history.added:
+            # Set on an expired instance: the old value was never loaded
+            missing = True
+        else:
+            values[name] = getattr(document, name)
+    if missing:
+        table = document.__table__
+        row = session.execute(
+            db.select(*[table.c[name] for name in FACET_COLUMNS]).where(table.c.id == document.id),
+            bind_arguments={'shard_id': shard_of(document)}
+        ).one()
+        values = dict(zip(FACET_COLUMNS, row))
+    return values
+
+@db.event.listens_for(RoutingSession, 'before_flush')
+def _maintain_facet_counts(session, flush_context, instances):
+    """Move documents between facet buckets as they are written."""
+    from app.models.document import Document
+
+    deltas = defaultdict(int)
+    for document in session.new:
+        if isinstance(document, Document):
+            for bucket in _buckets(document.owner_id, _current_values(document)):
+                deltas[bucket] += 1
+
+    for document in session.deleted:
+        if isinstance(document, Document):
+            values = _previous_values(session, document)
+            for bucket in _buckets(values['owner_id'], values):
+                deltas[bucket] -= 1
+
+    for document in session.dirty:
+        if not isinstance(document, Document) or document in session.deleted:
+            continue
+        state = db.inspect(document)
+        if not any(state.attrs[name].history.has_changes() for name in FACET_COLUMNS):
+            continue
+        before = _previous_values(session, document)
+        for bucket in _buckets(before['owner_id'], before):
+            deltas[bucket] -= 1
+        for bucket in _buckets(document.owner_id, _current_values(document)):
+            deltas[bucket] += 1
+
+    if deltas:
+        DocumentFacetCount.apply(deltas)
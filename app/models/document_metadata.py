@@ -0,0 +1,137 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from flask import current_app
+from app.database.session import RoutingSession
+from app.models.base import db
+
+VALUE_COLUMNS = {
+    'string': 'value_string',
+    'number': 'value_number',
+    'date': 'value_date'
+}
+
+OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'gt': lambda column, value: column > value,
+    'gte': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'lte': lambda column, value: column <= value
+}
+
+def coerce_metadata_value(kind, value):
+    """Convert a raw metadata value to the Python type stored for its kind.
+
+    Raises ValueError if the value does not fit the kind.
+    """
+    if value is None or isinstance(value, (dict, list)):
+        raise ValueError('Metadata value must be a scalar')
+    if kind == 'string':
+        return str(value)[:255]
+    if kind == 'number':
+        if isinstance(value, bool):
+            raise ValueError('Expected a number')
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError('Expected a number')
+        if not number.is_finite():
+            raise ValueError('Expected a finite number')
+        return number
+    if kind == 'date':
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(str(value)[:10])
+    raise ValueError(f'Unknown metadata kind: {kind}')
+
+class DocumentMetadataValue(db.Model):
+    """Typed copy of one indexed Document.metadata key.
+
+    The JSON column stays the source of truth; keys listed in
+    INDEXED_METADATA_KEYS are mirrored here on flush so equality and range
+    filters on them are index lookups instead of scans of decoded JSON.
+    """
+
+    __tablename__ = 'document_metadata_values'
+    __shard_by__ = 'document'
+
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    value_string = db.Column(db.String(255))
+    value_number = db.Column(db.Numeric(20, 4))
+    value_date = db.Column(db.Date)
+
+    document = db.relationship(
+        'Document',
+        backref=db.backref('metadata_values', cascade='all, delete-orphan')
+    )
+
+    __table_args__ = (
+        # (key, value, document_id) covers both lookups and the id semi-join
+        db.Index('idx_document_metadata_string', 'key', 'value_string', 'document_id'),
+        db.Index('idx_document_metadata_number', 'key', 'value_number', 'document_id'),
+        db.Index('idx_document_metadata_date', 'key', 'value_date', 'document_id'),
+    )
+
+    @staticmethod
+    def indexed_keys():
+        """Return the configured mapping of indexed metadata key to kind."""
+        return current_app.config['INDEXED_METADATA_KEYS']
+
+    @classmethod
+    def build_rows(cls, metadata, indexed_keys):
+        """Return {key: (column, value)} for the indexed keys present in metadata.
+
+        Values that do not fit the declared kind are left out of the index.
+        """
+        rows = {}
+        for key, kind in indexed_keys.items():
+            if not metadata or key not in metadata:
+                continue
+            try:
+                value = coerce_metadata_value(kind, metadata[key])
+            except (TypeError, ValueError):
+                continue
+            rows[key] = (VALUE_COLUMNS[kind], value)
+        return rows
+
+    @classmethod
+    def sync(cls, document, indexed_keys=None):
+        """Bring a document's index rows in line with its metadata JSON."""
+        wanted = cls.build_rows(document.doc_metadata, indexed_keys or cls.indexed_keys())
+        existing = {row.key: row for row in document.metadata_values}
+
+        for key, row in existing.items():
+            if key not in wanted:
+                document.metadata_values.remove(row)
+
+        for key, (column, value) in wanted.items():
+            row = existing.get(key)
+            if row is None:
+                row = cls(key=key)
+                document.metadata_values.append(row)
+            for name in VALUE_COLUMNS.values():
+                setattr(row, name, value if name == column else None)
+
+    @classmethod
+    def matching_document_ids(cls, key, kind, op, value):
+        """Select ids of documents whose indexed key satisfies the comparison."""
+        column = getattr(cls, VALUE_COLUMNS[kind])
+        return db.select(cls.document_id).where(
+            cls.key == key,
+            OPERATORS[op](column, value)
+        )
+
+@db.event.listens_for(RoutingSession, 'before_flush')
+def _sync_metadata_index(session, flush_context, instances):
+    """Mirror indexed metadata keys for documents being inserted or changed."""
+    from app.models.document import Document
+
+    indexed_keys = None
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Document):
+            continue
+        if obj not in session.new and not db.inspect(obj).attrs.doc_metadata.history.has_changes():
+            continue
+        if indexed_keys is None:
+            indexed_keys = DocumentMetadataValue.indexed_keys()
+        DocumentMetadataValue.sync(obj, indexed_keys)
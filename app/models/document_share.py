@@ -0,0 +1,295 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+from flask import current_app
+from flask_sqlalchemy.pagination import Pagination
+from app.database.session import RoutingSession
+from app.models.base import BaseModel, db
+from app.models.group import GroupMember
+
+# Viewer id of the visibility rows for public documents
+PUBLIC_VIEWER = 0
+
+# Document columns that decide who sees a document, or that the index copies
+VISIBILITY_COLUMNS = ('owner_id', 'is_active', 'access_level', 'document_type', 'is_latest', 'created_at')
+
+class MergedPagination(Pagination):
+    """Pagination over selects of (sort key..., id) rows ordered the same way.
+
+    Each select is read as its own index range, at most offset + per_page
+    rows long, and the ranges are merged here. An IN over the ranges would
+    have the database sort every matching row instead.
+    """
+
+    def _query_items(self):
+        session = self._query_args['session']
+        end = self._query_offset + self.per_page
+        ranges = [
+            [tuple(row) for row in session.execute(select.limit(end))]
+            for select in self._query_args['selects']
+        ]
+        merged = heapq.merge(*ranges, reverse=True)
+        return [row[-1] for row in islice(merged, self._query_offset, end)]
+
+    def _query_count(self):
+        session = self._query_args['session']
+        return sum(
+            session.execute(
+                db.select(db.func.count()).select_from(select.order_by(None).subquery())
+            ).scalar()
+            for select in self._query_args['selects']
+        )
+
+class DocumentShare(BaseModel):
+    """Grant of read access to one document for a user or a group.
+
+    Grants only take effect while the document's access_level is 'shared'.
+    """
+
+    __tablename__ = 'document_shares'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a foreign key: with sharding the documents live in another database
+    document_id = db.Column(db.Integer, nullable=False)
+    grantee_user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    grantee_group_id = db.Column(db.Integer, db.ForeignKey('groups.id'))
+    granted_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    group = db.relationship(
+        'Group',
+        backref=db.backref('shares', lazy='dynamic', cascade='all, delete-orphan')
+    )
+
+    __table_args__ = (
+        db.CheckConstraint(
+            '(grantee_user_id IS NULL) <> (grantee_group_id IS NULL)',
+            name='ck_document_shares_one_grantee'
+        ),
+        db.UniqueConstraint('document_id', 'grantee_user_id', name='uq_document_shares_user'),
+        db.UniqueConstraint('document_id', 'grantee_group_id', name='uq_document_shares_group'),
+        db.Index('idx_document_shares_group', 'grantee_group_id'),
+    )
+
+    @classmethod
+    def for_document(cls, document_id):
+        """Return a document's grants, oldest first."""
+        return cls.query.filter_by(document_id=document_id).order_by(cls.id).all()
+
+    @classmethod
+    def find(cls, document_id, user_id=None, group_id=None):
+        """Return the grant of a document to a user or group, if any."""
+        return cls.query.filter_by(
+            document_id=document_id,
+            grantee_user_id=user_id,
+            grantee_group_id=group_id
+        ).first()
+
+class DocumentVisibility(db.Model):
+    """Denormalized index of which users may see which documents.
+
+    One row per (viewer, document) for the owner and every user granted
+    access directly or through a group, and a single PUBLIC_VIEWER row for
+    public documents. Rebuilt per document in the same transaction as any
+    write that can change it, so "documents I can see" is one range read of
+    (viewer_id, created_at) instead of an owner/public/grant union per row.
+    Kept on the primary, next to the users and grants it is derived from.
+    """
+
+    __tablename__ = 'document_visibility'
+
+    viewer_id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, nullable=False)
+    document_type = db.Column(db.String(50), nullable=False)
+    is_latest = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # visible_ids() newest first, with and without a document_type filter
+        db.Index('idx_document_visibility_viewer_created', 'viewer_id', 'created_at', 'document_id'),
+        db.Index('idx_document_visibility_viewer_type_created', 'viewer_id', 'document_type', 'created_at', 'document_id'),
+        # Rebuilding one document's rows
+        db.Index('idx_document_visibility_document', 'document_id'),
+    )
+
+    @classmethod
+    def visible_ids(cls, user_id, shared_only=False, document_type=None, latest_only=False,
+                    page=1, per_page=20):
+        """Paginate ids of documents a user owns, was granted, or that are public.
+
+        With shared_only, just the documents other users granted them.
+        """
+        filters = []
+        if document_type:
+            filters.append(cls.document_type == document_type)
+        if latest_only:
+            filters.append(cls.is_latest == True)
+
+        if shared_only:
+            viewers = [db.and_(cls.viewer_id == user_id, cls.owner_id != user_id)]
+        else:
+            # A public document has only the PUBLIC_VIEWER row, so no
+            # document is in both ranges
+            viewers = [cls.viewer_id == user_id, cls.viewer_id == PUBLIC_VIEWER]
+        selects = [
+            db.select(cls.created_at, cls.document_id).where(
+                viewer,
+                *filters
+            ).order_by(
+                cls.created_at.desc(),
+                cls.document_id.desc()
+            )
+            for viewer in viewers
+        ]
+        return MergedPagination(
+            selects=selects,
+            session=db.session,
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+    @classmethod
+    def shared_with(cls, user_id):
+        """Ids of documents shared with a user, as a subquery or, with sharding, a list."""
+        statement = db.select(cls.document_id).where(cls.viewer_id == user_id, cls.owner_id != user_id)
+        if current_app.extensions.get('sharding') is not None:
+            # Documents are in other databases than the index
+            return list(db.session.scalars(statement))
+        return statement
+
+    @classmethod
+    def can_view(cls, user_id, document_id):
+        """Check if a user may see a document."""
+        return db.session.execute(
+            db.select(cls.document_id).where(
+                cls.viewer_id.in_([user_id, PUBLIC_VIEWER]),
+                cls.document_id == document_id
+            ).limit(1)
+        ).first() is not None
+
+    @classmethod
+    def refresh(cls, session, document_ids):
+        """Rebuild the rows of the given documents from their current state."""
+        from app.models.document import Document
+
+        document_ids = sorted(set(document_ids))
+        if not document_ids:
+            return
+        documents = session.execute(
+            db.select(Document.id, *[getattr(Document, name) for name in VISIBILITY_COLUMNS]).where(
+                Document.id.in_(document_ids)
+            )
+        ).all()
+        grants = session.execute(
+            db.select(DocumentShare.document_id, DocumentShare.grantee_user_id, DocumentShare.grantee_group_id).where(
+                DocumentShare.document_id.in_(document_ids)
+            )
+        ).all()
+        group_ids = {group_id for _, _, group_id in grants if group_id is not None}
+        members = defaultdict(set)
+        if group_ids:
+            for group_id, user_id in session.execute(
+                db.select(GroupMember.group_id, GroupMember.user_id).where(GroupMember.group_id.in_(group_ids))
+            ):
+                members[group_id].add(user_id)
+        grantees = defaultdict(set)
+        for document_id, user_id, group_id in grants:
+            grantees[document_id] |= {user_id} if user_id is not None else members[group_id]
+
+        rows = []
+        for document in documents:
+            if not document.is_active:
+                continue
+            if document.access_level == 'public':
+                viewers = {PUBLIC_VIEWER}
+            elif document.access_level == 'shared':
+                viewers = {document.owner_id} | grantees[document.id]
+            else:
+                viewers = {document.owner_id}
+            rows.extend(
+                {
+                    'viewer_id': viewer_id,
+                    'document_id': document.id,
+                    'owner_id': document.owner_id,
+                    'document_type': document.document_type,
+                    'is_latest': document.is_latest,
+                    'created_at': document.created_at
+                }
+                for viewer_id in sorted(viewers)
+            )
+
+        session.execute(db.delete(cls).where(cls.document_id.in_(document_ids)))
+        if rows:
+            # Core insert: ORM bulk inserts are not supported by the sharded session
+            session.execute(db.insert(cls.__table__), rows)
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Recompute the whole index from documents and grants, in id order."""
+        from app.models.document import Document
+
+        count, last_id = 0, 0
+        while True:
+            # With sharding each shard returns its own first batch
+            ids = sorted(db.session.scalars(
+                db.select(Document.id).where(Document.id > last_id).order_by(Document.id).limit(batch_size)
+            ))[:batch_size]
+            upper = ids[-1] if ids else None
+            # Rows left behind by documents removed outside the ORM
+            stale = [cls.document_id > last_id]
+            if upper is not None:
+                stale += [cls.document_id <= upper, cls.document_id.not_in(ids)]
+            db.session.execute(db.delete(cls).where(*stale))
+            cls.refresh(db.session, ids)
+            db.session.commit()
+            if upper is None:
+                return count
+            count += len(ids)
+            last_id = upper
+
+def _changed(instance, columns):
+    state = db.inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in columns)
+
+@db.event.listens_for(RoutingSession, 'after_flush')
+def _maintain_visibility(session, flush_context):
+    """Rebuild visibility rows of documents whose sharing just changed."""
+    from app.models.document import Document
+
+    document_ids, deleted_ids, group_ids = set(), set(), set()
+    for instance in session.new:
+        if isinstance(instance, Document):
+            document_ids.add(instance.id)
+        elif isinstance(instance, DocumentShare):
+            document_ids.add(instance.document_id)
+        elif isinstance(instance, GroupMember):
+            group_ids.add(instance.group_id)
+
+    for instance in session.deleted:
+        if isinstance(instance, Document):
+            deleted_ids.add(instance.id)
+        elif isinstance(instance, DocumentShare):
+            document_ids.add(instance.document_id)
+        elif isinstance(instance, GroupMember):
+            group_ids.add(instance.group_id)
+
+    for instance in session.dirty:
+        if instance in session.deleted:
+            continue
+        if isinstance(instance, Document) and _changed(instance, VISIBILITY_COLUMNS):
+            document_ids.add(instance.id)
+        elif isinstance(instance, DocumentShare) and _changed(
+            instance, ('document_id', 'grantee_user_id', 'grantee_group_id')
+        ):
+            # Moved grants are rare; rebuild the old document too
+            document_ids.update(value for value in db.inspect(instance).attrs.document_id.history.sum())
+
+    if group_ids:
+        document_ids.update(session.scalars(
+            db.select(DocumentShare.document_id).where(DocumentShare.grantee_group_id.in_(group_ids))
+        ))
+    if deleted_ids:
+        # Grants die with their document
+        session.execute(db.delete(DocumentShare).where(DocumentShare.document_id.in_(deleted_ids)))
+    DocumentVisibility.refresh(session, document_ids | deleted_ids)
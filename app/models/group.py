@@ -0,0 +1,49 @@
+from datetime import datetime
+from app.models.base import BaseModel, db
+
+class Group(BaseModel):
+    """Named set of users that documents can be shared with."""
+
+    __tablename__ = 'groups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(80), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    members = db.relationship('GroupMember', backref='group', lazy='dynamic', cascade='all, delete-orphan')
+
+    __table_args__ = (
+        db.UniqueConstraint('created_by', 'name', name='uq_groups_created_by_name'),
+    )
+
+    def member_ids(self):
+        """Return the ids of the group's members."""
+        return [member.user_id for member in self.members]
+
+    def can_manage(self, user):
+        """Check if a user may change the group's members."""
+        return user.is_admin or self.created_by == user.id
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Return groups a user created or belongs to."""
+        return cls.query.filter(
+            db.or_(
+                cls.created_by == user_id,
+                cls.id.in_(db.select(GroupMember.group_id).where(GroupMember.user_id == user_id))
+            )
+        ).order_by(cls.name).all()
+
+class GroupMember(db.Model):
+    """Membership of one user in one group."""
+
+    __tablename__ = 'group_members'
+
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Groups a user belongs to
+        db.Index('idx_group_members_user', 'user_id'),
+    )
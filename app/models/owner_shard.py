@@ -0,0 +1,33 @@
+from datetime import datetime
+from app.models.base import db
+
+class OwnerShard(db.Model):
+    """Explicit shard placement for an owner, overriding the hash placement.
+
+    Kept on the primary. ``moved_at`` is set when the owner's rows were moved
+    off the shard their ids were allocated on, so id lookups also try here.
+    """
+
+    __tablename__ = 'owner_shards'
+
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    shard = db.Column(db.String(64), nullable=False)
+    moved_at = db.Column(db.DateTime)
+
+    @classmethod
+    def assign(cls, owner_id, shard, moved=False):
+        """Place an owner on a shard (the caller commits)."""
+        row = db.session.get(cls, owner_id) or cls(owner_id=owner_id)
+        row.shard = shard
+        if moved:
+            row.moved_at = datetime.utcnow()
+        db.session.add(row)
+        return row
+
+class ShardSequence(db.Model):
+    """Next free id of a sharded table on one shard, handed out in blocks."""
+
+    __tablename__ = 'shard_sequences'
+
+    name = db.Column(db.String(128), primary_key=True)  # '<table>:<shard>'
+    next_id = db.Column(db.BigInteger, nullable=False)
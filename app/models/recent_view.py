@@ -1,11 +1,14 @@
 from datetime import datetime
 from app.models.base import BaseModel, db
+from app.database.timestamps import touch
 from flask import current_app
 
 class RecentView(BaseModel):
     """Model for tracking recently viewed documents."""
     
     __tablename__ = 'recent_views'
+    # On the viewer's shard, which need not hold the document
+    __shard_by__ = 'user_id'
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -28,8 +31,8 @@ class RecentView(BaseModel):
         ).first()
 
         if view:
-            view.viewed_at = datetime.utcnow()
-            view.save()
+            # Re-views only move the timestamp; batch them
+            touch(view, 'viewed_at')
         else:
             view = cls(
                 user_id=user_id,
@@ -0,0 +1,93 @@
+import uuid
+from datetime import datetime
+from app.models.base import BaseModel, db
+
+def merge_ranges(ranges, start, end):
+    """Add the half-open byte range [start, end) to a sorted list of ranges."""
+    merged = []
+    for low, high in sorted(ranges + [[start, end]]):
+        if merged and low <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+class UploadSession(BaseModel):
+    """A resumable upload being assembled chunk by chunk on local disk."""
+
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Set for a new version of an existing document, and on completion. Not
+    # foreign keys: with sharding the documents live in another database.
+    parent_document_id = db.Column(db.Integer)
+    document_id = db.Column(db.Integer)
+    filename = db.Column(db.String(255), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64))  # Optional checksum of the whole file
+    document_fields = db.Column(db.JSON)  # Validated DocumentSchema data
+    received_ranges = db.Column(db.JSON, nullable=False, default=list)
+    status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, completed
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # Cleanup of abandoned sessions
+        db.Index('idx_upload_sessions_status_expires', 'status', 'expires_at'),
+    )
+
+    def __init__(self, **kwargs):
+        # Known before insert, so the partial file can be created first
+        kwargs.setdefault('id', uuid.uuid4().hex)
+        super().__init__(**kwargs)
+
+    @property
+    def received_bytes(self):
+        """Number of distinct bytes received so far."""
+        return sum(high - low for low, high in self.received_ranges or [])
+
+    @property
+    def is_complete(self):
+        """Whether every byte of the file has been received."""
+        return self.received_ranges == [[0, self.total_size]]
+
+    @property
+    def is_expired(self):
+        """Whether the session can no longer receive chunks."""
+        return self.expires_at <= datetime.utcnow()
+
+    def record_range(self, start, end):
+        """Mark bytes [start, end) as received."""
+        self.received_ranges = merge_ranges(
+            [list(r) for r in self.received_ranges or []], start, end
+        )
+
+    @classmethod
+    def get_for_owner(cls, upload_id, owner_id, lock=False):
+        """Get an upload session owned by a user, optionally locking its row."""
+        query = cls.query.filter_by(id=upload_id, owner_id=owner_id)
+        if lock:
+            query = query.with_for_update()
+        return query.first()
+
+    @classmethod
+    def expired(cls, limit=500):
+        """Get unfinished sessions past their expiry time."""
+        return cls.query.filter(
+            cls.status == 'uploading',
+            cls.expires_at <= datetime.utcnow()
+        ).limit(limit).all()
+
+    def to_dict(self):
+        """Convert upload session instance to dictionary."""
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'received_bytes': self.received_bytes,
+            'received_ranges': self.received_ranges or [],
+            'status': self.status,
+            'document_id': self.document_id,
+            'expires_at': self.expires_at.isoformat()
+        }
@@ -1,6 +1,7 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.models.base import BaseModel, db
 from app.models.recent_view import RecentView
+from app.utils.pagination import encode_cursor, decode_cursor, escape_like
 
 class User(BaseModel):
     """User model for authentication and authorization."""
@@ -17,6 +18,13 @@ class User(BaseModel):
     is_verified = db.Column(db.Boolean, default=False)
     last_login = db.Column(db.DateTime)
 
+    __table_args__ = (
+        # Admin directory filters paged by id: role and is_verified, or role
+        # alone. is_active is always filtered, so it sits before id in both.
+        db.Index('idx_users_role_verified_active_id', 'role', 'is_verified', 'is_active', 'id'),
+        db.Index('idx_users_role_active_id', 'role', 'is_active', 'id'),
+    )
+
     # Relationships
     documents = db.relationship('Document', backref='owner', lazy='dynamic')
     recent_views = db.relationship('RecentView', backref='user', lazy='dynamic')
@@ -57,6 +65,53 @@ class User(BaseModel):
         """Get a user by username."""
         return cls.query.filter_by(username=username).first()
 
+    @classmethod
+    def search_directory(cls, prefix=None, role=None, is_verified=None, cursor=None, limit=20):
+        """Get a keyset-paginated page of the user directory.
+
+        Prefix searches run as a range scan on the username index, or on the
+        email index when the prefix contains '@'. Each page is ordered by the
+        same indexed column and reads at most ``limit + 1`` rows, so the cost
+        of a page does not grow with the number of users.
+
+        Returns a ``(users, next_cursor)`` tuple. Raises ValueError if the
+        cursor is malformed or was issued for a different sort order.
+        """
+        if prefix and '@' in prefix:
+            sort_column = cls.email
+        elif prefix:
+            sort_column = cls.username
+        else:
+            sort_column = cls.id
+
+        filters = [cls.is_active == True]
+        if prefix:
+            filters.append(sort_column.like(f'{escape_like(prefix)}%', escape='\\'))
+        if role:
+            filters.append(cls.role == role)
+        if is_verified is not None:
+            filters.append(cls.is_verified == is_verified)
+        if cursor:
+            position = decode_cursor(cursor)
+            if not isinstance(position, dict) or position.get('s') != sort_column.key:
+                raise ValueError('Cursor does not match the requested ordering')
+            filters.append(sort_column > position.get('k'))
+
+        users = cls.query.filter(
+            *filters
+        ).order_by(
+            sort_column.asc()
+        ).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = encode_cursor({
+                's': sort_column.key,
+                'k': getattr(users[-1], sort_column.key)
+            })
+        return users, next_cursor
+
     def get_recent_views(self, limit=10):
         """Get user's recently viewed documents."""
         return (RecentView.query
@@ -1,6 +1,8 @@
-from marshmallow import fields, validates, ValidationError
+from flask import current_app
+from marshmallow import Schema, fields, pre_load, validate, validates, validates_schema, ValidationError
 from app.schemas.base import BaseSchema
 from app.core.config import Config
+from app.models.document_metadata import OPERATORS, coerce_metadata_value
 
 class DocumentSchema(BaseSchema):
     """Schema for document model."""
@@ -13,12 +15,14 @@ class DocumentSchema(BaseSchema):
     mime_type = fields.String(dump_only=True)
     document_type = fields.String(required=True)
     document_date = fields.Date()
-    metadata = fields.Dict()
+    metadata = fields.Dict(attribute='doc_metadata', data_key='metadata')
     owner_id = fields.Integer(dump_only=True)
     is_confidential = fields.Boolean()
     access_level = fields.String()
     version = fields.Integer(dump_only=True)
     parent_id = fields.Integer(dump_only=True)
+    root_id = fields.Integer(dump_only=True)
+    is_latest = fields.Boolean(dump_only=True)
     download_url = fields.String(dump_only=True)
 
     @validates('document_type')
@@ -41,7 +45,7 @@ class DocumentUpdateSchema(BaseSchema):
     description = fields.String()
     document_type = fields.String()
     document_date = fields.Date()
-    metadata = fields.Dict()
+    metadata = fields.Dict(attribute='doc_metadata', data_key='metadata')
     is_confidential = fields.Boolean()
     access_level = fields.String()
 
@@ -60,15 +64,127 @@ class DocumentUpdateSchema(BaseSchema):
             raise ValidationError('Invalid access level. Must be one of: private, shared, public')
 
 class DocumentSearchSchema(BaseSchema):
-    """Schema for document search parameters."""
+    """Schema for document search parameters.
+
+    Indexed metadata keys are filtered with ``meta.<key>=value`` or
+    ``meta.<key>.<op>=value`` where op is one of eq, gt, gte, lt, lte.
+    """
     
     query = fields.String()
     document_type = fields.String()
+    include_content = fields.Boolean(missing=False)
+    facets = fields.Boolean(missing=False)
+    latest_only = fields.Boolean(missing=False)
+    # owned, shared (with me) or visible (owned + shared + public)
+    scope = fields.String(missing='owned', validate=validate.OneOf(['owned', 'shared', 'visible']))
     page = fields.Integer(missing=1)
     per_page = fields.Integer(missing=Config.DEFAULT_PAGE_SIZE)
+    metadata_filters = fields.Raw(load_only=True)
+
+    @pre_load
+    def collect_metadata_filters(self, data, **kwargs):
+        """Move meta.* parameters into typed metadata filters."""
+        data = dict(data.items())
+        indexed_keys = current_app.config['INDEXED_METADATA_KEYS']
+        filters, errors = [], {}
+        if 'metadata_filters' in data:
+            # Built here from meta.* parameters only
+            data.pop('metadata_filters')
+            errors['metadata_filters'] = ['Unknown field. Filter metadata with meta.<key> parameters']
+        for param in [name for name in data if name.startswith('meta.')]:
+            raw = data.pop(param)
+            key, _, op = param[len('meta.'):].partition('.')
+            op = op or 'eq'
+            kind = indexed_keys.get(key)
+            if kind is None:
+                errors[param] = [f'Metadata key is not indexed. Must be one of: {", ".join(indexed_keys)}']
+            elif op not in OPERATORS:
+                errors[param] = [f'Invalid operator. Must be one of: {", ".join(OPERATORS)}']
+            else:
+                try:
+                    filters.append((key, kind, op, coerce_metadata_value(kind, raw)))
+                except ValueError:
+                    errors[param] = [f'Invalid {kind} value']
+        if errors:
+            raise ValidationError(errors)
+        if filters:
+            data['metadata_filters'] = filters
+        return data
+
+    @validates('metadata_filters')
+    def validate_metadata_filters(self, value):
+        """Validate each filter names an indexed key, its type and a known operator."""
+        indexed_keys = current_app.config['INDEXED_METADATA_KEYS']
+        for item in value:
+            if not isinstance(item, (list, tuple)) or len(item) != 4:
+                raise ValidationError('Invalid metadata filter')
+            key, kind, op, _ = item
+            if indexed_keys.get(key) != kind or op not in OPERATORS:
+                raise ValidationError('Invalid metadata filter')
+
+    @validates_schema
+    def validate_scope_filters(self, data, **kwargs):
+        """Validate other users' documents are only filtered on indexed columns."""
+        if data.get('scope', 'owned') == 'owned':
+            return
+        unsupported = [
+            name for name in ('query', 'include_content', 'facets', 'metadata_filters')
+            if data.get(name)
+        ]
+        if unsupported:
+            raise ValidationError(
+                {name: ['Only document_type and latest_only filter shared documents'] for name in unsupported}
+            )
 
     @validates('per_page')
     def validate_per_page(self, value):
         """Validate items per page."""
         if value > Config.MAX_PAGE_SIZE:
-            raise ValidationError(f'Maximum items per page is {Config.MAX_PAGE_SIZE}') 
\ No newline at end of file
+            raise ValidationError(f'Maximum items per page is {Config.MAX_PAGE_SIZE}') 
+
+class DocumentArchiveSchema(DocumentSearchSchema):
+    """Schema for a bulk download: explicit ids or search filters."""
+
+    ids = fields.List(fields.Integer(), validate=validate.Length(min=1))
+    owner_id = fields.Integer()
+    date_from = fields.Date()
+    date_to = fields.Date()
+
+    class Meta:
+        exclude = ('page', 'per_page', 'facets', 'scope')
+
+    @validates('ids')
+    def validate_ids(self, value):
+        """Validate the number of requested documents."""
+        limit = current_app.config['ARCHIVE_MAX_DOCUMENTS']
+        if len(value) > limit:
+            raise ValidationError(f'Maximum documents per archive is {limit}')
+
+class DocumentShareSchema(Schema):
+    """Schema for a grant of access to a user or a group."""
+
+    id = fields.Integer(dump_only=True)
+    document_id = fields.Integer(dump_only=True)
+    user_id = fields.Integer(attribute='grantee_user_id')
+    group_id = fields.Integer(attribute='grantee_group_id')
+    granted_by = fields.Integer(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+
+    @validates_schema
+    def validate_one_grantee(self, data, **kwargs):
+        """Validate exactly one of user_id and group_id is given."""
+        if ('grantee_user_id' in data) == ('grantee_group_id' in data):
+            raise ValidationError('Give exactly one of user_id or group_id')
+
+class DocumentContentSchema(Schema):
+    """Schema for text and fields extracted from a document file."""
+    
+    document_id = fields.Integer(dump_only=True)
+    version = fields.Integer(dump_only=True)
+    status = fields.String(dump_only=True)
+    text = fields.String(dump_only=True)
+    extracted_fields = fields.Dict(attribute='fields', data_key='fields', dump_only=True)
+    page_count = fields.Integer(dump_only=True)
+    extractor = fields.String(dump_only=True)
+    error = fields.String(dump_only=True)
+    extracted_at = fields.DateTime(dump_only=True)
\ No newline at end of file
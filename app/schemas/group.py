@@ -0,0 +1,17 @@
+from marshmallow import Schema, fields, validate
+from app.schemas.base import BaseSchema
+
+class GroupSchema(BaseSchema):
+    """Schema for share groups."""
+
+    name = fields.String(required=True, validate=validate.Length(min=1, max=80))
+    created_by = fields.Integer(dump_only=True)
+    member_ids = fields.Method('get_member_ids', dump_only=True)
+
+    def get_member_ids(self, group):
+        return group.member_ids()
+
+class GroupMemberSchema(Schema):
+    """Schema for adding a user to a group."""
+
+    user_id = fields.Integer(required=True)
@@ -0,0 +1,22 @@
+from flask import current_app
+from marshmallow import Schema, fields, validate, validates, ValidationError
+
+class ProfileStartSchema(Schema):
+    """Schema for starting a sampling profile."""
+
+    duration = fields.Float(load_default=30.0, validate=validate.Range(min=1))
+    interval = fields.Float(load_default=0.01, validate=validate.Range(max=1))
+
+    @validates('duration')
+    def validate_duration(self, value):
+        """Validate the window fits the configured maximum."""
+        limit = current_app.config['PROFILER_MAX_DURATION']
+        if value > limit:
+            raise ValidationError(f'Maximum profile duration is {limit} seconds')
+
+    @validates('interval')
+    def validate_interval(self, value):
+        """Validate the sample rate is not above the configured maximum."""
+        limit = current_app.config['PROFILER_MIN_INTERVAL']
+        if value < limit:
+            raise ValidationError(f'Minimum sample interval is {limit} seconds')
@@ -0,0 +1,22 @@
+from flask import current_app
+from marshmallow import Schema, fields, validate, validates, ValidationError
+
+class UploadSessionCreateSchema(Schema):
+    """Schema for starting a resumable upload.
+
+    Document fields (title, document_type, ...) are sent alongside these and
+    validated with DocumentSchema.
+    """
+
+    filename = fields.String(required=True, validate=validate.Length(min=1, max=255))
+    total_size = fields.Integer(required=True, validate=validate.Range(min=1))
+    mime_type = fields.String(validate=validate.Length(max=100))
+    sha256 = fields.String(validate=validate.Regexp(r'^[0-9a-fA-F]{64}$'))
+    document_id = fields.Integer()  # Upload a new version of this document
+
+    @validates('total_size')
+    def validate_total_size(self, value):
+        """Validate the file fits the upload limit."""
+        limit = current_app.config['UPLOAD_MAX_SIZE']
+        if value > limit:
+            raise ValidationError(f'Maximum upload size is {limit} bytes')
@@ -1,5 +1,6 @@
 from marshmallow import fields, validates, ValidationError, Schema
 from app.schemas.base import BaseSchema
+from app.core.config import Config
 
 class UserSchema(BaseSchema):
     """Schema for user model."""
@@ -66,4 +67,27 @@ class TokenSchema(Schema):
     access_token = fields.String(required=True)
     refresh_token = fields.String(required=True)
     token_type = fields.String(required=True)
-    expires_in = fields.Integer(required=True) 
\ No newline at end of file
+    expires_in = fields.Integer(required=True) 
+
+class UserDirectorySchema(Schema):
+    """Schema for admin user directory parameters."""
+    
+    query = fields.String()
+    role = fields.String()
+    is_verified = fields.Boolean()
+    cursor = fields.String()
+    per_page = fields.Integer(missing=Config.DEFAULT_PAGE_SIZE)
+
+    @validates('role')
+    def validate_role(self, value):
+        """Validate role filter."""
+        if value not in {'user', 'admin'}:
+            raise ValidationError('Invalid role. Must be one of: user, admin')
+
+    @validates('per_page')
+    def validate_per_page(self, value):
+        """Validate items per page."""
+        if value < 1:
+            raise ValidationError('Items per page must be at least 1')
+        if value > Config.MAX_PAGE_SIZE:
+            raise ValidationError(f'Maximum items per page is {Config.MAX_PAGE_SIZE}')
\ No newline at end of file
@@ -0,0 +1,83 @@
+"""Zip archives of many documents, streamed as they are built."""
+import csv
+import hashlib
+import io
+import re
+import zipfile
+
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from app.services.storage import COPY_BUFFER_SIZE, StorageError, get_storage
+
+# Entries at or above this size need zip64 headers up front
+ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+
+class _ZipSink:
+    """Write-only, non-seekable file object buffering output between yields."""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and forget everything written since the last drain."""
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def entry_name(document):
+    """Return a unique, safe name for a document inside the archive."""
+    title = secure_filename(re.sub(r'[^\w\-\.]', '_', document.title)) or 'document'
+    return f'{document.id}_{title}.{document.file_type}'
+
+def stream_archive(documents):
+    """Yield a zip archive of documents' files, chunk by chunk.
+
+    ``documents`` are rows with id, title, file_type, file_path, file_size
+    and created_at. A manifest.csv with each file's size and SHA-256 is
+    added last; files missing from storage are listed there as missing.
+    """
+    storage = get_storage()
+    compressible = set(current_app.config.get('STORAGE_COMPRESSION') or {})
+    sink = _ZipSink()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(['document_id', 'filename', 'size', 'sha256', 'status'])
+
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for document in documents:
+            name = entry_name(document)
+            info = zipfile.ZipInfo(name, date_time=document.created_at.timetuple()[:6])
+            # Types we compress at rest compress here too; the rest are stored
+            info.compress_type = zipfile.ZIP_DEFLATED if document.file_type in compressible else zipfile.ZIP_STORED
+            try:
+                source = storage.open(document.file_path)
+            except (FileNotFoundError, StorageError):
+                writer.writerow([document.id, name, '', '', 'missing'])
+                continue
+
+            digest = hashlib.sha256()
+            size = 0
+            with source, archive.open(info, 'w', force_zip64=(document.file_size or 0) >= ZIP64_LIMIT) as entry:
+                for data in iter(lambda: source.read(COPY_BUFFER_SIZE), b''):
+                    entry.write(data)
+                    digest.update(data)
+                    size += len(data)
+                    yield sink.drain()
+            writer.writerow([document.id, name, size, digest.hexdigest(), 'ok'])
+            yield sink.drain()
+
+        archive.writestr('manifest.csv', manifest.getvalue())
+    yield sink.drain()
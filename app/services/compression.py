@@ -0,0 +1,323 @@
+"""Transparent compression of stored document files."""
+import io
+import lzma
+import os
+import struct
+import zlib
+
+from app.services.storage import COPY_BUFFER_SIZE, StorageBackend, StorageError
+
+MAGIC = b'CMSZ'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>4sBB')  # magic, version, method
+TRAILER = struct.Struct('>Q')  # uncompressed size
+METHODS = {'stored': 0, 'zlib': 1, 'lzma': 2}
+METHOD_NAMES = {number: name for name, number in METHODS.items()}
+SAMPLE_SIZE = 64 * 1024
+# Store raw when a fast compression of the first block saves less than this
+MIN_SAVING = 0.1
+
+def parse_policy(policy):
+    """Turn {'pdf': 'zlib:6', ...} into {'pdf': ('zlib', 6), ...}."""
+    parsed = {}
+    for extension, value in (policy or {}).items():
+        method, _, level = value.partition(':')
+        if method not in METHODS:
+            raise StorageError(f'Unknown compression method for {extension}: {method}')
+        parsed[extension.lower()] = (method, int(level or 6))
+    return parsed
+
+class _Store:
+    """Compressor interface that passes data through unchanged."""
+
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+def compressor(method, level):
+    """Return a streaming compressor for a method and level."""
+    if method == 'stored':
+        return _Store()
+    if method == 'zlib':
+        return zlib.compressobj(level)
+    return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=level)
+
+def is_compressible(sample):
+    """Return whether a sample block is worth compressing."""
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) <= len(sample) * (1 - MIN_SAVING)
+
+class _PrefixedReader(io.RawIOBase):
+    """Replay already-read bytes before the rest of a stream."""
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._offset < len(self.prefix):
+            count = min(len(buffer), len(self.prefix) - self._offset)
+            buffer[:count] = self.prefix[self._offset:self._offset + count]
+            self._offset += count
+            return count
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+class CompressingReader(io.RawIOBase):
+    """Readable stream of the compressed form of a plaintext stream."""
+
+    def __init__(self, stream, method, level):
+        self.stream = stream
+        self.compressor = compressor(method, level)
+        self.logical_size = 0
+        self._pending = HEADER.pack(MAGIC, FORMAT_VERSION, METHODS[method])
+        self._offset = 0
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        while not self._done:
+            data = self.stream.read(COPY_BUFFER_SIZE)
+            if data:
+                self.logical_size += len(data)
+                self._pending = self.compressor.compress(data)
+            else:
+                self._pending = self.compressor.flush() + TRAILER.pack(self.logical_size)
+                self._done = True
+            self._offset = 0
+            if self._pending:
+                return
+
+    def readinto(self, buffer):
+        if self._offset >= len(self._pending):
+            self._fill()
+            if self._offset >= len(self._pending):
+                return 0
+        count = min(len(buffer), len(self._pending) - self._offset)
+        buffer[:count] = self._pending[self._offset:self._offset + count]
+        self._offset += count
+        return count
+
+class StoredReader(io.RawIOBase):
+    """Seekable view of a stored body, between its header and trailer."""
+
+    def __init__(self, raw, length):
+        self.raw = raw
+        self.length = length
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.length - self.position)
+        if count <= 0:
+            return 0
+        self.raw.seek(HEADER.size + self.position)
+        data = self.raw.read(count)
+        if not data:
+            raise StorageError('Stored file is truncated')
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+class DecompressingReader(io.RawIOBase):
+    """Plaintext view of a compressed file.
+
+    Seeking forward decompresses and discards; seeking backward restarts
+    from the beginning, so ranged reads cost up to their end offset.
+    """
+
+    def __init__(self, raw, method, body_end, length):
+        self.raw = raw
+        self.method = method
+        self.body_end = body_end
+        self.length = length
+        self.position = 0
+        self._target = 0
+        self._restart()
+
+    def _restart(self):
+        self.raw.seek(HEADER.size)
+        self._raw_position = HEADER.size
+        if self.method == METHODS['zlib']:
+            self._decompressor = zlib.decompressobj()
+        else:
+            self._decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._target
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._target
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self._target = max(0, offset)
+        return self._target
+
+    def _read_compressed(self):
+        count = min(COPY_BUFFER_SIZE, self.body_end - self._raw_position)
+        data = self.raw.read(count) if count > 0 else b''
+        self._raw_position += len(data)
+        return data
+
+    def _inflate(self, max_length):
+        """Return up to max_length more plaintext bytes, b'' at the end."""
+        decompressor = self._decompressor
+        while True:
+            if self.method == METHODS['zlib']:
+                data = decompressor.unconsumed_tail or self._read_compressed()
+            else:
+                data = self._read_compressed() if decompressor.needs_input else b''
+            try:
+                output = decompressor.decompress(data, max_length)
+            except (zlib.error, lzma.LZMAError) as e:
+                raise StorageError('Compressed file is corrupt') from e
+            if output:
+                return output
+            if decompressor.eof or not data:
+                return b''
+
+    def readinto(self, buffer):
+        if self._target >= self.length:
+            return 0
+        if self._target < self.position:
+            self._restart()
+        while self.position < self._target:
+            skipped = self._inflate(min(COPY_BUFFER_SIZE, self._target - self.position))
+            if not skipped:
+                raise StorageError('Compressed file is truncated')
+            self.position += len(skipped)
+        data = self._inflate(len(buffer))
+        if not data:
+            raise StorageError('Compressed file is truncated')
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self._target = self.position
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+def read_header(raw):
+    """Read a file's method, or return None for one written before its type was listed."""
+    header = raw.read(HEADER.size)
+    if len(header) == HEADER.size:
+        magic, version, method = HEADER.unpack(header)
+        if magic == MAGIC:
+            if version != FORMAT_VERSION or method not in METHOD_NAMES:
+                raise StorageError(f'Unsupported compressed file format {version}/{method}')
+            return method
+    return None
+
+class CompressedStorage(StorageBackend):
+    """Compress files by type on their way into another backend."""
+
+    def __init__(self, inner, policy):
+        self.inner = inner
+        self.policy = policy
+
+    def method_for(self, key):
+        """Return the (method, level) configured for a key's file type, or None."""
+        return self.policy.get(os.path.splitext(key)[1][1:].lower())
+
+    def save(self, key, stream):
+        choice = self.method_for(key)
+        if choice is None:
+            return self.inner.save(key, stream)
+
+        sample = stream.read(SAMPLE_SIZE)
+        replay = io.BufferedReader(_PrefixedReader(sample, stream), buffer_size=COPY_BUFFER_SIZE)
+        if not is_compressible(sample):
+            choice = ('stored', 0)
+        reader = CompressingReader(replay, *choice)
+        self.inner.save(key, io.BufferedReader(reader, buffer_size=COPY_BUFFER_SIZE))
+        return reader.logical_size
+
+    def _inspect(self, raw):
+        """Return (method, stored size) of an open file, leaving it at the start."""
+        method = read_header(raw)
+        stored_size = raw.seek(0, io.SEEK_END)
+        raw.seek(0)
+        return method, stored_size
+
+    def open(self, key):
+        raw = self.inner.open(key)
+        if self.method_for(key) is None:
+            return raw
+        try:
+            method, stored_size = self._inspect(raw)
+            if method is None:
+                return raw
+            raw.seek(stored_size - TRAILER.size)
+            (length,) = TRAILER.unpack(raw.read(TRAILER.size))
+        except BaseException:
+            raw.close()
+            raise
+        if method == METHODS['stored']:
+            reader = StoredReader(raw, length)
+        else:
+            reader = DecompressingReader(raw, method, stored_size - TRAILER.size, length)
+        return io.BufferedReader(reader, buffer_size=COPY_BUFFER_SIZE)
+
+    def stored_size(self, key):
+        """Return the number of bytes the inner backend holds for a key."""
+        return self.inner.size(key)
+
+    def delete(self, key):
+        self.inner.delete(key)
+
+    def exists(self, key):
+        return self.inner.exists(key)
+
+    def size(self, key):
+        with self.open(key) as fh:
+            return fh.seek(0, io.SEEK_END)
+
+    def local_path(self, key):
+        # Unlisted types (images) can still use sendfile
+        if self.method_for(key) is None:
+            return self.inner.local_path(key)
+        with self.inner.open(key) as raw:
+            if read_header(raw) is not None:
+                return None
+        return self.inner.local_path(key)
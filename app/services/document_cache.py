@@ -0,0 +1,116 @@
+"""Cached, coalesced reads of hot document payloads."""
+import hashlib
+import json
+from itertools import chain
+
+import redis
+from flask import current_app
+
+from app.database.base import db
+from app.database.session import RoutingSession
+
+# Generations outlive any cached listing that could refer to them
+GENERATION_TTL = 7 * 24 * 3600
+
+def get_cache():
+    """Return the current app's coalescing cache."""
+    return current_app.extensions['cache']
+
+def document_key(document_id):
+    """Return the cache key for a single document payload."""
+    return f'document:{document_id}'
+
+def owner_generation(owner_id):
+    """Return the current listing generation for an owner."""
+    try:
+        return int(current_app.redis.get(f'documents:gen:{owner_id}') or 0)
+    except redis.RedisError:
+        return 0
+
+def get_document_payload(document_id, load):
+    """Return the serialized document, or None if it does not exist.
+
+    ``load()`` builds the payload on a miss; concurrent misses share one call.
+    """
+    return get_cache().get_or_compute(document_key(document_id), load)
+
+def normalize_query(query):
+    """Canonical form of a search string: trimmed, single-spaced, case-folded.
+
+    Title and description matching is case-insensitive, so this only makes
+    equivalent searches share a cache entry.
+    """
+    return ' '.join((query or '').split()).casefold() or None
+
+def get_search_ids(owner_id, params, load):
+    """Return the cached page of result ids for an owner's search.
+
+    Only ids and counts are cached; callers load the rows themselves. The
+    key includes the owner's generation, so any write to one of their
+    documents makes every cached search of theirs unreachable.
+    """
+    params = dict(params, query=normalize_query(params.get('query')))
+    if params.get('metadata_filters'):
+        params['metadata_filters'] = sorted(params['metadata_filters'], key=repr)
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+    key = f'documents:search:{owner_id}:{owner_generation(owner_id)}:{digest}'
+    return get_cache().get_or_compute(key, load, ttl=current_app.config['SEARCH_CACHE_TTL'])
+
+def invalidate(document_ids=(), owner_ids=()):
+    """Drop cached documents and move owners to a new listing generation."""
+    get_cache().delete(*[document_key(document_id) for document_id in document_ids])
+    for owner_id in owner_ids:
+        key = f'documents:gen:{owner_id}'
+        try:
+            current_app.redis.incr(key)
+            current_app.redis.expire(key, GENERATION_TTL)
+        except redis.RedisError:
+            current_app.logger.warning(f'Could not invalidate cached listings for owner {owner_id}')
+
+@db.event.listens_for(RoutingSession, 'after_flush')
+def _collect_changed_documents(session, flush_context):
+    """Remember which documents and owners a transaction touched.
+
+    Extracted content and indexed metadata rows count as writes to their
+    document: include_content and meta.* searches read them.
+    """
+    from app.models.document import Document
+    from app.models.document_content import DocumentContent
+    from app.models.document_metadata import DocumentMetadataValue
+
+    document_ids = session.info.setdefault('changed_document_ids', set())
+    owner_ids = session.info.setdefault('changed_document_owners', set())
+    unknown_owner = set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Document):
+            document_ids.add(instance.id)
+            owner_ids.add(instance.owner_id)
+            owner_ids.update(db.inspect(instance).attrs.owner_id.history.deleted)
+        elif isinstance(instance, (DocumentContent, DocumentMetadataValue)):
+            document = db.inspect(instance).dict.get('document')
+            if document is not None:
+                document_ids.add(document.id)
+                owner_ids.add(document.owner_id)
+            else:
+                unknown_owner.add(instance.document_id)
+
+    unknown_owner -= document_ids
+    if unknown_owner:
+        document_ids.update(unknown_owner)
+        owner_ids.update(session.scalars(
+            db.select(Document.owner_id).where(Document.id.in_(unknown_owner))
+        ))
+
+@db.event.listens_for(RoutingSession, 'after_commit')
+def _invalidate_changed_documents(session):
+    document_ids = session.info.pop('changed_document_ids', None)
+    owner_ids = session.info.pop('changed_document_owners', None)
+    if (document_ids or owner_ids) and 'cache' in current_app.extensions:
+        invalidate(document_ids or (), owner_ids or ())
+
+@db.event.listens_for(RoutingSession, 'after_rollback')
+def _forget_changed_documents(session):
+    session.info.pop('changed_document_ids', None)
+    session.info.pop('changed_document_owners', None)
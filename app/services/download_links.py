@@ -0,0 +1,40 @@
+"""Short-lived signed download links."""
+import base64
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import quote
+
+from flask import current_app
+
+def _signature(document_id, user_id, expires):
+    secret = current_app.config['DOWNLOAD_URL_SECRET'].encode('utf-8')
+    message = f'{document_id}:{user_id}:{expires}'.encode('utf-8')
+    digest = hmac.new(secret, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+def sign_download(document_id, user_id, now=None):
+    """Return the query parameters of a new link for user_id."""
+    expires = int(now if now is not None else time.time()) + current_app.config['DOWNLOAD_URL_TTL']
+    return {
+        'user': user_id,
+        'expires': expires,
+        'signature': _signature(document_id, user_id, expires)
+    }
+
+def verify_download(document_id, user_id, expires, signature, now=None):
+    """Check a link's signature and that it has not expired."""
+    if not signature or expires < (now if now is not None else time.time()):
+        return False
+    return hmac.compare_digest(_signature(document_id, user_id, expires), signature)
+
+def accel_redirect_uri(path):
+    """Return the internal nginx URI serving a file under UPLOAD_FOLDER, or None."""
+    prefix = current_app.config.get('DOWNLOAD_ACCEL_PREFIX')
+    if not prefix or path is None:
+        return None
+    relative = os.path.relpath(os.path.realpath(path), os.path.realpath(current_app.config['UPLOAD_FOLDER']))
+    if relative.startswith(os.pardir):
+        return None
+    return prefix.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
@@ -0,0 +1,224 @@
+"""Streaming AES-256-GCM encryption of stored document files."""
+import base64
+import io
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.services.storage import StorageBackend, StorageError
+
+MAGIC = b'CMSE'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>4sBI16s')  # magic, version, segment size, salt
+TAG_SIZE = 16
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+
+def parse_key(value):
+    """Decode a urlsafe base64 master key and check it is 256 bits."""
+    try:
+        key = base64.urlsafe_b64decode(value)
+    except (TypeError, ValueError) as e:
+        raise StorageError('STORAGE_ENCRYPTION_KEY must be urlsafe base64') from e
+    if len(key) != 32:
+        raise StorageError('STORAGE_ENCRYPTION_KEY must decode to 32 bytes')
+    return key
+
+def file_cipher(master_key, salt):
+    """Return the AES-GCM cipher for one file."""
+    return AESGCM(HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b'cms-document-file'
+    ).derive(master_key))
+
+def segment_nonce(index, final):
+    """Return the nonce of a segment: its index and whether it is the last."""
+    return index.to_bytes(11, 'big') + (b'\x01' if final else b'\x00')
+
+def plaintext_size(stored_size, segment_size):
+    """Return the plaintext size of an encrypted file from its stored size."""
+    body = stored_size - HEADER.size
+    segments = -(-body // (segment_size + TAG_SIZE))
+    return body - segments * TAG_SIZE
+
+def _read_full(stream, size):
+    """Read exactly size bytes unless the stream ends first."""
+    parts = []
+    remaining = size
+    while remaining:
+        part = stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+class EncryptingReader(io.RawIOBase):
+    """Readable stream of the encrypted form of a plaintext stream."""
+
+    def __init__(self, master_key, stream, segment_size=DEFAULT_SEGMENT_SIZE):
+        salt = os.urandom(16)
+        self.header = HEADER.pack(MAGIC, FORMAT_VERSION, segment_size, salt)
+        self.cipher = file_cipher(master_key, salt)
+        self.stream = stream
+        self.segment_size = segment_size
+        self.plaintext_size = 0
+        self._index = 0
+        self._pending = self.header
+        self._offset = 0
+        self._next = _read_full(stream, segment_size)
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def _encrypt_next(self):
+        # Read one segment ahead so the last segment is known when sealed
+        current = self._next
+        self._next = _read_full(self.stream, self.segment_size) if len(current) == self.segment_size else b''
+        final = not self._next
+        self._pending = self.cipher.encrypt(segment_nonce(self._index, final), current, self.header)
+        self._offset = 0
+        self._index += 1
+        self.plaintext_size += len(current)
+        self._done = final
+
+    def readinto(self, buffer):
+        if self._offset >= len(self._pending):
+            if self._done:
+                return 0
+            self._encrypt_next()
+        count = min(len(buffer), len(self._pending) - self._offset)
+        buffer[:count] = self._pending[self._offset:self._offset + count]
+        self._offset += count
+        return count
+
+class DecryptingReader(io.RawIOBase):
+    """Seekable plaintext view of an encrypted file, one segment at a time."""
+
+    def __init__(self, master_key, raw, header, stored_size):
+        _, _, self.segment_size, salt = HEADER.unpack(header)
+        self.cipher = file_cipher(master_key, salt)
+        self.raw = raw
+        self.header = header
+        self.segments = -(-(stored_size - HEADER.size) // (self.segment_size + TAG_SIZE))
+        if self.segments < 1:
+            raise StorageError('Encrypted file is truncated')
+        self.length = plaintext_size(stored_size, self.segment_size)
+        self.position = 0
+        self._index = None
+        self._segment = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = max(0, offset)
+        return self.position
+
+    def _load(self, index):
+        self.raw.seek(HEADER.size + index * (self.segment_size + TAG_SIZE))
+        sealed = _read_full(self.raw, self.segment_size + TAG_SIZE)
+        try:
+            self._segment = self.cipher.decrypt(
+                segment_nonce(index, index == self.segments - 1), sealed, self.header
+            )
+        except InvalidTag as e:
+            raise StorageError(f'Encrypted segment {index} failed authentication') from e
+        self._index = index
+
+    def readinto(self, buffer):
+        if self.position >= self.length:
+            return 0
+        index, start = divmod(self.position, self.segment_size)
+        if index != self._index:
+            self._load(index)
+        count = min(len(buffer), len(self._segment) - start)
+        buffer[:count] = self._segment[start:start + count]
+        self.position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+def read_header(raw):
+    """Read an encrypted file's header, or return None for a plaintext file."""
+    header = _read_full(raw, HEADER.size)
+    if len(header) == HEADER.size:
+        magic, version, _, _ = HEADER.unpack(header)
+        if magic == MAGIC:
+            if version != FORMAT_VERSION:
+                raise StorageError(f'Unsupported encrypted file version {version}')
+            return header
+    return None
+
+class EncryptedStorage(StorageBackend):
+    """Encrypt files on their way into another backend and decrypt on the way out.
+
+    Files written before encryption was enabled have no header and are
+    served as they are until ``flask storage encrypt`` rewrites them.
+    """
+
+    def __init__(self, inner, master_key, segment_size=DEFAULT_SEGMENT_SIZE):
+        self.inner = inner
+        self.master_key = master_key
+        self.segment_size = segment_size
+
+    def save(self, key, stream):
+        reader = EncryptingReader(self.master_key, stream, self.segment_size)
+        self.inner.save(key, io.BufferedReader(reader, buffer_size=self.segment_size + TAG_SIZE))
+        return reader.plaintext_size
+
+    def open(self, key):
+        raw = self.inner.open(key)
+        try:
+            header = read_header(raw)
+            stored_size = raw.seek(0, io.SEEK_END)
+            raw.seek(0)
+        except BaseException:
+            raw.close()
+            raise
+        if header is None:
+            return raw
+        reader = DecryptingReader(self.master_key, raw, header, stored_size)
+        return io.BufferedReader(reader, buffer_size=reader.segment_size)
+
+    def is_encrypted(self, key):
+        """Return whether the stored file has an encryption header."""
+        with self.inner.open(key) as raw:
+            return read_header(raw) is not None
+
+    def delete(self, key):
+        self.inner.delete(key)
+
+    def exists(self, key):
+        return self.inner.exists(key)
+
+    def size(self, key):
+        with self.inner.open(key) as raw:
+            header = read_header(raw)
+            stored_size = raw.seek(0, io.SEEK_END)
+        if header is None:
+            return stored_size
+        return plaintext_size(stored_size, HEADER.unpack(header)[2])
+
+    def local_path(self, key):
+        # The file on disk is ciphertext; it must never be served directly
+        return None
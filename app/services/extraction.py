@@ -0,0 +1,233 @@
+"""Text and field extraction for uploaded document files."""
+import os
+import re
+import struct
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pragma: no cover - optional dependency
+    PdfReader = None
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    pytesseract = None
+    Image = None
+
+MAX_TEXT_LENGTH = 1_000_000
+MAX_FIELD_VALUES = 20
+
+AMOUNT_RE = re.compile(r'(?<![\w.])[$€£]?\s?-?\d{1,3}(?:,\d{3})*\.\d{2}(?!\d)')
+DATE_RE = re.compile(r'\b(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b')
+ACCOUNT_RE = re.compile(r'\b(?:account|acct)\.?\s*(?:no\.?|number|#)?\s*[:#]?\s*([*xX\d-]{4,20})', re.I)
+PRINTABLE_RUN_RE = re.compile(rb'[\x20-\x7e]{4,}')
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+def _pdf_text(data):
+    if PdfReader is None:
+        return '', None, None
+    reader = PdfReader(BytesIO(data))
+    pages = [page.extract_text() or '' for page in reader.pages]
+    return '\n'.join(pages), len(pages), 'pypdf'
+
+def _docx_text(data):
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read('word/document.xml'))
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NS}p'):
+        paragraphs.append(''.join(node.text or '' for node in paragraph.iter(f'{WORD_NS}t')))
+    return '\n'.join(paragraphs), None, 'docx'
+
+def _xlsx_text(data):
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            root = ElementTree.fromstring(archive.read('xl/sharedStrings.xml'))
+            for item in root.iter(f'{SHEET_NS}si'):
+                shared.append(''.join(node.text or '' for node in item.iter(f'{SHEET_NS}t')))
+
+        sheets = sorted(name for name in archive.namelist()
+                        if name.startswith('xl/worksheets/') and name.endswith('.xml'))
+        rows = []
+        for name in sheets:
+            root = ElementTree.fromstring(archive.read(name))
+            for row in root.iter(f'{SHEET_NS}row'):
+                cells = []
+                for cell in row.iter(f'{SHEET_NS}c'):
+                    value = cell.find(f'{SHEET_NS}v')
+                    if value is None or value.text is None:
+                        continue
+                    if cell.get('t') == 's':
+                        cells.append(shared[int(value.text)])
+                    else:
+                        cells.append(value.text)
+                rows.append('\t'.join(cells))
+    return '\n'.join(rows), len(sheets), 'xlsx'
+
+def _legacy_office_text(data):
+    """Pull readable runs out of binary .doc/.xls files."""
+    # Word and Excel 97-2003 store most text as UTF-16LE
+    utf16 = data.decode('utf-16-le', errors='ignore')
+    runs = re.findall(r'[\x20-\x7e]{4,}', utf16)
+    if not runs:
+        runs = [run.decode('ascii') for run in PRINTABLE_RUN_RE.findall(data)]
+    return '\n'.join(runs), None, 'strings'
+
+def _image_text(data):
+    if pytesseract is None:
+        return '', None, None
+    return pytesseract.image_to_string(Image.open(BytesIO(data))), 1, 'tesseract'
+
+def _image_size(data):
+    """Read width and height from PNG or JPEG headers."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:2] == b'\xff\xd8':
+        offset = 2
+        while offset + 9 < len(data):
+            if data[offset] != 0xFF:
+                break
+            marker = data[offset + 1]
+            length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+            # SOF0-SOF15 except DHT/JPG/DAC carry the frame size
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+    return None
+
+EXTRACTORS = {
+    'pdf': _pdf_text,
+    'docx': _docx_text,
+    'xlsx': _xlsx_text,
+    'doc': _legacy_office_text,
+    'xls': _legacy_office_text,
+    'png': _image_text,
+    'jpg': _image_text,
+    'jpeg': _image_text,
+}
+
+def extract_fields(text):
+    """Find basic financial fields in extracted text."""
+    def unique(values):
+        seen = []
+        for value in values:
+            value = value.strip()
+            if value and value not in seen:
+                seen.append(value)
+            if len(seen) >= MAX_FIELD_VALUES:
+                break
+        return seen
+
+    return {
+        'amounts': unique(AMOUNT_RE.findall(text)),
+        'dates': unique(DATE_RE.findall(text)),
+        'account_numbers': unique(ACCOUNT_RE.findall(text)),
+        'word_count': len(text.split())
+    }
+
+def extract(file_type, data):
+    """Extract text and fields from file bytes.
+
+    Returns a dict with ``text``, ``fields``, ``page_count``, ``extractor``,
+    ``status`` and ``error`` suitable for a DocumentContent row.
+    """
+    extractor = EXTRACTORS.get(file_type)
+    result = {'text': '', 'fields': {}, 'page_count': None, 'extractor': None,
+              'status': 'done', 'error': None}
+    if extractor is None:
+        return result
+
+    try:
+        text, page_count, name = extractor(data)
+    except Exception as e:
+        result.update(status='failed', error=f'{type(e).__name__}: {e}'[:500])
+        return result
+
+    text = (text or '')[:MAX_TEXT_LENGTH]
+    fields = extract_fields(text)
+    if file_type in ('png', 'jpg', 'jpeg'):
+        size = _image_size(data)
+        if size:
+            fields['width'], fields['height'] = size
+    result.update(text=text, fields=fields, page_count=page_count, extractor=name)
+    return result
+
+def _extract_job(job):
+    """Process pool entry point: (document_id, file_type, data) -> (document_id, result)."""
+    document_id, file_type, data = job
+    return document_id, extract(file_type, data)
+
+def extract_many(jobs, workers=None):
+    """Extract a batch of (document_id, file_type, data) jobs in parallel.
+
+    Yields (document_id, result) pairs in input order.
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        yield from pool.map(_extract_job, jobs, chunksize=4)
+
+def pending_documents(limit):
+    """Return active documents that have no extracted content yet."""
+    from app.models.document import Document
+    from app.models.document_content import DocumentContent
+
+    return Document.query.outerjoin(
+        DocumentContent, DocumentContent.document_id == Document.id
+    ).filter(
+        Document.is_active == True,
+        DocumentContent.id.is_(None)
+    ).order_by(
+        Document.id
+    ).limit(limit).all()
+
+def run_extraction(pool, batch_size=50, max_bytes=None, logger=None):
+    """Extract one batch of pending documents; return how many were processed.
+
+    Files are read in the calling process (I/O) and parsed in ``pool``
+    (CPU), with at most one batch of file contents held in memory.
+    """
+    from app.database.base import db
+    from app.models.document_content import DocumentContent
+    from app.services.storage import get_storage
+
+    documents = pending_documents(batch_size)
+    if not documents:
+        return 0
+
+    storage = get_storage()
+    jobs, rows = [], {}
+    for document in documents:
+        rows[document.id] = DocumentContent(document_id=document.id, version=document.version)
+        try:
+            if max_bytes and document.file_size and document.file_size > max_bytes:
+                raise ValueError(f'File larger than {max_bytes} bytes')
+            with storage.open(document.file_path) as fh:
+                data = fh.read()
+        except Exception as e:
+            rows[document.id].status = 'failed'
+            rows[document.id].error = f'{type(e).__name__}: {e}'[:500]
+            continue
+        jobs.append((document.id, document.file_type, data))
+
+    start = time.perf_counter()
+    for document_id, result in pool.map(_extract_job, jobs, chunksize=4):
+        row = rows[document_id]
+        for key, value in result.items():
+            setattr(row, key, value)
+        row.extracted_at = datetime.utcnow()
+
+    db.session.add_all(rows.values())
+    db.session.commit()
+    if logger:
+        elapsed = time.perf_counter() - start
+        logger.info(f"Extracted {len(jobs)} documents in {elapsed:.2f}s")
+    return len(rows)
@@ -0,0 +1,311 @@
+"""Storage backends for document files."""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from flask import current_app
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - only needed for the s3 backend
+    boto3 = None
+    ClientError = None
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+class StorageError(Exception):
+    """Raised when a storage backend cannot complete an operation."""
+
+class StorageBackend:
+    """Interface implemented by every storage backend."""
+
+    def save(self, key, stream):
+        """Store the contents of a binary stream under key and return its size."""
+        raise NotImplementedError
+
+    def save_path(self, key, path):
+        """Store a local file under key, consuming it, and return its size."""
+        with open(path, 'rb') as fh:
+            size = self.save(key, fh)
+        os.remove(path)
+        return size
+
+    def open(self, key):
+        """Open a stored file as a readable, seekable binary stream."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove a stored file. Missing files are ignored."""
+        raise NotImplementedError
+
+    def exists(self, key):
+        """Return whether a file is stored under key."""
+        raise NotImplementedError
+
+    def size(self, key):
+        """Return the stored size of a file in bytes."""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Return a filesystem path for key, or None if not on local disk."""
+        return None
+
+class LocalStorage(StorageBackend):
+    """Flat directory layout: every file directly under ``root``."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, key):
+        """Return the path a key is stored at."""
+        if os.path.basename(key) != key or key in ('', '.', '..'):
+            raise StorageError(f'Invalid storage key: {key!r}')
+        return os.path.join(self.root, key)
+
+    def save(self, key, stream):
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=0o750, exist_ok=True)
+        # Write next to the destination and rename so readers never see a
+        # partially written file.
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                shutil.copyfileobj(stream, fh, COPY_BUFFER_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        return os.path.getsize(path)
+
+    def save_path(self, key, path):
+        destination = self.path_for(key)
+        os.makedirs(os.path.dirname(destination), mode=0o750, exist_ok=True)
+        try:
+            # Same filesystem: a rename, no copy
+            os.replace(path, destination)
+        except OSError:
+            return super().save_path(key, path)
+        return os.path.getsize(destination)
+
+    def open(self, key):
+        return open(self.path_for(key), 'rb')
+
+    def delete(self, key):
+        _remove_quietly(self.path_for(key))
+
+    def exists(self, key):
+        return os.path.isfile(self.path_for(key))
+
+    def size(self, key):
+        return os.path.getsize(self.path_for(key))
+
+    def local_path(self, key):
+        return self.path_for(key)
+
+class ShardedLocalStorage(LocalStorage):
+    """Hash-sharded layout: ``root/ab/cd/<key>`` from the key's SHA-256.
+
+    Two levels of 256 directories keep each directory small even with
+    hundreds of millions of files.
+    """
+
+    def __init__(self, root, levels=2):
+        super().__init__(root)
+        self.levels = levels
+
+    def path_for(self, key):
+        super().path_for(key)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.levels)]
+        return os.path.join(self.root, *shards, key)
+
+class _S3RangeReader(io.RawIOBase):
+    """Seekable reader that fetches an S3 object with ranged GETs."""
+
+    def __init__(self, client, bucket, key, size):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.length = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.length:
+            return 0
+        end = min(self.position + len(buffer), self.length) - 1
+        body = self.client.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range=f'bytes={self.position}-{end}'
+        )['Body']
+        data = body.read()
+        body.close()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+class S3Storage(StorageBackend):
+    """S3-compatible object store (AWS S3, MinIO, Ceph, ...)."""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region_name=None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise StorageError('The s3 storage backend requires boto3')
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def object_key(self, key):
+        """Return the object name for a storage key."""
+        return f'{self.prefix}{key}'
+
+    def save(self, key, stream):
+        # upload_fileobj streams large files as a multipart upload
+        self.client.upload_fileobj(stream, self.bucket, self.object_key(key))
+        return self.size(key)
+
+    def open(self, key):
+        reader = _S3RangeReader(self.client, self.bucket, self.object_key(key), self.size(key))
+        return io.BufferedReader(reader, buffer_size=COPY_BUFFER_SIZE)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def exists(self, key):
+        try:
+            self.size(key)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def size(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key) from e
+            raise
+        return head['ContentLength']
+
+class MigratingStorage(StorageBackend):
+    """Serve from two backends while files move from ``source`` to ``target``.
+
+    New files are written to the target. Reads try the target first and fall
+    back to the source, so the app keeps working while
+    ``flask storage migrate`` copies files across.
+    """
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+
+    def _backend_for(self, key):
+        return self.target if self.target.exists(key) else self.source
+
+    def save(self, key, stream):
+        return self.target.save(key, stream)
+
+    def save_path(self, key, path):
+        return self.target.save_path(key, path)
+
+    def open(self, key):
+        return self._backend_for(key).open(key)
+
+    def delete(self, key):
+        self.target.delete(key)
+        self.source.delete(key)
+
+    def exists(self, key):
+        return self.target.exists(key) or self.source.exists(key)
+
+    def size(self, key):
+        return self._backend_for(key).size(key)
+
+    def local_path(self, key):
+        return self._backend_for(key).local_path(key)
+
+def migrate_file(source, target, key, delete_source=False):
+    """Copy one file between backends and verify it arrived intact.
+
+    Returns False if the file was already migrated, True if it was copied.
+    Raises FileNotFoundError if the source does not have it.
+    """
+    if target.exists(key):
+        return False
+    expected = source.size(key)
+    with source.open(key) as fh:
+        written = target.save(key, fh)
+    if written != expected:
+        target.delete(key)
+        raise StorageError(f'Size mismatch migrating {key}: {written} != {expected}')
+    if delete_source:
+        source.delete(key)
+    return True
+
+def build_backend(name, config):
+    """Build a storage backend from its config name."""
+    if name == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if name == 'sharded':
+        return ShardedLocalStorage(config['UPLOAD_FOLDER'])
+    if name == 's3':
+        return S3Storage(
+            config['S3_BUCKET'],
+            prefix=config['S3_PREFIX'],
+            endpoint_url=config['S3_ENDPOINT_URL'],
+            region_name=config['S3_REGION']
+        )
+    if name == 'migrating':
+        return MigratingStorage(
+            build_backend(config['STORAGE_MIGRATE_FROM'], config),
+            build_backend(config['STORAGE_MIGRATE_TO'], config)
+        )
+    raise StorageError(f'Unknown storage backend: {name}')
+
+def init_storage(app):
+    """Attach the configured storage backend to the app."""
+    backend = build_backend(app.config['STORAGE_BACKEND'], app.config)
+    if app.config.get('STORAGE_ENCRYPTION_KEY'):
+        from app.services.encryption import EncryptedStorage, parse_key
+        backend = EncryptedStorage(
+            backend,
+            parse_key(app.config['STORAGE_ENCRYPTION_KEY']),
+            app.config['STORAGE_ENCRYPTION_SEGMENT_SIZE']
+        )
+    if app.config.get('STORAGE_COMPRESSION'):
+        # Outermost, so files are compressed before they are encrypted
+        from app.services.compression import CompressedStorage, parse_policy
+        backend = CompressedStorage(backend, parse_policy(app.config['STORAGE_COMPRESSION']))
+    app.extensions['storage'] = backend
+
+def get_storage():
+    """Return the current app's storage backend."""
+    return current_app.extensions['storage']
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,78 @@
+"""Disk side of resumable uploads."""
+import hashlib
+import os
+
+from flask import current_app
+
+from app.services.storage import COPY_BUFFER_SIZE
+
+class ChunkError(ValueError):
+    """Raised when a chunk does not match its declared length or checksum."""
+
+class SpooledUpload:
+    """A finished upload on local disk, accepted by Document(file=...)."""
+
+    def __init__(self, filename, path, content_type):
+        self.filename = filename
+        self.path = path
+        self.content_type = content_type
+
+def partial_path(upload_id):
+    """Return the path of an upload session's partial file."""
+    folder = current_app.config.get('UPLOAD_PARTIAL_FOLDER') or \
+        os.path.join(current_app.config['UPLOAD_FOLDER'], '.partial')
+    return os.path.join(folder, upload_id)
+
+def create_partial(upload_id, size):
+    """Create the sparse partial file for a new upload session."""
+    path = partial_path(upload_id)
+    os.makedirs(os.path.dirname(path), mode=0o750, exist_ok=True)
+    with open(path, 'wb') as fh:
+        fh.truncate(size)
+    return path
+
+def write_chunk(upload_id, offset, length, stream, expected_sha256=None):
+    """Write length bytes from stream at offset and return their SHA-256.
+
+    Raises ChunkError if the stream ends early or the checksum differs; the
+    caller must then not record the range as received.
+    """
+    digest = hashlib.sha256()
+    fd = os.open(partial_path(upload_id), os.O_WRONLY)
+    try:
+        written = 0
+        while written < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not data:
+                raise ChunkError(f'Chunk ended after {written} of {length} bytes')
+            digest.update(data)
+            view = memoryview(data)
+            while view:
+                count = os.pwrite(fd, view, offset + written)
+                view = view[count:]
+                written += count
+        if stream.read(1):
+            raise ChunkError(f'Chunk is longer than {length} bytes')
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    checksum = digest.hexdigest()
+    if expected_sha256 and checksum != expected_sha256.lower():
+        raise ChunkError('Chunk checksum mismatch')
+    return checksum
+
+def file_sha256(path):
+    """Return the SHA-256 of a file, reading it in buffer-sized pieces."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for data in iter(lambda: fh.read(COPY_BUFFER_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+def discard_partial(upload_id):
+    """Remove an upload session's partial file if it exists."""
+    try:
+        os.remove(partial_path(upload_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,24 @@
+import base64
+import json
+
+def encode_cursor(values):
+    """Encode keyset pagination values into an opaque cursor token."""
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor token produced by encode_cursor.
+
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def escape_like(value, escape='\\'):
+    """Escape LIKE wildcards so user input is matched literally."""
+    return (value.replace(escape, escape * 2)
+                 .replace('%', f'{escape}%')
+                 .replace('_', f'{escape}_'))
@@ -0,0 +1,42 @@
+"""Gunicorn settings for the API service."""
+import gc
+import os
+
+wsgi_app = os.getenv('GUNICORN_APP', 'app:create_app()')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 2))
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '/app/logs/access.log')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '/app/logs/error.log')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+def when_ready(server):
+    """Finish shared setup in the master, then freeze it for copy-on-write."""
+    if not preload_app:
+        return
+    from app.core.lifecycle import prepare_for_fork
+    prepare_for_fork(server.app.wsgi())
+    # Move everything allocated so far out of the collector's view so the
+    # GC does not touch (and un-share) those pages in every worker.
+    gc.freeze()
+
+def post_fork(server, worker):
+    """Give each worker its own DB and Redis connections."""
+    if preload_app:
+        from app.core.lifecycle import reset_after_fork
+        reset_after_fork(worker.app.wsgi())
+
+def post_worker_init(worker):
+    """Warm pools before the worker accepts its first request."""
+    from app.core.lifecycle import warm_up
+    warm_up(worker.app.wsgi())
+
+def worker_exit(server, worker):
+    """Flush buffered writes before the worker goes away."""
+    from app.core.lifecycle import shutdown
+    shutdown(worker.app.wsgi())
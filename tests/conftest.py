@@ -1,9 +1,158 @@
 import os
 import tempfile
+from collections import Counter
 import pytest
+import redis
 from app import create_app
+from app.core.singleflight import CoalescingCache
 from app.database.base import db as _db
 
+class FakeRedis:
+    """Dict-backed stand-in for the Redis commands the app uses.
+
+    Values are kept as given; calls counts every command by name.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.hashes = {}
+        self.zsets = {}
+        self.published = []
+        self.calls = Counter()
+
+    def __getattribute__(self, name):
+        value = object.__getattribute__(self, name)
+        if callable(value) and not name.startswith('_') and name != 'pipelined':
+            object.__getattribute__(self, 'calls')[name] += 1
+        return value
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def eval(self, script, numkeys, key, token):
+        # The compare-and-delete lock release
+        if self.data.get(key) == token:
+            del self.data[key]
+
+    def incr(self, key, amount=1):
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    def expire(self, key, ttl):
+        return True
+
+    def hincrby(self, key, field, amount=1):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+        return fields[field]
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    def zrangebyscore(self, key, low, high):
+        return [member.encode() for member, score in self.zsets.get(key, {}).items() if score >= low]
+
+    def publish(self, channel, message):
+        self.published.append(message)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=False):
+        fake, replies = self, []
+
+        class Pipe:
+            # Commands run as they are queued; execute() returns their replies
+            def __getattr__(pipe, name):
+                command = getattr(fake, name)
+                return lambda *args, **kwargs: replies.append(command(*args, **kwargs))
+
+            def execute(pipe):
+                return list(replies)
+
+        return Pipe()
+
+    def pipelined(self, build, transaction=False):
+        pipe = self.pipeline(transaction)
+        build(pipe)
+        return pipe.execute()
+
+class BrokenRedis:
+    """Redis stand-in whose every command fails as if the server were down."""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.ConnectionError('down')
+        return fail
+
+@pytest.fixture
+def fake_redis():
+    """A fresh in-memory Redis stand-in."""
+    return FakeRedis()
+
+@pytest.fixture
+def broken_redis():
+    """A Redis stand-in that is always down."""
+    return BrokenRedis()
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Return a factory for apps on a SQLite file under tmp_path.
+
+    Keyword arguments override the config. Each app gets its own FakeRedis
+    (or the one passed as redis) with the document cache on it, and only the
+    primary's tables: other tests may have registered a replica bind.
+    """
+    apps = []
+
+    def build(redis=None, **config):
+        app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+            'SQLALCHEMY_ENGINE_OPTIONS': {},
+            'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+            **config
+        })
+        app.redis = redis if redis is not None else FakeRedis()
+        app.extensions['cache'] = CoalescingCache(app.redis)
+        with app.app_context():
+            _db.create_all(bind_key=None)
+        apps.append(app)
+        return app
+
+    yield build
+
+    for app in apps:
+        with app.app_context():
+            _db.drop_all(bind_key=None)
+
 @pytest.fixture
 def app():
     """Create and configure a new app instance for each test."""
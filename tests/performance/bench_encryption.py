@@ -0,0 +1,55 @@
+"""Cost of streaming encryption at rest, per MB and per segment size."""
+import io
+import os
+import sys
+import tempfile
+import time
+
+from app.services.encryption import EncryptedStorage
+from app.services.storage import LocalStorage
+
+SEGMENT_SIZES = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024)
+
+def best_of(fn, repeat=3):
+    """Return the fastest of several runs, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    content = os.urandom(megabytes * 1024 * 1024)
+    root = tempfile.mkdtemp()
+    plain = LocalStorage(root)
+
+    plain_write = best_of(lambda: plain.save('plain.bin', io.BytesIO(content)))
+    print(f'{megabytes}MB file, plaintext write {plain_write * 1000 / megabytes:.2f} ms/MB')
+    print(f"{'segment':>10} {'encrypt ms/MB':>14} {'decrypt ms/MB':>14} {'64KB range ms':>14} {'overhead':>9}")
+
+    for segment_size in SEGMENT_SIZES:
+        storage = EncryptedStorage(plain, bytes(32), segment_size)
+
+        def read_all():
+            with storage.open('enc.bin') as fh:
+                while fh.read(1024 * 1024):
+                    pass
+
+        def read_range():
+            with storage.open('enc.bin') as fh:
+                fh.seek(len(content) // 2)
+                fh.read(64 * 1024)
+
+        encrypt = best_of(lambda: storage.save('enc.bin', io.BytesIO(content)))
+        decrypt = best_of(read_all)
+        ranged = best_of(read_range, repeat=20)
+        overhead = os.path.getsize(os.path.join(root, 'enc.bin')) / len(content) - 1
+        print(
+            f'{segment_size // 1024:>8}KB {encrypt * 1000 / megabytes:>14.2f} '
+            f'{decrypt * 1000 / megabytes:>14.2f} {ranged * 1000:>14.3f} {overhead:>8.3%}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Throughput of document text extraction across process pool sizes."""
+import os
+import sys
+import time
+import zipfile
+from io import BytesIO
+
+from app.services.extraction import extract_many
+
+WORD_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+def make_docx(paragraphs=400):
+    body = ''.join(
+        f'<w:p><w:r><w:t>Statement line {i} account no. 1234-{i:04d} '
+        f'paid $1,{i % 1000:03d}.50 on 2024-01-{i % 28 + 1:02d}</w:t></w:r></w:p>'
+        for i in range(paragraphs)
+    )
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{WORD_NS}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+def make_xlsx(rows=1000):
+    strings = ''.join(f'<si><t>Vendor {i}</t></si>' for i in range(rows))
+    cells = ''.join(
+        f'<row r="{i + 1}"><c t="s"><v>{i}</v></c><c><v>{i * 3.25:.2f}</v></c></row>'
+        for i in range(rows)
+    )
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{SHEET_NS}">{strings}</sst>')
+        archive.writestr('xl/worksheets/sheet1.xml',
+                         f'<worksheet xmlns="{SHEET_NS}"><sheetData>{cells}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+def main(documents=200):
+    docx, xlsx = make_docx(), make_xlsx()
+    jobs = [(i, 'docx', docx) if i % 2 else (i, 'xlsx', xlsx) for i in range(documents)]
+
+    cores = os.cpu_count() or 1
+    counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    print(f'{documents} documents, {cores} cores')
+    print(f'{"workers":>8} {"seconds":>9} {"docs/sec":>10} {"speedup":>8}')
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        for _ in extract_many(jobs, workers=workers):
+            pass
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f'{workers:>8} {elapsed:>9.2f} {documents / elapsed:>10.1f} {baseline / elapsed:>7.1f}x')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,59 @@
+"""Benchmark process startup: import cost and create_app cost."""
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import app
+print((time.perf_counter() - start) * 1000)
+"""
+
+CREATE_APP_SNIPPET = """
+import time
+import app
+start = time.perf_counter()
+app.create_app('testing', {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'SQLALCHEMY_ENGINE_OPTIONS': {},
+})
+print((time.perf_counter() - start) * 1000)
+"""
+
+def run(snippet):
+    """Run a snippet in a fresh interpreter and return its printed timing."""
+    out = subprocess.run(
+        [sys.executable, '-c', snippet],
+        capture_output=True, text=True, check=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+def slowest_imports(limit=10):
+    """Return the modules with the highest cumulative import time."""
+    out = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def main():
+    imports = [run(IMPORT_SNIPPET) for _ in range(RUNS)]
+    create = [run(CREATE_APP_SNIPPET) for _ in range(RUNS)]
+    print(f"import app      median {statistics.median(imports):8.1f} ms  max {max(imports):8.1f} ms")
+    print(f"create_app()    median {statistics.median(create):8.1f} ms  max {max(create):8.1f} ms")
+    print('\nslowest imports (cumulative):')
+    for cumulative_us, name in slowest_imports():
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Benchmark the admin user directory as the user count grows."""
+import sys
+
+from app.database.base import db
+from app.models.user import User
+from tests.performance.harness import bench_app, timed
+
+SIZES = (1_000, 10_000, 100_000)
+BATCH = 5_000
+
+def seed(target):
+    """Bulk insert users until the table holds ``target`` rows."""
+    existing = User.query.count()
+    for start in range(existing, target, BATCH):
+        rows = [
+            {
+                'email': f'user{i:07d}@example.com',
+                'username': f'user{i:07d}',
+                'password_hash': 'x',
+                'role': 'admin' if i % 50 == 0 else 'user',
+                'is_verified': i % 3 == 0,
+                'is_active': True
+            }
+            for i in range(start, min(start + BATCH, target))
+        ]
+        db.session.execute(db.insert(User), rows)
+        db.session.commit()
+
+def deep_cursor():
+    """Walk ten pages in to measure a non-first page."""
+    cursor = None
+    for _ in range(10):
+        _, cursor = User.search_directory(cursor=cursor, limit=50)
+    return cursor
+
+def main():
+    app = bench_app()
+    print(f"{'users':>8} {'first page':>12} {'deep page':>12} {'prefix':>12} {'filtered':>12}  (median ms)")
+    with app.app_context():
+        for size in SIZES:
+            seed(size)
+            cursor = deep_cursor()
+            first, _ = timed(lambda: User.search_directory(limit=50))
+            deep, _ = timed(lambda: User.search_directory(cursor=cursor, limit=50))
+            prefix, _ = timed(lambda: User.search_directory(prefix='user00012', limit=50))
+            filtered, _ = timed(lambda: User.search_directory(role='admin', is_verified=True, limit=50))
+            print(f'{size:>8} {first:>12.2f} {deep:>12.2f} {prefix:>12.2f} {filtered:>12.2f}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
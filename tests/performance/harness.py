@@ -0,0 +1,39 @@
+"""Shared helpers for the standalone performance benchmarks."""
+import os
+import statistics
+import tempfile
+import time
+
+from flask import Flask
+
+from app.core.config import config
+from app.database.base import db, init_db
+
+def bench_app(database_uri=None):
+    """Create a minimal app bound to a throwaway SQLite database."""
+    if database_uri is None:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        database_uri = f'sqlite:///{path}'
+
+    app = Flask('bench')
+    app.config.from_object(config['testing'])
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        SQLALCHEMY_ECHO=False
+    )
+    init_db(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def timed(fn, repeat=20):
+    """Run fn repeatedly and return (median, p95) latency in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
@@ -0,0 +1,85 @@
+import time
+import pytest
+from flask_jwt_extended import create_access_token
+from app.core.admission import AdaptiveLimit, queue_time, route_class
+from app.models.user import User
+
+def _run_window(limit, latency, concurrent):
+    for _ in range(limit.window // concurrent):
+        assert all(limit.try_acquire() for _ in range(concurrent))
+        for _ in range(concurrent):
+            limit.release(latency)
+
+def test_limit_grows_while_latency_holds_and_backs_off_when_it_rises():
+    """Test additive increase under steady latency and decrease under slowdown."""
+    limit = AdaptiveLimit(2, max_limit=8, window=12)
+
+    for _ in range(3):
+        _run_window(limit, 0.01, int(limit.limit))
+    assert limit.limit == 5
+
+    _run_window(limit, 0.1, 2)
+    assert limit.limit == pytest.approx(4.5)
+    assert limit.inflight == 0
+
+def test_limit_rejects_when_full():
+    """Test the slot count is enforced."""
+    limit = AdaptiveLimit(1)
+
+    assert limit.try_acquire()
+    assert not limit.try_acquire()
+    limit.release(0.01)
+    assert limit.try_acquire()
+
+def test_route_classes():
+    """Test endpoints map to their route classes."""
+    assert route_class('auth.login') == 'auth'
+    assert route_class('documents.list_documents') == 'search'
+    assert route_class('uploads.upload_chunk') == 'files'
+    assert route_class('documents.get_document') == 'default'
+
+def test_queue_time_parses_nginx_header():
+    """Test X-Request-Start in seconds and microseconds."""
+    now = 1700000001.0
+    assert queue_time('t=1700000000.500', now) == pytest.approx(0.5)
+    assert queue_time('t=1700000000500000', now) == pytest.approx(0.5)
+    assert queue_time('garbage', now) is None
+    assert queue_time(None, now) is None
+
+def test_saturated_class_is_shed_but_health_and_admin_are_not(app):
+    """Test excess requests get a fast 503 while priority routes still run."""
+    client = app.test_client()
+    controller = app.extensions['admission']
+    with app.app_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+    search = controller.limits['search']
+    while search.try_acquire():
+        pass
+
+    response = client.get('/api/v1/documents', headers=headers)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    assert client.get('/health').status_code == 200
+    assert client.get('/api/v1/users', headers=headers).status_code == 200
+
+def test_requests_that_queued_too_long_are_shed(app):
+    """Test requests older than the class's queue timeout are rejected."""
+    client = app.test_client()
+    stale = {'X-Request-Start': f't={time.time() - 60:.3f}'}
+
+    response = client.post('/api/v1/auth/login', json={}, headers=stale)
+
+    assert response.status_code == 503
+    assert client.get('/health', headers=stale).status_code == 200
+    assert all(limit.inflight == 0 for limit in app.extensions['admission'].limits.values())
+
+@pytest.fixture
+def app(make_app):
+    """Create an app on SQLite with one admin user."""
+    app = make_app()
+
+    with app.app_context():
+        User(email='a@example.com', username='admin', password_hash='x', role='admin').save()
+
+    return app
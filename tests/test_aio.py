@@ -0,0 +1,162 @@
+import asyncio
+import io
+import pytest
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+from flask_jwt_extended import create_access_token, get_jwt_identity
+from app.aio import create_aio_app
+from app.core.singleflight import CoalescingCache
+from app.database.base import db
+from app.database.session import STICKY_COOKIE, STICKY_HEADER, ReplicaRouter, verify_sticky
+from app.models.document import Document
+from app.models.user import User
+
+BODY = b''.join(b'line %d of the statement\n' % i for i in range(2000))
+
+def _run(aio_app, scenario):
+    """Run scenario(client) against the app on a test server."""
+    async def main():
+        async with TestClient(TestServer(aio_app)) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+def _form(name='statement.pdf', **fields):
+    form = FormData()
+    for key, value in {'title': 'Statement', 'document_type': 'bank_statement', **fields}.items():
+        form.add_field(key, value)
+    form.add_field('file', BODY, filename=name, content_type='application/pdf')
+    return form
+
+def test_upload_spools_into_the_apps_upload_folder_and_downloads(aio_app, token, tmp_path, activities):
+    """Test an upload is stored under the configured folder, served back with sendfile and audited."""
+    async def scenario(client):
+        response = await client.post('/api/v1/documents', data=_form(), headers=token('owner'))
+        assert response.status == 201
+        document = (await response.json())['document']
+
+        response = await client.get(document['download_url'], headers=token('owner'))
+        assert response.status == 200
+        assert response.headers['Content-Disposition'] == 'attachment; filename="Statement.pdf"'
+        assert await response.read() == BODY
+        return document
+
+    document = _run(aio_app, scenario)
+    assert (tmp_path / 'uploads' / document['file_path']).read_bytes() == BODY
+    owner_id = str(document['owner_id'])
+    assert activities == [
+        ('document_create', owner_id, {}), ('document_download', owner_id, {'document_id': document['id']})
+    ]
+    assert not [path for path in (tmp_path / 'uploads').iterdir() if path.name.startswith('.upload-')]
+
+def test_upload_pins_the_uploader_to_the_primary(aio_app, token):
+    """Test an upload made through aiohttp makes the uploader's next Flask reads sticky."""
+    flask_app = aio_app['flask_app']
+    flask_app.extensions['replica_router'] = ReplicaRouter(flask_app)
+
+    async def scenario(client):
+        response = await client.post('/api/v1/documents', data=_form(), headers=token('owner'))
+        assert response.status == 201
+        assert response.cookies[STICKY_COOKIE].value == response.headers[STICKY_HEADER]
+        return response.headers[STICKY_HEADER]
+
+    marker = _run(aio_app, scenario)
+    with flask_app.test_request_context('/api/v1/documents', method='GET'):
+        owner_id = User.get_by_username('owner').id
+        assert verify_sticky(f'user:{owner_id}', marker)
+        assert not verify_sticky('user:0', marker)
+
+def test_upload_rejects_bad_files_and_missing_tokens(aio_app, token, tmp_path):
+    """Test the upload validates the token, the file type and the form, leaving no spooled file behind."""
+    second_file = _form()
+    second_file.add_field('file', BODY, filename='again.pdf', content_type='application/pdf')
+
+    async def scenario(client):
+        assert (await client.post('/api/v1/documents', data=_form())).status == 401
+        response = await client.post('/api/v1/documents', data=_form('run.exe'), headers=token('owner'))
+        assert response.status == 400
+        response = await client.post(
+            '/api/v1/documents', data=_form(document_type='bogus'), headers=token('owner')
+        )
+        assert response.status == 422
+        response = await client.post('/api/v1/documents', data=second_file, headers=token('owner'))
+        assert response.status == 400
+
+    _run(aio_app, scenario)
+    assert not list((tmp_path / 'uploads').iterdir())
+
+def test_download_checks_access_and_streams_ranges(aio_app, token):
+    """Test private documents are refused to others, and ranges stream when sendfile is unavailable."""
+    flask_app = aio_app['flask_app']
+    with flask_app.app_context():
+        owner_id = User.get_by_username('owner').id
+    storage = aio_app['storage']
+    storage.save('stream.pdf', io.BytesIO(BODY))
+    with flask_app.app_context():
+        document_id = Document(
+            title='Streamed', document_type='invoice', owner_id=owner_id, file_path='stream.pdf',
+            file_type='pdf', file_size=len(BODY), mime_type='application/pdf'
+        ).save().id
+    # As for compressed, encrypted or S3 files
+    storage.local_path = lambda key: None
+    url = f'/api/v1/documents/{document_id}/download'
+
+    async def scenario(client):
+        assert (await client.get(url, headers=token('other'))).status == 403
+        assert (await client.get('/api/v1/documents/999/download', headers=token('owner'))).status == 404
+
+        response = await client.get(url, headers={**token('owner'), 'Range': 'bytes=100-199'})
+        assert response.status == 206
+        assert response.headers['Content-Range'] == f'bytes 100-199/{len(BODY)}'
+        assert await response.read() == BODY[100:200]
+
+        response = await client.get(url, headers={**token('owner'), 'Range': f'bytes={len(BODY)}-'})
+        assert response.status == 416
+
+    _run(aio_app, scenario)
+
+@pytest.fixture
+def aio_app(tmp_path, fake_redis):
+    """Create the aiohttp app over a Flask app on SQLite with two users."""
+    app = create_aio_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads')
+    })
+    flask_app = app['flask_app']
+    flask_app.redis = fake_redis
+    flask_app.extensions['cache'] = CoalescingCache(fake_redis)
+
+    with flask_app.app_context():
+        db.create_all(bind_key=None)
+        for name in ('owner', 'other'):
+            User(email=f'{name}@example.com', username=name, password_hash='x').save()
+
+    yield app
+
+    with flask_app.app_context():
+        db.drop_all(bind_key=None)
+
+@pytest.fixture
+def activities(monkeypatch):
+    """Record (action, JWT identity, view arguments) for each log_activity call from the aio handlers."""
+    recorded = []
+
+    def log_activity(action):
+        def decorator(view):
+            def wrapper(**kwargs):
+                recorded.append((action, get_jwt_identity(), kwargs))
+                return view(**kwargs)
+            return wrapper
+        return decorator
+
+    monkeypatch.setattr('app.aio.log_activity', log_activity)
+    return recorded
+
+@pytest.fixture
+def token(aio_app):
+    """Return a function building an authorization header for a username."""
+    def build(username):
+        with aio_app['flask_app'].app_context():
+            user_id = User.get_by_username(username).id
+            return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+    return build
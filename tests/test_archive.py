@@ -0,0 +1,99 @@
+import csv
+import io
+import zipfile
+from datetime import date
+import pytest
+from flask_jwt_extended import create_access_token
+from werkzeug.datastructures import FileStorage
+from app.models.document import Document
+from app.models.user import User
+
+def _upload(name, content):
+    return FileStorage(io.BytesIO(content), filename=name, content_type='application/pdf')
+
+def _archive(client, headers, **payload):
+    response = client.post('/api/v1/documents/archive', json=payload, headers=headers)
+    return response, (zipfile.ZipFile(io.BytesIO(response.data)) if response.status_code == 200 else None)
+
+def test_archive_by_ids_streams_files_and_manifest(archive_app, auth):
+    """Test the archive holds each requested file and a checksummed manifest."""
+    client = archive_app.test_client()
+    with archive_app.app_context():
+        ids = [d.id for d in Document.query.filter_by(owner_id=1).order_by(Document.id)]
+
+    response, archive = _archive(client, auth, ids=ids)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    names = archive.namelist()
+    assert names[-1] == 'manifest.csv'
+    assert archive.read(names[0]) == b'statement 2023-03'
+    manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode())))
+    assert [int(row['document_id']) for row in manifest] == ids
+    assert {row['status'] for row in manifest} == {'ok'}
+
+def test_archive_by_filters(archive_app, auth):
+    """Test search filters and a date range select the archived documents."""
+    client = archive_app.test_client()
+
+    response, archive = _archive(
+        client, auth,
+        document_type='bank_statement', date_from='2023-01-01', date_to='2023-12-31'
+    )
+
+    assert response.status_code == 200
+    contents = sorted(archive.read(name) for name in archive.namelist() if name != 'manifest.csv')
+    assert contents == [b'statement 2023-03', b'statement 2023-09']
+
+def test_archive_rejects_inaccessible_documents(archive_app, auth):
+    """Test one inaccessible id fails the whole request."""
+    client = archive_app.test_client()
+    with archive_app.app_context():
+        private = Document.query.filter_by(owner_id=2).first().id
+        own = Document.query.filter_by(owner_id=1).first().id
+
+    response, _ = _archive(client, auth, ids=[own, private])
+
+    assert response.status_code == 404
+    assert response.get_json()['document_ids'] == [private]
+
+@pytest.mark.parametrize('metadata_filters', ['x', [['amount', 'bogus', 'eq', 1]]])
+def test_archive_rejects_raw_metadata_filters(archive_app, auth, metadata_filters):
+    """Test metadata_filters in the body is a validation error, not a server error."""
+    response, _ = _archive(archive_app.test_client(), auth, metadata_filters=metadata_filters)
+
+    assert response.status_code == 422
+    assert 'metadata_filters' in response.get_json()['errors']
+
+@pytest.fixture
+def archive_app(make_app):
+    """Create an app on SQLite with documents for two owners."""
+    app = make_app()
+
+    with app.app_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        other = User(email='x@example.com', username='other', password_hash='x').save()
+        for owner_id, document_type, day in [
+            (owner.id, 'bank_statement', date(2023, 3, 31)),
+            (owner.id, 'bank_statement', date(2023, 9, 30)),
+            (owner.id, 'bank_statement', date(2024, 3, 31)),
+            (owner.id, 'invoice', date(2023, 5, 1)),
+            (other.id, 'bank_statement', date(2023, 3, 31))
+        ]:
+            Document(
+                title=f'{document_type} {day}',
+                document_type=document_type,
+                document_date=day,
+                owner_id=owner_id,
+                access_level='private',
+                file=_upload('s.pdf', f'statement {day:%Y-%m}'.encode())
+            ).save()
+
+    return app
+
+@pytest.fixture
+def auth(archive_app):
+    """Create an authorization header for the first owner."""
+    with archive_app.app_context():
+        token = create_access_token(identity='1')
+    return {'Authorization': f'Bearer {token}'}
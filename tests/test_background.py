@@ -0,0 +1,29 @@
+import os
+import threading
+from app.core.background import ProcessThread
+
+def test_thread_starts_once_per_process_and_key():
+    """Test repeated starts are ignored until the thread exits, the key changes or the pid does."""
+    release = threading.Event()
+    calls = []
+
+    def target(value):
+        calls.append(value)
+        release.wait(5)
+
+    thread = ProcessThread(target, 'test')
+    assert thread.start('a')
+    assert not thread.start('b')
+    assert thread.start('c', key=2)
+    assert thread.running == (2, os.getpid())
+
+    # As a forked worker sees its parent's bookkeeping
+    thread.running = (2, os.getpid() + 1)
+    assert thread.start('d', key=2)
+
+    release.set()
+    for worker in threading.enumerate():
+        if worker.name == 'test':
+            worker.join(5)
+    assert sorted(calls) == ['a', 'c', 'd']
+    assert thread.running is None
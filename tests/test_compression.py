@@ -0,0 +1,89 @@
+import io
+import os
+import pytest
+from app.services.compression import FORMAT_VERSION, HEADER, MAGIC, TRAILER, CompressedStorage, parse_policy
+from app.services.encryption import EncryptedStorage
+from app.services.storage import LocalStorage, StorageError
+
+POLICY = parse_policy({'pdf': 'zlib:6', 'xls': 'lzma:6'})
+TEXT = b''.join(b'2024-01-%02d,ACC-1234,Payment received,%d.50\n' % (i % 28 + 1, i) for i in range(20000))
+
+def _storage(tmp_path):
+    return CompressedStorage(LocalStorage(str(tmp_path)), POLICY)
+
+@pytest.mark.parametrize('key', ['a.pdf', 'a.xls'])
+def test_text_files_compress_and_stream_back(tmp_path, key):
+    """Test compressible types shrink on disk and read back byte for byte."""
+    storage = _storage(tmp_path)
+
+    assert storage.save(key, io.BytesIO(TEXT)) == len(TEXT)
+    assert storage.stored_size(key) < len(TEXT) / 5
+    assert storage.size(key) == len(TEXT)
+    assert storage.local_path(key) is None
+    with storage.open(key) as fh:
+        assert fh.read() == TEXT
+
+def test_incompressible_and_unlisted_types_stored_raw(tmp_path):
+    """Test random data is stored behind a header and image types skip compression."""
+    storage = _storage(tmp_path)
+    noise = os.urandom(200 * 1024)
+
+    storage.save('scan.pdf', io.BytesIO(noise))
+    storage.save('photo.png', io.BytesIO(TEXT))
+
+    assert storage.stored_size('scan.pdf') == len(noise) + HEADER.size + TRAILER.size
+    assert storage.local_path('scan.pdf') is None
+    with storage.open('scan.pdf') as fh:
+        assert fh.read() == noise
+        fh.seek(1000)
+        assert fh.read(10) == noise[1000:1010]
+    assert (tmp_path / 'photo.png').read_bytes() == TEXT
+    assert storage.local_path('photo.png') == str(tmp_path / 'photo.png')
+
+def test_files_starting_with_the_magic_are_not_misread(tmp_path):
+    """Test content that looks like a header reads back unchanged."""
+    storage = _storage(tmp_path)
+    lookalike = HEADER.pack(MAGIC, FORMAT_VERSION, 1) + os.urandom(1024)
+
+    storage.save('photo.png', io.BytesIO(lookalike))
+    storage.save('scan.pdf', io.BytesIO(lookalike))
+
+    assert storage.local_path('photo.png') == str(tmp_path / 'photo.png')
+    for key in ('photo.png', 'scan.pdf'):
+        assert storage.size(key) == len(lookalike)
+        with storage.open(key) as fh:
+            assert fh.read() == lookalike
+
+def test_seek_into_compressed_file(tmp_path):
+    """Test ranged reads work forwards and backwards."""
+    storage = _storage(tmp_path)
+    storage.save('a.pdf', io.BytesIO(TEXT))
+
+    with storage.open('a.pdf') as fh:
+        fh.seek(500000)
+        assert fh.read(100) == TEXT[500000:500100]
+        fh.seek(10)
+        assert fh.read(100) == TEXT[10:110]
+
+def test_compression_under_encryption(tmp_path):
+    """Test files are compressed before encryption and both layers reverse."""
+    storage = CompressedStorage(EncryptedStorage(LocalStorage(str(tmp_path)), bytes(32)), POLICY)
+
+    storage.save('a.pdf', io.BytesIO(TEXT))
+
+    assert os.path.getsize(tmp_path / 'a.pdf') < len(TEXT) / 5
+    assert storage.size('a.pdf') == len(TEXT)
+    with storage.open('a.pdf') as fh:
+        assert fh.read() == TEXT
+
+def test_corrupt_stream_raises(tmp_path):
+    """Test a damaged compressed file raises instead of returning garbage."""
+    storage = _storage(tmp_path)
+    storage.save('a.pdf', io.BytesIO(TEXT))
+    path = tmp_path / 'a.pdf'
+    data = bytearray(path.read_bytes())
+    data[100:200] = b'\x00' * 100
+    path.write_bytes(bytes(data))
+
+    with storage.open('a.pdf') as fh, pytest.raises(StorageError):
+        fh.read()
@@ -0,0 +1,76 @@
+import pytest
+from datetime import date
+from app.database.base import db
+from app.models.document import Document
+from app.models.document_facet import DocumentFacetCount
+from app.models.user import User
+
+def test_rollups_follow_inserts_updates_and_deletes(facets_app):
+    """Test the rollup counts move with every kind of document write."""
+    with facets_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        facets = DocumentFacetCount.for_owner(owner_id)
+        assert facets['document_type'] == {'invoice': 2, 'bank_statement': 1}
+        assert facets['access_level'] == {'private': 2, 'shared': 1}
+        assert facets['is_confidential'] == {'false': 2, 'true': 1}
+        assert facets['document_month'] == {'2024-03': 2, 'none': 1}
+
+        invoice = Document.query.filter_by(title='Invoice 1').first()
+        invoice.update(document_type='receipt', document_date=date(2024, 4, 2))
+        Document.query.filter_by(title='Invoice 2').first().update(is_active=False)
+        Document.query.filter_by(title='Statement').first().delete()
+
+        facets = DocumentFacetCount.for_owner(owner_id)
+        assert facets['document_type'] == {'receipt': 1}
+        assert facets['document_month'] == {'2024-04': 1}
+
+def test_update_on_expired_instance_uses_stored_values(facets_app):
+    """Test changes made without loading the row still move the right bucket."""
+    with facets_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        invoice = Document.query.filter_by(title='Invoice 1').first()
+        db.session.expire(invoice)
+        invoice.access_level = 'public'
+        db.session.commit()
+
+        assert DocumentFacetCount.for_owner(owner_id)['access_level'] == {'private': 1, 'shared': 1, 'public': 1}
+
+def test_filtered_facets_match_rollups_and_rebuild(facets_app):
+    """Test the grouped query, the rollups and a rebuild agree."""
+    with facets_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        rollup = Document.facet_counts(user_id=owner_id)
+        db.session.execute(db.update(DocumentFacetCount).values(count=0))
+        DocumentFacetCount.rebuild()
+
+        assert DocumentFacetCount.for_owner(owner_id) == rollup
+        assert Document.facet_counts(query='', user_id=owner_id, metadata_filters=[]) == rollup
+
+        filtered = Document.facet_counts(query='Invoice', user_id=owner_id)
+        assert filtered['document_type'] == {'invoice': 2}
+        assert filtered['document_month'] == {'2024-03': 1, 'none': 1}
+
+@pytest.fixture
+def facets_app(make_app):
+    """Create an app on SQLite with three documents for one owner."""
+    app = make_app()
+
+    with app.app_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        for title, document_type, extra in (
+            ('Invoice 1', 'invoice', {'document_date': date(2024, 3, 1)}),
+            ('Invoice 2', 'invoice', {'access_level': 'shared', 'is_confidential': True}),
+            ('Statement', 'bank_statement', {'document_date': date(2024, 3, 31)})
+        ):
+            Document(
+                title=title,
+                file_path=f'{title}.pdf',
+                file_type='pdf',
+                file_size=1,
+                mime_type='application/pdf',
+                document_type=document_type,
+                owner_id=owner.id,
+                **extra
+            ).save()
+
+    return app
@@ -0,0 +1,103 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from flask_jwt_extended import create_access_token
+from marshmallow import ValidationError
+from app.models.document import Document
+from app.models.document_metadata import DocumentMetadataValue
+from app.models.user import User
+from app.schemas.document import DocumentSearchSchema
+
+def test_indexed_keys_are_mirrored_on_save(metadata_app):
+    """Test indexed keys get typed rows and unindexed or invalid values are skipped."""
+    with metadata_app.app_context():
+        document = Document.query.filter_by(title='March').first()
+        rows = {row.key: row for row in document.metadata_values}
+
+        assert set(rows) == {'account_number', 'amount', 'statement_date'}
+        assert rows['amount'].value_number == Decimal('120.5')
+        assert rows['statement_date'].value_date == date(2024, 3, 31)
+        assert rows['account_number'].value_string == 'ACC-1'
+
+def test_metadata_update_resyncs_rows(metadata_app):
+    """Test replacing the metadata JSON updates and removes index rows."""
+    with metadata_app.app_context():
+        document = Document.query.filter_by(title='March').first()
+        document.update(doc_metadata={'amount': 99})
+
+        rows = DocumentMetadataValue.query.filter_by(document_id=document.id).all()
+        assert [(row.key, row.value_number) for row in rows] == [('amount', Decimal('99'))]
+
+def test_search_with_equality_and_range_filters(metadata_app):
+    """Test typed metadata filters combine with the other search filters."""
+    with metadata_app.app_context():
+        user_id = User.get_by_username('owner').id
+
+        def titles(filters):
+            page = Document.search(None, user_id=user_id, metadata_filters=filters)
+            return sorted(document.title for document in page.items)
+
+        assert titles([('account_number', 'string', 'eq', 'ACC-1')]) == ['April', 'March']
+        assert titles([
+            ('account_number', 'string', 'eq', 'ACC-1'),
+            ('amount', 'number', 'gte', Decimal('200'))
+        ]) == ['April']
+        assert titles([('statement_date', 'date', 'lt', date(2024, 4, 1))]) == ['March']
+
+def test_search_schema_parses_meta_parameters(metadata_app):
+    """Test meta.* query parameters are typed by the declared key kind."""
+    with metadata_app.test_request_context():
+        params = DocumentSearchSchema().load({
+            'meta.account_number': 'ACC-1',
+            'meta.amount.lte': '250.00'
+        })
+        assert params['metadata_filters'] == [
+            ('account_number', 'string', 'eq', 'ACC-1'),
+            ('amount', 'number', 'lte', Decimal('250.00'))
+        ]
+
+        with pytest.raises(ValidationError) as error:
+            DocumentSearchSchema().load({'meta.notes': 'x', 'meta.amount.gte': 'lots'})
+        assert set(error.value.messages) == {'meta.notes', 'meta.amount.gte'}
+
+        # Callers cannot supply the parsed filters themselves
+        for value in ('abc', [['amount', 'bogus', 'eq', 1]]):
+            with pytest.raises(ValidationError) as error:
+                DocumentSearchSchema().load({'metadata_filters': value})
+            assert set(error.value.messages) == {'metadata_filters'}
+
+def test_malformed_metadata_filters_are_rejected(metadata_app):
+    """Test a client-supplied metadata_filters parameter is a validation error."""
+    with metadata_app.app_context():
+        token = create_access_token(identity=str(User.get_by_username('owner').id))
+    response = metadata_app.test_client().get(
+        '/api/v1/documents?metadata_filters=abc',
+        headers={'Authorization': f'Bearer {token}'}
+    )
+    assert response.status_code == 422
+    assert 'metadata_filters' in response.get_json()['errors']
+
+@pytest.fixture
+def metadata_app(make_app):
+    """Create an app on SQLite with two statements on one account."""
+    app = make_app()
+
+    with app.app_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        for title, metadata in (
+            ('March', {'account_number': 'ACC-1', 'amount': 120.5,
+                       'statement_date': '2024-03-31', 'tax_year': 'n/a', 'notes': 'x'}),
+            ('April', {'account_number': 'ACC-1', 'amount': '240.00', 'statement_date': '2024-04-30'})
+        ):
+            Document(
+                title=title,
+                file_path=f'{title}.pdf',
+                file_type='pdf',
+                file_size=1,
+                mime_type='application/pdf',
+                document_type='bank_statement',
+                owner_id=owner.id,
+                doc_metadata=metadata
+            ).save()
+
+    return app
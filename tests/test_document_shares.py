@@ -0,0 +1,158 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app.database.base import db
+from app.models.document import Document
+from app.models.document_share import DocumentShare, DocumentVisibility, PUBLIC_VIEWER
+from app.models.group import Group, GroupMember
+from app.models.user import User
+
+def _document(owner_id, title, access_level='private'):
+    return Document(
+        title=title, owner_id=owner_id, document_type='invoice', access_level=access_level,
+        file_path=f'{title}.pdf', file_type='pdf', file_size=1, mime_type='application/pdf'
+    ).save()
+
+def _viewers(document_id):
+    return set(db.session.scalars(
+        db.select(DocumentVisibility.viewer_id).where(DocumentVisibility.document_id == document_id)
+    ))
+
+def _users():
+    return [User.get_by_username(name).id for name in ('owner', 'alice', 'bob')]
+
+def test_index_follows_access_level_and_user_grants(share_app):
+    """Test grants count only while shared, and public or deleted documents are indexed once or not at all."""
+    with share_app.app_context():
+        owner_id, alice_id, bob_id = _users()
+        document = _document(owner_id, 'Report')
+        assert _viewers(document.id) == {owner_id}
+
+        DocumentShare(document_id=document.id, grantee_user_id=alice_id, granted_by=owner_id).save()
+        assert _viewers(document.id) == {owner_id}
+        document.update(access_level='shared')
+        assert _viewers(document.id) == {owner_id, alice_id}
+        assert DocumentVisibility.can_view(alice_id, document.id)
+        assert not DocumentVisibility.can_view(bob_id, document.id)
+
+        # Going private hides the grant without dropping it
+        document.update(access_level='private')
+        assert _viewers(document.id) == {owner_id}
+        document.update(access_level='public')
+        assert _viewers(document.id) == {PUBLIC_VIEWER}
+        assert DocumentVisibility.can_view(bob_id, document.id)
+
+        document.update(access_level='shared')
+        DocumentShare.find(document.id, user_id=alice_id).delete()
+        assert _viewers(document.id) == {owner_id}
+
+        DocumentShare(document_id=document.id, grantee_user_id=bob_id, granted_by=owner_id).save()
+        document_id = document.id
+        document.delete()
+        assert _viewers(document_id) == set()
+        assert DocumentShare.for_document(document_id) == []
+
+def test_group_membership_changes_update_shared_documents(share_app):
+    """Test joining, leaving and deleting a group change who sees its documents."""
+    with share_app.app_context():
+        owner_id, alice_id, bob_id = _users()
+        document = _document(owner_id, 'Budget', access_level='shared')
+        group = Group(name='finance', created_by=owner_id)
+        group.members.append(GroupMember(user_id=alice_id))
+        group.save()
+        DocumentShare(document_id=document.id, grantee_group_id=group.id, granted_by=owner_id).save()
+        assert _viewers(document.id) == {owner_id, alice_id}
+
+        db.session.add(GroupMember(group_id=group.id, user_id=bob_id))
+        db.session.commit()
+        assert _viewers(document.id) == {owner_id, alice_id, bob_id}
+
+        db.session.delete(db.session.get(GroupMember, (group.id, alice_id)))
+        db.session.commit()
+        assert _viewers(document.id) == {owner_id, bob_id}
+
+        group.delete()
+        assert _viewers(document.id) == {owner_id}
+        assert DocumentShare.for_document(document.id) == []
+
+def test_visible_listing_is_paginated_over_owned_shared_and_public(share_app, token):
+    """Test the share API and the shared and visible listing scopes."""
+    client = share_app.test_client()
+    with share_app.app_context():
+        owner_id, alice_id, bob_id = _users()
+        shared = _document(owner_id, 'Shared').id
+        _document(owner_id, 'Private')
+        public = _document(bob_id, 'Public', access_level='public').id
+        own = _document(alice_id, 'Own').id
+
+    as_owner, as_alice = token('owner'), token('alice')
+    response = client.post(f'/api/v1/documents/{shared}/shares', json={'user_id': alice_id}, headers=as_owner)
+    assert response.status_code == 201
+    assert client.post(
+        f'/api/v1/documents/{shared}/shares', json={'user_id': alice_id}, headers=as_owner
+    ).status_code == 409
+    assert client.post(
+        f'/api/v1/documents/{shared}/shares', json={'user_id': bob_id}, headers=as_alice
+    ).status_code == 403
+    assert client.post(
+        f'/api/v1/documents/{shared}/shares', json={'user_id': bob_id, 'group_id': 1}, headers=as_owner
+    ).status_code == 422
+
+    def listing(scope, **params):
+        response = client.get('/api/v1/documents', query_string={'scope': scope, **params}, headers=as_alice)
+        assert response.status_code == 200
+        return response.get_json()
+
+    assert [d['id'] for d in listing('shared')['documents']] == [shared]
+    visible = listing('visible')
+    assert [d['id'] for d in visible['documents']] == [own, public, shared]
+    assert visible['documents'][2]['access_level'] == 'shared'
+    page = listing('visible', per_page=2, page=2)
+    assert [d['id'] for d in page['documents']] == [shared]
+    assert page['pagination']['total'] == 3 and page['pagination']['pages'] == 2
+    assert client.get(
+        '/api/v1/documents', query_string={'scope': 'visible', 'query': 'x'}, headers=as_alice
+    ).status_code == 422
+
+    share_id = response.get_json()['share']['id']
+    assert client.delete(f'/api/v1/documents/{shared}/shares/{share_id}', headers=as_owner).status_code == 200
+    assert listing('shared')['documents'] == []
+
+def test_rebuild_recreates_the_index(share_app):
+    """Test the rebuild command's method restores rows and drops stale ones."""
+    with share_app.app_context():
+        owner_id, alice_id, _ = _users()
+        document = _document(owner_id, 'Shared', access_level='shared')
+        DocumentShare(document_id=document.id, grantee_user_id=alice_id, granted_by=owner_id).save()
+        _document(alice_id, 'Public', access_level='public')
+        before = set(db.session.execute(db.select(DocumentVisibility.viewer_id, DocumentVisibility.document_id)))
+
+        db.session.execute(db.delete(DocumentVisibility))
+        db.session.execute(db.insert(DocumentVisibility).values(
+            viewer_id=alice_id, document_id=999, owner_id=owner_id, document_type='invoice',
+            is_latest=True, created_at=document.created_at
+        ))
+        db.session.commit()
+
+        assert DocumentVisibility.rebuild(batch_size=1) == 2
+        after = set(db.session.execute(db.select(DocumentVisibility.viewer_id, DocumentVisibility.document_id)))
+        assert after == before
+
+@pytest.fixture
+def share_app(make_app):
+    """Create an app on SQLite with a fake Redis and three users."""
+    app = make_app()
+
+    with app.app_context():
+        for name in ('owner', 'alice', 'bob'):
+            User(email=f'{name}@example.com', username=name, password_hash='x').save()
+
+    return app
+
+@pytest.fixture
+def token(share_app):
+    """Return a function building an authorization header for a username."""
+    def build(username):
+        with share_app.app_context():
+            user_id = User.get_by_username(username).id
+            return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+    return build
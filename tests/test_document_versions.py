@@ -0,0 +1,107 @@
+import io
+import pytest
+from werkzeug.datastructures import FileStorage
+from app.database.base import db
+from app.models.document import Document
+from app.models.user import User
+
+def _upload(name):
+    return FileStorage(io.BytesIO(b'statement'), filename=name, content_type='application/pdf')
+
+def test_versions_share_root_and_single_latest(versions_app):
+    """Test create_version extends the chain and moves the latest flag."""
+    with versions_app.app_context():
+        original = Document.query.filter_by(title='Statement').first()
+        assert original.root_id == original.id and original.is_latest
+
+        second = original.create_version(_upload('v2.pdf'))
+        # Versioning from a stale row still appends after the current head
+        third = original.create_version(_upload('v3.pdf'))
+
+        assert (second.root_id, third.root_id) == (original.id, original.id)
+        assert (third.version, third.parent_id) == (3, second.id)
+        assert [d.version for d in original.get_history()] == [3, 2, 1]
+        assert [d.is_latest for d in original.get_history()] == [True, False, False]
+        assert Document.get_latest_version(original.id).id == third.id
+
+def test_latest_only_search(versions_app):
+    """Test the latest-only listing hides superseded versions."""
+    with versions_app.app_context():
+        original = Document.query.filter_by(title='Statement').first()
+        original.create_version(_upload('v2.pdf'))
+
+        everything = Document.search(None, user_id=original.owner_id)
+        latest = Document.search(None, user_id=original.owner_id, latest_only=True)
+        assert everything.total == 2
+        assert [d.version for d in latest.items] == [2]
+
+def test_removing_the_head_promotes_the_previous_version(versions_app):
+    """Test deleting or deactivating the latest version hands the flag to the newest remaining one."""
+    with versions_app.app_context():
+        original = Document.query.filter_by(title='Statement').first()
+        second = original.create_version(_upload('v2.pdf'))
+        third = second.create_version(_upload('v3.pdf'))
+
+        third.delete()
+        assert Document.get_latest_version(original.id).id == second.id
+        assert [d.version for d in Document.search(None, user_id=original.owner_id, latest_only=True).items] == [2]
+
+        second.update(is_active=False)
+        assert not second.is_latest
+        assert Document.get_latest_version(original.id).id == original.id
+
+        # Removing an older version leaves the head alone
+        newest = original.create_version(_upload('v4.pdf'))
+        assert (newest.version, newest.parent_id) == (3, original.id)
+        second.delete()
+        assert Document.get_latest_version(original.id).id == newest.id
+        assert [(d.version, d.is_latest) for d in original.get_history()] == [(3, True), (1, False)]
+
+def test_backfill_builds_lineage_for_legacy_rows(versions_app):
+    """Test the backfill command fills root_id and is_latest from parent_id."""
+    with versions_app.app_context():
+        original = Document.query.filter_by(title='Statement').first()
+        second = original.create_version(_upload('v2.pdf'))
+        third = second.create_version(_upload('v3.pdf'))
+        ids = (original.id, second.id, third.id)
+        db.session.execute(db.update(Document).values(root_id=None, is_latest=True))
+        db.session.commit()
+
+    result = versions_app.test_cli_runner().invoke(args=['versions', 'backfill'])
+    assert 'chains=1' in result.output
+
+    with versions_app.app_context():
+        rows = [db.session.get(Document, id) for id in ids]
+        assert [row.root_id for row in rows] == [ids[0]] * 3
+        assert [row.is_latest for row in rows] == [False, False, True]
+
+        # A deactivated top version and two rows sharing the next one down
+        fourth = rows[2].create_version(_upload('v4.pdf'))
+        ids += (fourth.id,)
+        db.session.execute(db.update(Document).where(Document.id == ids[2]).values(is_active=False))
+        db.session.execute(db.update(Document).where(Document.id == fourth.id).values(version=2))
+        db.session.execute(db.update(Document).values(is_latest=True))
+        db.session.commit()
+
+    result = versions_app.test_cli_runner().invoke(args=['versions', 'backfill'])
+    assert 'chains=1' in result.output
+
+    with versions_app.app_context():
+        rows = [db.session.get(Document, id) for id in ids]
+        assert [row.is_latest for row in rows] == [False, False, False, True]
+
+@pytest.fixture
+def versions_app(make_app):
+    """Create an app on SQLite with one uploaded document."""
+    app = make_app()
+
+    with app.app_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        Document(
+            title='Statement',
+            document_type='bank_statement',
+            owner_id=owner.id,
+            file=_upload('v1.pdf')
+        ).save()
+
+    return app
@@ -0,0 +1,109 @@
+import io
+import pytest
+from flask import url_for
+from flask_jwt_extended import create_access_token
+from werkzeug.datastructures import FileStorage
+from app.models.document import Document
+from app.models.user import User
+from app.services.download_links import accel_redirect_uri, sign_download, verify_download
+from app.services.storage import get_storage
+
+def test_links_are_bound_to_document_user_and_expiry(link_app):
+    """Test a signature only verifies for its own document, user and expiry, before it expires."""
+    with link_app.app_context():
+        link = sign_download(7, 3, now=1000)
+        assert link['expires'] == 1060
+        assert verify_download(7, 3, link['expires'], link['signature'], now=1059)
+        assert not verify_download(7, 3, link['expires'], link['signature'], now=1061)
+        assert not verify_download(8, 3, link['expires'], link['signature'], now=1000)
+        assert not verify_download(7, 4, link['expires'], link['signature'], now=1000)
+        assert not verify_download(7, 3, link['expires'] + 600, link['signature'], now=1000)
+        assert not verify_download(7, 3, link['expires'], None, now=1000)
+
+def test_accel_uri_only_for_files_under_the_upload_folder(link_app, tmp_path):
+    """Test internal URIs are relative to UPLOAD_FOLDER and quoted."""
+    with link_app.app_context():
+        folder = link_app.config['UPLOAD_FOLDER']
+        assert accel_redirect_uri(f'{folder}/ab/cd/1_invoice x.pdf') == '/protected-files/ab/cd/1_invoice%20x.pdf'
+        assert accel_redirect_uri(str(tmp_path / 'elsewhere.pdf')) is None
+        assert accel_redirect_uri(None) is None
+        link_app.config['DOWNLOAD_ACCEL_PREFIX'] = None
+        assert accel_redirect_uri(f'{folder}/a.pdf') is None
+
+def test_signed_link_is_served_by_nginx_without_a_token(link_app, auth):
+    """Test issuing a link, then downloading through X-Accel-Redirect or Python."""
+    client = link_app.test_client()
+    with link_app.app_context():
+        document = Document.query.first()
+        document_id, file_path = document.id, document.file_path
+
+    response = client.post(f'/api/v1/documents/{document_id}/download-url', headers=auth)
+    assert response.status_code == 201
+    url = response.get_json()['url']
+    assert url.startswith(f'/api/v1/documents/{document_id}/file?')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f'/protected-files/{file_path}'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="Statement.pdf"'
+    assert response.mimetype == 'application/pdf'
+    assert response.data == b''
+
+    link_app.config['DOWNLOAD_ACCEL_PREFIX'] = None
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'X-Accel-Redirect' not in response.headers
+    assert response.data == b'statement body'
+
+    assert client.get(url.replace('signature=', 'signature=x')).status_code == 403
+    assert client.get(f'/api/v1/documents/{document_id}/file').status_code == 403
+
+    with link_app.app_context():
+        Document.get_by_id(document_id).delete()
+    assert client.get(url).status_code == 404
+
+def test_compressed_files_are_streamed_instead_of_handed_to_nginx(make_app):
+    """Test a compressed file skips X-Accel-Redirect and is decompressed by the app."""
+    app = make_app(
+        DOWNLOAD_URL_TTL=60, DOWNLOAD_ACCEL_PREFIX='/protected-files/', STORAGE_COMPRESSION={'pdf': 'zlib:6'}
+    )
+    body = b'statement line\n' * 1000
+    with app.test_request_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        document = Document(
+            title='Statement',
+            document_type='bank_statement',
+            owner_id=owner.id,
+            file=FileStorage(io.BytesIO(body), filename='s.pdf', content_type='application/pdf')
+        ).save()
+        assert get_storage().stored_size(document.file_path) < len(body)
+        link = sign_download(document.id, owner.id)
+        url = url_for('documents.download_signed', document_id=document.id, **link)
+
+    response = app.test_client().get(url)
+    assert response.status_code == 200
+    assert 'X-Accel-Redirect' not in response.headers
+    assert response.data == body
+
+@pytest.fixture
+def link_app(make_app):
+    """Create an app on SQLite with a fake Redis and one stored document."""
+    app = make_app(DOWNLOAD_URL_TTL=60, DOWNLOAD_ACCEL_PREFIX='/protected-files/')
+
+    with app.app_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        Document(
+            title='Statement',
+            document_type='bank_statement',
+            owner_id=owner.id,
+            file=FileStorage(io.BytesIO(b'statement body'), filename='s.pdf', content_type='application/pdf')
+        ).save()
+
+    return app
+
+@pytest.fixture
+def auth(link_app):
+    """Create an authorization header for the owner."""
+    with link_app.app_context():
+        token = create_access_token(identity='1')
+    return {'Authorization': f'Bearer {token}'}
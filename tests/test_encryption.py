@@ -0,0 +1,75 @@
+import io
+import os
+import pytest
+from app.services.encryption import EncryptedStorage, HEADER, TAG_SIZE
+from app.services.storage import LocalStorage, StorageError
+
+KEY = bytes(range(32))
+SEGMENT = 1024
+
+def _storage(tmp_path):
+    return EncryptedStorage(LocalStorage(str(tmp_path)), KEY, segment_size=SEGMENT)
+
+@pytest.mark.parametrize('size', [0, 1, SEGMENT, 3 * SEGMENT, 3 * SEGMENT + 17])
+def test_roundtrip(tmp_path, size):
+    """Test files of every segment alignment decrypt to the original bytes."""
+    storage = _storage(tmp_path)
+    content = os.urandom(size)
+
+    assert storage.save('a.pdf', io.BytesIO(content)) == size
+    assert storage.size('a.pdf') == size
+    with storage.open('a.pdf') as fh:
+        assert fh.read() == content
+
+    on_disk = (tmp_path / 'a.pdf').read_bytes()
+    assert len(on_disk) == HEADER.size + size + max(1, -(-size // SEGMENT)) * TAG_SIZE
+    assert size < 16 or content[:16] not in on_disk
+    assert storage.local_path('a.pdf') is None
+
+def test_range_read_decrypts_only_covering_segments(tmp_path, monkeypatch):
+    """Test seeking into a file decrypts just the segments that are read."""
+    storage = _storage(tmp_path)
+    content = os.urandom(10 * SEGMENT)
+    storage.save('a.pdf', io.BytesIO(content))
+
+    with storage.open('a.pdf') as fh:
+        reader = fh.raw
+        loaded = []
+        original = reader._load
+        monkeypatch.setattr(reader, '_load', lambda index: (loaded.append(index), original(index)))
+        fh.seek(5 * SEGMENT + 100)
+        assert fh.read(SEGMENT) == content[5 * SEGMENT + 100:6 * SEGMENT + 100]
+
+    assert loaded == [5, 6]
+
+def test_tampering_is_detected(tmp_path):
+    """Test modified or truncated ciphertext fails authentication."""
+    storage = _storage(tmp_path)
+    storage.save('a.pdf', io.BytesIO(os.urandom(3 * SEGMENT)))
+    path = tmp_path / 'a.pdf'
+    data = bytearray(path.read_bytes())
+
+    data[HEADER.size + 10] ^= 1
+    path.write_bytes(bytes(data))
+    with storage.open('a.pdf') as fh, pytest.raises(StorageError):
+        fh.read()
+
+    data[HEADER.size + 10] ^= 1
+    path.write_bytes(bytes(data[:-(SEGMENT + TAG_SIZE)]))
+    with storage.open('a.pdf') as fh, pytest.raises(StorageError):
+        fh.read()
+
+def test_plaintext_files_are_served_until_encrypted(tmp_path):
+    """Test files written before encryption was enabled stay readable."""
+    LocalStorage(str(tmp_path)).save('old.pdf', io.BytesIO(b'legacy statement'))
+    storage = _storage(tmp_path)
+
+    assert not storage.is_encrypted('old.pdf')
+    with storage.open('old.pdf') as fh:
+        assert fh.read() == b'legacy statement'
+
+    with storage.inner.open('old.pdf') as fh:
+        storage.save('old.pdf', fh)
+    assert storage.is_encrypted('old.pdf')
+    with storage.open('old.pdf') as fh:
+        assert fh.read() == b'legacy statement'
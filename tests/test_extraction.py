@@ -0,0 +1,58 @@
+import zipfile
+from io import BytesIO
+from app.services.extraction import extract, extract_fields
+
+WORD_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+def _zip(files):
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+def test_extract_docx_text_and_fields():
+    """Test paragraphs and financial fields are read from a DOCX file."""
+    data = _zip({'word/document.xml': (
+        f'<w:document xmlns:w="{WORD_NS}"><w:body>'
+        '<w:p><w:r><w:t>Invoice dated 2024-03-01</w:t></w:r></w:p>'
+        '<w:p><w:r><w:t>Account no. 1234-5678 total $1,250.00</w:t></w:r></w:p>'
+        '</w:body></w:document>'
+    )})
+    result = extract('docx', data)
+
+    assert result['status'] == 'done'
+    assert result['text'].splitlines() == ['Invoice dated 2024-03-01', 'Account no. 1234-5678 total $1,250.00']
+    assert result['fields']['dates'] == ['2024-03-01']
+    assert result['fields']['amounts'] == ['$1,250.00']
+    assert result['fields']['account_numbers'] == ['1234-5678']
+
+def test_extract_xlsx_resolves_shared_strings():
+    """Test spreadsheet cells are read with shared strings resolved."""
+    data = _zip({
+        'xl/sharedStrings.xml': f'<sst xmlns="{SHEET_NS}"><si><t>Rent</t></si></sst>',
+        'xl/worksheets/sheet1.xml': (
+            f'<worksheet xmlns="{SHEET_NS}"><sheetData>'
+            '<row r="1"><c t="s"><v>0</v></c><c><v>950.00</v></c></row>'
+            '</sheetData></worksheet>'
+        )
+    })
+    result = extract('xlsx', data)
+
+    assert result['text'] == 'Rent\t950.00'
+    assert result['page_count'] == 1
+
+def test_extract_marks_corrupt_files_failed():
+    """Test a corrupt file is recorded as failed instead of raising."""
+    result = extract('docx', b'not a zip file')
+
+    assert result['status'] == 'failed'
+    assert result['error'].startswith('BadZipFile')
+
+def test_extract_fields_deduplicates():
+    """Test repeated values are reported once."""
+    fields = extract_fields('paid 10.00 then 10.00 and 20.50')
+
+    assert fields['amounts'] == ['10.00', '20.50']
+    assert fields['word_count'] == 6
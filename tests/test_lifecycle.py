@@ -0,0 +1,64 @@
+import importlib.util
+import os
+from types import SimpleNamespace
+import pytest
+from app.core.lifecycle import prepare_for_fork, reset_after_fork, warm_up
+from app.database.base import db
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+def _gunicorn_conf(monkeypatch, preload):
+    monkeypatch.setenv('GUNICORN_PRELOAD', '1' if preload else '0')
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONF_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_health_reports_starting_between_fork_and_warm_up(lifecycle_app):
+    """Test a forked worker answers 503 on /health until its pools are warm."""
+    client = lifecycle_app.test_client()
+    assert client.get('/health').status_code == 200
+
+    reset_after_fork(lifecycle_app)
+    assert lifecycle_app.redis.resets == 1
+    response = client.get('/health')
+    assert response.status_code == 503
+    assert response.get_json() == {'status': 'starting'}
+
+    warm_up(lifecycle_app)
+    assert lifecycle_app.redis.calls['ping'] == 1
+    assert client.get('/health').get_json() == {'status': 'ok'}
+
+def test_gunicorn_hooks_reset_then_warm_each_worker(lifecycle_app, monkeypatch):
+    """Test post_fork resets a preloaded app and post_worker_init warms it."""
+    worker = SimpleNamespace(app=SimpleNamespace(wsgi=lambda: lifecycle_app))
+    disposed = []
+    with lifecycle_app.app_context():
+        for engine in db.engines.values():
+            monkeypatch.setattr(engine, 'dispose', lambda close=True: disposed.append(close))
+
+    conf = _gunicorn_conf(monkeypatch, preload=False)
+    conf.post_fork(None, worker)
+    assert lifecycle_app.config.get('WARMED_UP', True) and disposed == []
+
+    conf = _gunicorn_conf(monkeypatch, preload=True)
+    prepare_for_fork(lifecycle_app)
+    assert disposed == [True]
+    conf.post_fork(None, worker)
+    assert disposed == [True, False]
+    assert lifecycle_app.config['WARMED_UP'] is False
+
+    conf.post_worker_init(worker)
+    assert lifecycle_app.config['WARMED_UP'] is True
+
+@pytest.fixture
+def lifecycle_app(make_app, fake_redis):
+    """Create an app whose Redis client counts pings and pool resets."""
+    fake_redis.resets = 0
+
+    def reset():
+        fake_redis.resets += 1
+
+    fake_redis.reset_after_fork = reset
+    fake_redis.ping = lambda: True
+    return make_app(redis=fake_redis)
@@ -0,0 +1,97 @@
+import sys
+import threading
+import time
+from app.core.profiler import SamplingProfiler, collapse
+
+def _busy_handler(until):
+    while time.time() < until:
+        sum(range(100))
+
+def _serve(profiler, route, until):
+    """Stand in for a request thread tagged by the before_request hook."""
+    profiler.routes[threading.get_ident()] = route
+    try:
+        _busy_handler(until)
+    finally:
+        profiler.routes.pop(threading.get_ident(), None)
+
+def _wait(profiler):
+    while profiler.running is not None:
+        time.sleep(0.01)
+
+def test_collapse_renders_stack_root_first():
+    """Test stacks are module:function frames joined root first and capped in depth."""
+    def inner():
+        return sys._getframe()
+
+    stack = collapse(inner()).split(';')
+    assert stack[-1] == f'{__name__}:inner'
+    assert stack[-2] == f'{__name__}:test_collapse_renders_stack_root_first'
+    assert collapse(inner(), max_depth=2).split(';') == [
+        '[deeper]',
+        f'{__name__}:test_collapse_renders_stack_root_first',
+        f'{__name__}:inner'
+    ]
+
+def test_profile_samples_request_threads_by_route(fake_redis):
+    """Test only tagged threads are sampled and results are grouped by route."""
+    profiler = SamplingProfiler(fake_redis, min_interval=0.001)
+    profile = profiler.start(duration=1, interval=0.005)
+    assert profiler.start(duration=1, interval=0.005) is None
+
+    threads = [
+        threading.Thread(target=_serve, args=(profiler, route, profile['until']))
+        for route in ('documents.list_documents', 'auth.login')
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _wait(profiler)
+
+    lines = profiler.results(profile['id']).splitlines()
+    assert lines
+    routes = {line.split(';', 1)[0] for line in lines}
+    assert routes == {'documents.list_documents', 'auth.login'}
+    assert all(line.split(' ')[0].endswith(f'{__name__}:_busy_handler') for line in lines[:2])
+
+    only_login = profiler.results(profile['id'], route='auth.login').splitlines()
+    assert only_login and all(line.startswith('auth.login;') for line in only_login)
+    # Heaviest stack first, as "<stack> <count>"
+    counts = [int(line.rsplit(' ', 1)[1]) for line in lines]
+    assert counts == sorted(counts, reverse=True)
+
+def test_other_workers_pick_up_a_running_profile(fake_redis):
+    """Test a worker joins a profile started elsewhere on its next poll."""
+    redis_client = fake_redis
+    starter = SamplingProfiler(redis_client)
+    other = SamplingProfiler(redis_client, poll_interval=0)
+    profile = starter.start(duration=1, interval=0.01)
+
+    other.poll()
+    assert other.running is not None and other.running[0] == profile['id']
+    _wait(starter)
+    _wait(other)
+
+def test_requests_are_tagged_only_while_enabled(make_app):
+    """Test the request hooks record the endpoint and are absent when disabled."""
+    def build(enabled):
+        app = make_app(PROFILER_ENABLED=enabled, PROFILER_POLL_INTERVAL=3600)
+        seen = []
+
+        @app.route('/probe')
+        def probe():
+            profiler = app.extensions.get('profiler')
+            seen.append(profiler and profiler.routes.get(threading.get_ident()))
+            return 'ok'
+
+        app.test_client().get('/probe')
+        return app, seen
+
+    app, seen = build(True)
+    assert seen == ['probe']
+    assert app.extensions['profiler'].routes == {}
+
+    app, seen = build(False)
+    assert seen == [None]
+    assert 'profiler' not in app.extensions
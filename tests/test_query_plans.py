@@ -0,0 +1,250 @@
+"""EXPLAIN every hot query and check it uses the index it was built for."""
+import os
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import create_app
+from app.database.base import db
+from app.models.document import Document
+from app.models.document_facet import DocumentFacetCount
+from app.models.document_metadata import DocumentMetadataValue
+from app.models.document_share import DocumentVisibility
+from app.models.recent_view import RecentView
+from app.models.user import User
+
+OWNERS = 20
+DOCUMENTS_PER_OWNER = 150
+DOCUMENT_TYPES = ('bank_statement', 'invoice', 'tax_form', 'receipt', 'contract', 'other')
+
+# name -> (callable, table, expected index)
+HOT_QUERIES = {
+    'search': (
+        lambda: Document.search(None, user_id=3),
+        'documents', 'idx_documents_owner_active_created'
+    ),
+    'search_ids': (
+        lambda: Document.search_ids(None, user_id=3),
+        'documents', 'idx_documents_owner_active_created'
+    ),
+    'search_by_type': (
+        lambda: Document.search(None, user_id=3, document_type='invoice'),
+        'documents', 'idx_documents_owner_active_type_created'
+    ),
+    'search_latest_only': (
+        lambda: Document.search(None, user_id=3, latest_only=True),
+        'documents', 'idx_documents_owner_active_created'
+    ),
+    'user_documents': (
+        lambda: Document.get_user_documents(3),
+        'documents', 'idx_documents_owner_active_created'
+    ),
+    'metadata_filter': (
+        lambda: Document.search(None, user_id=3, metadata_filters=[('amount', 'number', 'gte', 500)]),
+        'document_metadata_values', 'idx_document_metadata_number'
+    ),
+    'visible_documents': (
+        lambda: DocumentVisibility.visible_ids(3),
+        'document_visibility', 'idx_document_visibility_viewer_created'
+    ),
+    'visible_documents_by_type': (
+        lambda: DocumentVisibility.visible_ids(3, document_type='invoice'),
+        'document_visibility', 'idx_document_visibility_viewer_type_created'
+    ),
+    'version_history': (
+        lambda: Document.get_by_id(1).get_history(),
+        'documents', 'idx_documents_root_version'
+    ),
+    'latest_version': (
+        lambda: Document.get_latest_version(1),
+        'documents', 'idx_documents_root_version'
+    ),
+    'recent_views': (
+        lambda: RecentView.get_user_recent_views(3),
+        'recent_views', 'idx_recent_views_user_time'
+    ),
+    'recent_view_lookup': (
+        lambda: RecentView.query.filter_by(user_id=3, document_id=5).first(),
+        'recent_views', 'uq_user_document'
+    ),
+    'facet_rollup': (
+        lambda: DocumentFacetCount.for_owner(3),
+        'document_facet_counts', 'PRIMARY'
+    ),
+    'user_directory': (
+        lambda: User.search_directory(role='user', is_verified=True),
+        'users', 'idx_users_role_verified_active_id'
+    ),
+    'user_directory_role': (
+        lambda: User.search_directory(role='admin'),
+        'users', 'idx_users_role_active_id'
+    ),
+    'user_by_email': (
+        lambda: User.get_by_email('owner3@example.com'),
+        'users', 'ix_users_email'
+    ),
+}
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(plan_app, name):
+    """Test the query uses its index with no full table scan or filesort."""
+    fn, table, index = HOT_QUERIES[name]
+    with plan_app.app_context():
+        steps = [step for plan in explain_queries(fn) for step in plan]
+
+    assert any(step['table'] == table and step['index'] == index for step in steps), steps
+    assert not [step for step in steps if step['full_scan']], steps
+    assert not [step for step in steps if step['filesort']], steps
+
+@pytest.mark.skipif(not os.getenv('QUERY_PLAN_DATABASE_URI', '').startswith('mysql'),
+                    reason='SQLite only uses LIKE ranges with case-sensitive matching')
+def test_directory_prefix_search_uses_range(plan_app):
+    """Test username prefix search is a range scan on the username index."""
+    with plan_app.app_context():
+        steps = [step for plan in explain_queries(lambda: User.search_directory(prefix='owner1')) for step in plan]
+
+    assert any(step['index'] == 'ix_users_username' for step in steps), steps
+    assert not [step for step in steps if step['full_scan'] or step['filesort']], steps
+
+def explain_queries(fn):
+    """Run fn, capture the SELECTs it issues and return their plans."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    with db.engine.connect() as conn:
+        return [explain(conn, statement, parameters) for statement, parameters in statements]
+
+def explain(conn, statement, parameters):
+    """Return plan steps as dicts with table, index, full_scan and filesort."""
+    tables = set(db.metadata.tables)
+    steps = []
+    if conn.dialect.name == 'mysql':
+        for row in conn.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings():
+            steps.append({
+                'table': row['table'],
+                'index': row['key'],
+                'full_scan': row['type'] == 'ALL' and row['table'] in tables,
+                'filesort': 'Using filesort' in (row['Extra'] or '')
+            })
+        return steps
+
+    for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+        detail = row[-1]
+        words = detail.split()
+        table = words[1] if words[0] in ('SCAN', 'SEARCH') else None
+        index = None
+        if ' INDEX ' in detail:
+            index = sqlite_index_name(conn, table, detail.split(' INDEX ', 1)[1].split()[0])
+        elif 'PRIMARY KEY' in detail:
+            index = 'PRIMARY'
+        steps.append({
+            'table': table,
+            'index': index,
+            'full_scan': words[0] == 'SCAN' and table in tables and index is None,
+            'filesort': detail.startswith('USE TEMP B-TREE FOR ORDER BY')
+        })
+    return steps
+
+def sqlite_index_name(conn, table, index):
+    """Name SQLite's automatic indexes after the constraint they enforce."""
+    if not index.startswith('sqlite_autoindex_'):
+        return index
+    origin = {row[1]: row[3] for row in conn.exec_driver_sql(f'PRAGMA index_list({table})')}
+    if origin.get(index) == 'pk':
+        return 'PRIMARY'
+    columns = [row[2] for row in conn.exec_driver_sql(f'PRAGMA index_info({index})')]
+    for constraint in db.metadata.tables[table].constraints:
+        if constraint.name and [column.name for column in constraint.columns] == columns:
+            return constraint.name
+    return index
+
+@pytest.fixture(scope='module')
+def plan_app(tmp_path_factory):
+    """Create an app on a seeded database with realistic row counts."""
+    uri = os.getenv('QUERY_PLAN_DATABASE_URI') or \
+        f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_ENGINE_OPTIONS': {}
+    })
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed()
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(db.text('ANALYZE'))
+        else:
+            for table in db.metadata.tables:
+                db.session.execute(db.text(f'ANALYZE TABLE {table}'))
+        db.session.commit()
+
+    return app
+
+def seed():
+    """Bulk insert users, documents with version chains, metadata and views."""
+    now = datetime(2024, 6, 1)
+    users, documents, values, views = [], [], [], []
+    document_id = 0
+    for owner_id in range(1, OWNERS + 1):
+        users.append({
+            'id': owner_id,
+            'email': f'owner{owner_id}@example.com',
+            'username': f'owner{owner_id}',
+            'password_hash': 'x',
+            'role': 'admin' if owner_id == 1 else 'user',
+            'is_verified': owner_id % 2 == 0,
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        })
+        for n in range(DOCUMENTS_PER_OWNER):
+            document_id += 1
+            # Every third document is the second version of the one before it
+            is_version = n % 3 == 2
+            documents.append({
+                'id': document_id,
+                'title': f'Document {document_id}',
+                'file_path': f'{document_id}.pdf',
+                'file_type': 'pdf',
+                'file_size': 1024,
+                'mime_type': 'application/pdf',
+                'document_type': DOCUMENT_TYPES[n % len(DOCUMENT_TYPES)],
+                'document_date': date(2024, 1, 1) + timedelta(days=n),
+                'owner_id': owner_id,
+                'is_confidential': n % 5 == 0,
+                'access_level': 'public' if n % 7 == 0 else 'private',
+                'version': 2 if is_version else 1,
+                'parent_id': document_id - 1 if is_version else None,
+                'root_id': document_id - 1 if is_version else document_id,
+                'is_latest': n % 3 != 1,
+                'created_at': now - timedelta(hours=n),
+                'updated_at': now,
+                'is_active': n % 10 != 0
+            })
+            values.append({'document_id': document_id, 'key': 'amount', 'value_number': n * 10})
+            if n < 60:
+                views.append({
+                    'user_id': owner_id,
+                    'document_id': document_id,
+                    'viewed_at': now - timedelta(minutes=n),
+                    'created_at': now,
+                    'updated_at': now,
+                    'is_active': True
+                })
+
+    db.session.execute(db.insert(User), users)
+    db.session.execute(db.insert(Document), documents)
+    db.session.execute(db.insert(DocumentMetadataValue), values)
+    db.session.execute(db.insert(RecentView), views)
+    db.session.commit()
+    DocumentFacetCount.rebuild()
+    DocumentVisibility.rebuild()
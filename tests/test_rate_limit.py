@@ -0,0 +1,72 @@
+import time
+import pytest
+from app.core import rate_limit
+from app.core.rate_limit import LeasedRedisStorage
+
+LOGIN_KEY = 'LIMITER/127.0.0.1/auth.login/5/1/minute'
+UPLOAD_KEY = 'LIMITER/127.0.0.1/documents.upload/1000/1/hour'
+
+@pytest.fixture
+def make_storage(fake_redis, monkeypatch):
+    """Return a factory for worker storages sharing one fake Redis.
+
+    The lease script runs in Python over the fake's counters and is counted
+    in fake_redis.calls['lease'].
+    """
+    windows = {}
+    monkeypatch.setattr(rate_limit.redis, 'from_url', lambda url, **options: fake_redis)
+    fake_redis.register_script = lambda script: None
+
+    def lease(keys, args):
+        fake_redis.calls['lease'] += 1
+        key, (unused, batch, expiry) = keys[0], args
+        if unused > 0 and fake_redis.exists(key):
+            fake_redis.incr(key, -unused)
+        total = fake_redis.incr(key, batch)
+        window_end = windows.setdefault(key, time.time() + expiry)
+        return [total, int((window_end - time.time()) * 1000)]
+
+    def build(**options):
+        storage = LeasedRedisStorage('leased+redis://localhost:6379/0', **options)
+        storage._lease_script = lease
+        return storage
+
+    return build
+
+def test_small_limits_are_counted_exactly_without_a_lease(make_storage, fake_redis):
+    """Test a limit too small to batch costs one call per hit and keeps no local state."""
+    storage = make_storage()
+
+    assert [storage.incr(LOGIN_KEY, 60) for _ in range(6)] == [1, 2, 3, 4, 5, 6]
+    assert fake_redis.calls['lease'] == 6
+    assert storage._leases == {}
+    assert storage.get(LOGIN_KEY) == 6
+
+def test_workers_stay_within_the_error_bound(make_storage, fake_redis):
+    """Test two workers never admit more than the limit, and at most a batch each fewer."""
+    workers = [make_storage(error_bound=0.02, sync_interval=60) for _ in range(2)]
+    batch = workers[0].lease_size(UPLOAD_KEY)
+    admitted, rejected = 0, 0
+    while rejected < 2 * len(workers):
+        for worker in workers:
+            if worker.incr(UPLOAD_KEY, 3600) <= 1000:
+                admitted += 1
+            else:
+                rejected += 1
+
+    assert batch == 20
+    assert 1000 - len(workers) * batch <= admitted <= 1000
+    # One call per batch, plus the calls that found the counter exhausted
+    assert fake_redis.calls['lease'] <= admitted / batch + rejected + len(workers)
+
+def test_leases_are_evicted_least_recently_used_first(make_storage):
+    """Test only max_leases keys keep a lease."""
+    storage = make_storage(max_leases=2)
+    keys = [f'LIMITER/10.0.0.{i}/documents.upload/1000/1/hour' for i in range(4)]
+
+    for key in keys:
+        storage.incr(key, 3600)
+    storage.incr(keys[2], 3600)
+    storage.incr(keys[0], 3600)
+
+    assert list(storage._leases) == [keys[2], keys[0]]
@@ -0,0 +1,77 @@
+import pytest
+from flask import Response
+from app.database.base import db
+from app.database.session import REPLICA_BIND_KEY, STICKY_COOKIE, STICKY_HEADER, mark_sticky
+from app.models.user import User
+
+def test_get_reads_from_replica(replica_app):
+    """Test GET requests are served from the replica."""
+    with replica_app.test_request_context('/api/v1/users', method='GET'):
+        assert User.get_by_username('replicauser') is not None
+        assert User.get_by_username('primaryuser') is None
+
+def test_write_requests_use_primary(replica_app):
+    """Test non-GET requests never touch the replica."""
+    with replica_app.test_request_context('/api/v1/users', method='POST'):
+        assert User.get_by_username('primaryuser') is not None
+        assert User.get_by_username('replicauser') is None
+
+def test_read_your_writes_stickiness(replica_app):
+    """Test a caller is pinned to the primary right after a write, without a Redis lookup."""
+    router = replica_app.extensions['replica_router']
+    with replica_app.test_request_context('/api/v1/documents', method='POST'):
+        response = router.after_request(Response(status=201))
+    token = response.headers[STICKY_HEADER]
+    assert f'{STICKY_COOKIE}={token}' in response.headers['Set-Cookie']
+
+    for headers in ({STICKY_HEADER: token}, {'Cookie': f'{STICKY_COOKIE}={token}'}):
+        with replica_app.test_request_context('/api/v1/users', method='GET', headers=headers):
+            assert User.get_by_username('primaryuser') is not None
+    # Another caller's marker does not pin this one
+    with replica_app.test_request_context(
+        '/api/v1/users', method='GET', headers={STICKY_HEADER: token},
+        environ_base={'REMOTE_ADDR': '10.0.0.2'}
+    ):
+        assert User.get_by_username('replicauser') is not None
+    assert not replica_app.redis.calls
+
+def test_stickiness_expires_and_rejects_forged_markers(replica_app):
+    """Test expired or tampered markers send reads back to the replica."""
+    with replica_app.test_request_context('/api/v1/documents', method='POST'):
+        expired = mark_sticky(Response(), 'addr:127.0.0.1', now=0).headers[STICKY_HEADER]
+        fresh = mark_sticky(Response(), 'addr:127.0.0.1').headers[STICKY_HEADER]
+    forged = str(int(fresh.split('.')[0]) + 60) + '.' + fresh.split('.')[1]
+
+    for token in (expired, forged, 'garbage'):
+        with replica_app.test_request_context('/api/v1/users', method='GET', headers={STICKY_HEADER: token}):
+            assert User.get_by_username('replicauser') is not None
+
+def test_lagging_replica_falls_back_to_primary(replica_app):
+    """Test reads go to the primary when the replica is too far behind."""
+    router = replica_app.extensions['replica_router']
+    router.lag_probe = lambda engine: replica_app.config['REPLICA_MAX_LAG_SECONDS'] + 1
+    router._checked_at = 0.0
+
+    with replica_app.test_request_context('/api/v1/users', method='GET'):
+        assert User.get_by_username('primaryuser') is not None
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    """Create an app backed by two SQLite files standing in for primary and replica."""
+    app = make_app(SQLALCHEMY_REPLICA_URI=f"sqlite:///{tmp_path / 'replica.db'}")
+
+    with app.app_context():
+        db.metadata.create_all(bind=db.engines[REPLICA_BIND_KEY])
+
+        # Distinct rows in each database reveal which one served a query
+        User(email='p@example.com', username='primaryuser', password_hash='x').save()
+        with db.engines[REPLICA_BIND_KEY].begin() as conn:
+            conn.execute(db.insert(User), [{
+                'email': 'r@example.com',
+                'username': 'replicauser',
+                'password_hash': 'x',
+                'role': 'user',
+                'is_active': True
+            }])
+
+    return app
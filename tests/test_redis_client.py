@@ -0,0 +1,106 @@
+import pytest
+import redis
+from app.core.redis_client import CircuitBreaker, LocalFallback, RedisClient, RedisUnavailable
+
+class TimingOutRedis:
+    """Raw client whose commands all time out, counting the attempts."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            self.attempts += 1
+            raise redis.TimeoutError('timed out')
+        return fail
+
+def _client(raw, **breaker):
+    client = RedisClient('redis://localhost:6379/0', breaker=CircuitBreaker(**breaker))
+    client.raw = raw
+    return client
+
+def test_breaker_opens_on_failures_and_probes_once(monkeypatch):
+    """Test consecutive failures open the breaker and one probe decides when to close."""
+    clock = [100.0]
+    monkeypatch.setattr('app.core.redis_client.time.monotonic', lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, slow_call_threshold=0.1)
+
+    breaker.record(0.01, ok=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    # A slow success counts as a failure
+    breaker.record(0.5, ok=True)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock[0] += 10
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(0.5, ok=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(0.01, ok=True)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+def test_fallback_serves_cache_commands_with_ttl_and_eviction(monkeypatch):
+    """Test local values expire, the oldest key is evicted and delete counts keys."""
+    clock = [0.0]
+    monkeypatch.setattr('app.core.redis_client.time.monotonic', lambda: clock[0])
+    fallback = LocalFallback(max_keys=2)
+
+    fallback.set('a', 1, ex=5)
+    fallback.setex('b', 60, 'two')
+    assert fallback.mget(['a', 'b', 'c']) == [b'1', b'two', None]
+    clock[0] += 5
+    assert fallback.get('a') is None
+
+    fallback.set('c', 3)
+    fallback.set('d', 4)
+    assert sorted(fallback.scan_iter(match='*')) == ['c', 'd']
+    assert fallback.delete('c', 'missing') == 1
+
+def test_fallback_refuses_commands_that_need_shared_state():
+    """Test stickiness, generation and lock commands are not answered from one worker."""
+    fallback = LocalFallback()
+
+    for command in ('exists', 'incr', 'incrby'):
+        assert not hasattr(fallback, command)
+    with pytest.raises(RedisUnavailable):
+        fallback.set('lock', 'token', nx=True, px=5000)
+
+def test_timeouts_trip_the_breaker_onto_the_fallback():
+    """Test timed-out commands fall back, then skip Redis entirely once the breaker opens."""
+    raw = TimingOutRedis()
+    client = _client(raw, failure_threshold=2, reset_timeout=60)
+    client.fallback.set('key', 'local')
+
+    assert client.get('key') == b'local'
+    assert client.get('key') == b'local'
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    assert client.get('key') == b'local'
+    assert client.get_many(['key', 'other']) == [b'local', None]
+    with pytest.raises(RedisUnavailable):
+        client.exists('db:sticky:user:1')
+    with pytest.raises(RedisUnavailable):
+        client.incr('documents:gen:1')
+    with pytest.raises(RedisUnavailable):
+        client.set('lock', 'token', nx=True)
+    assert raw.attempts == 2
+
+def test_pipeline_helpers(fake_redis):
+    """Test batches go out in one pipeline and fall back when Redis is down."""
+    client = _client(fake_redis)
+
+    client.set_many({'a': 1, 'b': 2}, ttl=30)
+    assert fake_redis.calls['pipeline'] == 1
+    assert client.get_many(['a', 'b', 'c']) == [1, 2, None]
+    assert client.get_many([]) == []
+    assert client.pipelined(lambda pipe: (pipe.incr('n'), pipe.incr('n'))) == [1, 2]
+
+    client.raw = TimingOutRedis()
+    assert client.pipelined(lambda pipe: pipe.get('a'), fallback=lambda: 'fallback') == 'fallback'
+    with pytest.raises(redis.TimeoutError):
+        client.pipelined(lambda pipe: pipe.get('a'))
+    client.set_many({'c': 3})
+    assert client.fallback.get('c') == b'3'
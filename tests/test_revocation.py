@@ -0,0 +1,76 @@
+import os
+import time
+import uuid
+from flask_jwt_extended import create_access_token, create_refresh_token
+from app.core.revocation import REVOKED_KEY, BloomFilter, RevocationList
+from app.models.user import User
+
+def _revocations(client):
+    revocations = RevocationList(client, 'redis://unused')
+    # Stand in for the listener thread
+    revocations._listener.running = (None, os.getpid())
+    revocations.sync()
+    return revocations
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test every added item is found and false positives stay near the target rate."""
+    bloom = BloomFilter(10000, error_rate=0.01)
+    added = [uuid.uuid4().hex for _ in range(10000)]
+    for item in added:
+        bloom.add(item)
+
+    assert all(item in bloom for item in added)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300
+
+def test_valid_tokens_skip_redis(fake_redis):
+    """Test tokens missing from the filter are accepted without a lookup."""
+    client = fake_redis
+    revocations = _revocations(client)
+    revocations.revoke('revoked-jti', time.time() + 60)
+
+    assert revocations.is_revoked('revoked-jti') is True
+    assert client.calls['zscore'] == 1
+    assert all(not revocations.is_revoked(uuid.uuid4().hex) for _ in range(1000))
+    assert client.calls['zscore'] < 10
+    assert client.published == ['revoked-jti']
+
+def test_sync_picks_up_other_workers_revocations(fake_redis):
+    """Test a resync loads revocations made elsewhere and drops expired ones."""
+    client = fake_redis
+    revocations = _revocations(client)
+    client.zsets[REVOKED_KEY] = {'other-worker': time.time() + 60, 'expired': time.time() - 1}
+
+    assert not revocations.might_be_revoked('other-worker')
+    revocations.sync()
+    assert revocations.is_revoked('other-worker')
+    assert not revocations.is_revoked('expired')
+
+def test_filter_hits_fail_closed_when_redis_is_down(fake_redis, broken_redis):
+    """Test a known revoked token stays rejected while Redis is unavailable."""
+    revocations = _revocations(fake_redis)
+    revocations.revoke('revoked-jti', time.time() + 60)
+    revocations.redis = broken_redis
+
+    assert revocations.is_revoked('revoked-jti') is True
+    assert revocations.is_revoked(uuid.uuid4().hex) is False
+
+def test_logout_revokes_access_and_refresh_tokens(make_app, fake_redis):
+    """Test tokens presented to logout are rejected afterwards."""
+    app = make_app()
+    app.extensions['revocation'] = _revocations(fake_redis)
+    with app.app_context():
+        user = User(email='o@example.com', username='owner', password_hash='x').save()
+        access = create_access_token(identity=str(user.id))
+        refresh = create_refresh_token(identity=str(user.id))
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {access}'}
+
+    assert client.get('/api/v1/auth/me', headers=headers).status_code == 200
+    response = client.post('/api/v1/auth/logout', json={'refresh_token': refresh}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get('/api/v1/auth/me', headers=headers).status_code == 401
+    response = client.post('/api/v1/auth/refresh', headers={'Authorization': f'Bearer {refresh}'})
+    assert response.status_code == 401
+    assert response.get_json()['message'] == 'Token has been revoked'
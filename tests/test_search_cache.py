@@ -0,0 +1,98 @@
+import pytest
+from app.database.base import db
+from app.models.document import Document
+from app.models.document_content import DocumentContent
+from app.models.user import User
+from app.services.document_cache import get_search_ids, normalize_query, owner_generation
+
+def _document(owner_id, title):
+    return Document(
+        title=title, owner_id=owner_id, document_type='invoice',
+        file_path=f'{title}.pdf', file_type='pdf', file_size=1, mime_type='application/pdf'
+    ).save()
+
+def _search(owner_id, query, calls):
+    params = {'query': query, 'page': 1, 'per_page': 20, 'facets': False}
+
+    def load():
+        calls.append(query)
+        pagination = Document.search_ids(normalize_query(query), user_id=owner_id)
+        return {'ids': list(pagination.items), 'total': pagination.total}
+
+    return get_search_ids(owner_id, params, load)
+
+def test_equivalent_searches_share_one_cached_id_list(cache_app):
+    """Test case and spacing variants of a query hit the same entry of ids."""
+    with cache_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        calls = []
+        first = _search(owner_id, 'Invoice', calls)
+        assert _search(owner_id, '  invoice ', calls) == first
+        assert _search(owner_id, 'INVOICE', calls) == first
+        assert len(calls) == 1
+
+        assert first['total'] == 2
+        titles = [document.title for document in Document.get_many(first['ids'], owner_id=owner_id)]
+        assert titles == ['Invoice 2', 'Invoice 1']
+
+def test_document_writes_invalidate_the_owners_searches(cache_app):
+    """Test create, update and delete each make the next search recompute."""
+    with cache_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        calls = []
+        assert _search(owner_id, 'invoice', calls)['total'] == 2
+
+        created = _document(owner_id, 'Invoice 3')
+        assert _search(owner_id, 'invoice', calls)['total'] == 3
+        created.update(title='Receipt')
+        assert _search(owner_id, 'invoice', calls)['total'] == 2
+        Document.query.filter_by(title='Invoice 1').first().delete()
+        assert _search(owner_id, 'invoice', calls)['ids'] == [
+            Document.query.filter_by(title='Invoice 2').first().id
+        ]
+        assert len(calls) == 4
+
+def test_extracted_content_invalidates_the_owners_searches(cache_app):
+    """Test new content rows, which include_content searches read, bump the owner's generation."""
+    with cache_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        document_id = Document.query.filter_by(title='Invoice 1').first().id
+        before = owner_generation(owner_id)
+
+        db.session.add(DocumentContent(document_id=document_id, version=1, text='Payment received'))
+        db.session.commit()
+        assert owner_generation(owner_id) == before + 1
+
+        DocumentContent.query.filter_by(document_id=document_id).first().update(text='Refund')
+        assert owner_generation(owner_id) == before + 2
+
+def test_get_many_keeps_order_and_skips_missing_or_foreign(cache_app):
+    """Test rows come back in the cached order, without missing or other owners' ids."""
+    with cache_app.app_context():
+        owner_id = User.get_by_username('owner').id
+        other_id = User.get_by_username('other').id
+        mine = [document.id for document in Document.query.filter_by(owner_id=owner_id).order_by(Document.id)]
+        theirs = _document(other_id, 'Theirs').id
+
+        documents = Document.get_many([mine[1], 999, theirs, mine[0]], owner_id=owner_id)
+        assert [document.id for document in documents] == [mine[1], mine[0]]
+        assert Document.get_many([]) == []
+
+def test_normalize_query():
+    """Test blank queries collapse to None and others are trimmed and case-folded."""
+    assert normalize_query(None) is None
+    assert normalize_query('   ') is None
+    assert normalize_query(' Bank   STATEMENT ') == 'bank statement'
+
+@pytest.fixture
+def cache_app(make_app):
+    """Create an app on SQLite with a fake Redis and two invoices for one owner."""
+    app = make_app()
+
+    with app.app_context():
+        owner = User(email='o@example.com', username='owner', password_hash='x').save()
+        User(email='x@example.com', username='other', password_hash='x').save()
+        _document(owner.id, 'Invoice 1')
+        _document(owner.id, 'Invoice 2')
+
+    return app
@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select
+from app.database.base import db
+from app.database.sharding import ShardingError, create_shard_schema, move_owner, shard_of
+from app.models.document import Document
+from app.models.document_content import DocumentContent
+from app.models.document_facet import DocumentFacetCount
+from app.models.document_metadata import DocumentMetadataValue
+from app.models.recent_view import RecentView
+from app.models.user import User
+
+def _document(owner, title):
+    return Document(
+        title=title, owner_id=owner.id, document_type='invoice',
+        file_path=f'{title}.pdf', file_type='pdf', file_size=1, mime_type='application/pdf'
+    ).save()
+
+def _rows(shard_id, model):
+    """Count a model's rows stored on one shard, bypassing routing."""
+    with db.engines[shard_id].connect() as conn:
+        return conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+def _owner_on(sharding, shard_id):
+    """Return an owner whose hash placement is shard_id."""
+    return next(
+        user for user in User.query.order_by(User.id)
+        if sharding.map.default_shard(user.id) == shard_id
+    )
+
+def test_documents_are_written_to_their_owners_shard(sharded_app):
+    """Test documents and the rows that follow them land on the owner's shard."""
+    sharding = sharded_app.extensions['sharding']
+    with sharded_app.app_context():
+        first, second = _owner_on(sharding, 'shard0'), _owner_on(sharding, 'shard1')
+        document = _document(first, 'first')
+        _document(second, 'second')
+        RecentView.add_view(second.id, document.id)
+        # Found through the session's identity map, as extraction saves it
+        DocumentContent(document_id=document.id, version=1, text='first').save()
+
+        assert shard_of(document) == 'shard0'
+        assert sharding.ids.home_shard(document.id) == 'shard0'
+        assert (_rows('shard0', Document), _rows('shard1', Document)) == (1, 1)
+        assert _rows('shard1', RecentView) == 1
+        assert (_rows('shard0', DocumentContent), _rows('shard1', DocumentContent)) == (1, 0)
+        assert _rows('shard0', DocumentFacetCount) and _rows('shard1', DocumentFacetCount)
+        # Nothing sharded is written to the primary
+        with db.engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(Document.__table__)).scalar() == 0
+
+def test_owner_queries_hit_one_shard_and_others_scatter(sharded_app):
+    """Test owner-scoped and id lookups are routed; admin queries gather every shard."""
+    sharding = sharded_app.extensions['sharding']
+    with sharded_app.app_context():
+        first, second = _owner_on(sharding, 'shard0'), _owner_on(sharding, 'shard1')
+        ids = [_document(first, 'a').id, _document(first, 'b').id, _document(second, 'c').id]
+        first_id, second_id = first.id, second.id
+        db.session.expunge_all()
+
+        page = Document.get_user_documents(first_id)
+        assert page.total == 2 and {d.title for d in page.items} == {'a', 'b'}
+        assert Document.get_by_id(ids[2]).title == 'c'
+        assert DocumentFacetCount.for_owner(second_id)['document_type'] == {'invoice': 1}
+        assert sorted(d.title for d in Document.query.all()) == ['a', 'b', 'c']
+
+        assert sharding.shards_for_statement(
+            select(Document).where(Document.owner_id == first_id), Document.__mapper__
+        ) == ['shard0']
+        assert sharding.shards_for_statement(
+            select(Document).where(Document.title == 'a'), Document.__mapper__
+        ) == ['shard0', 'shard1']
+
+def test_scattered_queries_are_ordered_limited_and_counted_globally(sharded_app):
+    """Test unpinned pages merge every shard's rows before ORDER BY, OFFSET and LIMIT apply."""
+    sharding = sharded_app.extensions['sharding']
+    with sharded_app.app_context():
+        first, second = _owner_on(sharding, 'shard0'), _owner_on(sharding, 'shard1')
+        for title, owner in zip('abcdef', (first, second, first, second, second, first)):
+            _document(owner, title)
+        db.session.expunge_all()
+
+        ordered = Document.query.order_by(Document.title.desc())
+        assert [d.title for d in ordered.limit(3)] == ['f', 'e', 'd']
+        assert [d.title for d in ordered.offset(2).limit(3)] == ['d', 'c', 'b']
+        assert Document.query.count() == 6
+        assert db.session.scalars(
+            select(Document.id).where(Document.is_active.is_(True)).order_by(Document.title).limit(2)
+        ).all() == [d.id for d in Document.query.order_by(Document.title)][:2]
+
+        page = Document.query.order_by(Document.title).paginate(page=2, per_page=4, error_out=False)
+        assert page.total == 6 and [d.title for d in page.items] == ['e', 'f']
+
+        with pytest.raises(ShardingError):
+            db.session.execute(
+                select(Document.document_type, func.count()).group_by(Document.document_type).limit(5)
+            )
+
+def test_move_owner_keeps_documents_reachable(sharded_app):
+    """Test an owner's rows move shards and are still found by owner and id."""
+    sharding = sharded_app.extensions['sharding']
+    with sharded_app.app_context():
+        owner_id = _owner_on(sharding, 'shard0').id
+        document_id = _document(User.get_by_id(owner_id), 'moving').id
+        db.session.expunge_all()
+
+        move_owner(owner_id, 'shard1', settle=0)
+        db.session.expunge_all()
+
+        assert (_rows('shard0', Document), _rows('shard1', Document)) == (0, 1)
+        assert sharding.map.shard_for(owner_id) == 'shard1'
+        assert [d.id for d in Document.get_user_documents(owner_id).items] == [document_id]
+        document = Document.get_by_id(document_id)
+        assert shard_of(document) == 'shard1'
+        assert DocumentFacetCount.for_owner(owner_id)['document_type'] == {'invoice': 1}
+
+        # New rows follow the owner to the new shard
+        assert shard_of(_document(User.get_by_id(owner_id), 'after')) == 'shard1'
+
+def test_move_owner_keeps_writes_made_on_either_shard_while_settling(sharded_app, monkeypatch):
+    """Test the catch-up pass keeps newer target rows, applies source changes and drops source deletions."""
+    sharding = sharded_app.extensions['sharding']
+    documents, metadata = Document.__table__, DocumentMetadataValue.__table__
+    with sharded_app.app_context():
+        owner = _owner_on(sharding, 'shard0')
+        owner_id = owner.id
+        edited, stale, kept = (_document(owner, title).id for title in ('edited', 'stale', 'kept'))
+        with db.engines['shard0'].begin() as conn:
+            conn.execute(metadata.insert(), [
+                {'document_id': kept, 'key': 'removed', 'value_string': 'x'},
+                {'document_id': kept, 'key': 'unchanged', 'value_string': 'x'}
+            ])
+        db.session.expunge_all()
+
+        def settle(seconds):
+            later = datetime.utcnow() + timedelta(minutes=1)
+            # A worker still on the old map writes to the source...
+            with db.engines['shard0'].begin() as conn:
+                conn.execute(documents.update().where(documents.c.id.in_([edited, stale])).values(
+                    title='from source', updated_at=later
+                ))
+                conn.execute(metadata.delete().where(metadata.c.key == 'removed'))
+            # ...while the rest already write to the target
+            with db.engines['shard1'].begin() as conn:
+                conn.execute(documents.update().where(documents.c.id == stale).values(
+                    title='from target', updated_at=later + timedelta(minutes=1)
+                ))
+                conn.execute(metadata.insert().values(document_id=kept, key='added', value_string='y'))
+            _document(User.get_by_id(owner_id), 'new on target')
+
+        monkeypatch.setattr('app.database.sharding.time.sleep', settle)
+        move_owner(owner_id, 'shard1', settle=0)
+        db.session.expunge_all()
+
+        titles = {d.id: d.title for d in Document.query.filter_by(owner_id=owner_id)}
+        assert titles[edited] == 'from source'
+        assert titles[stale] == 'from target'
+        assert titles[kept] == 'kept' and len(titles) == 4
+        with db.engines['shard1'].connect() as conn:
+            keys = conn.execute(select(metadata.c.key).where(metadata.c.document_id == kept)).scalars()
+            assert sorted(keys) == ['added', 'unchanged']
+        assert DocumentFacetCount.for_owner(owner_id)['document_type'] == {'invoice': 4}
+        assert _rows('shard0', Document) == 0 and _rows('shard0', DocumentFacetCount) == 0
+
+@pytest.fixture
+def sharded_app(make_app, tmp_path):
+    """Create an app with a SQLite primary and two SQLite shards, and four owners."""
+    app = make_app(
+        SQLALCHEMY_SHARDS={
+            'shard0': f"sqlite:///{tmp_path / 'shard0.db'}",
+            'shard1': f"sqlite:///{tmp_path / 'shard1.db'}"
+        },
+        SHARD_ID_BLOCK=10
+    )
+
+    with app.app_context():
+        create_shard_schema()
+        for index in range(4):
+            User(email=f'o{index}@example.com', username=f'owner{index}', password_hash='x').save()
+        placements = {app.extensions['sharding'].map.default_shard(user.id) for user in User.query}
+        assert placements == {'shard0', 'shard1'}
+
+    return app
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+import pytest
+from app.core.singleflight import SingleFlight, CoalescingCache
+
+def test_singleflight_shares_one_call():
+    """Test concurrent callers for one key run the function once."""
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {'id': 1}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('doc:1', compute)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do('doc:1', compute))) for _ in range(8)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'id': 1}] * 9
+
+def test_singleflight_propagates_errors():
+    """Test a failed computation raises for the caller and is not remembered."""
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('doc:1', lambda: (_ for _ in ()).throw(ValueError('boom')))
+    assert flight.do('doc:1', lambda: 'ok') == 'ok'
+
+def test_cache_hit_skips_compute(fake_redis):
+    """Test a fresh entry is served without recomputing."""
+    cache = CoalescingCache(fake_redis, ttl=30)
+    calls = []
+    compute = lambda: calls.append(1) or 'payload'
+
+    assert cache.get_or_compute('doc:1', compute) == 'payload'
+    assert cache.get_or_compute('doc:1', compute) == 'payload'
+    assert len(calls) == 1
+
+def test_stale_entry_served_while_other_worker_recomputes(fake_redis):
+    """Test a stale value is returned when another worker holds the lock."""
+    client = fake_redis
+    cache = CoalescingCache(client)
+    client.data['cache:doc:1'] = json.dumps({'value': 'old', 'fresh_until': time.time() - 1})
+    client.data['cache:doc:1:lock'] = 'other-worker'
+
+    assert cache.get_or_compute('doc:1', lambda: 'new') == 'old'
+
+    del client.data['cache:doc:1:lock']
+    assert cache.get_or_compute('doc:1', lambda: 'new') == 'new'
+    assert 'cache:doc:1:lock' not in client.data
+
+def test_miss_waits_for_other_worker(fake_redis):
+    """Test a cold miss polls for the result instead of recomputing."""
+    client = fake_redis
+    cache = CoalescingCache(client, wait=2.0, poll_interval=0.01)
+    client.data['cache:doc:1:lock'] = 'other-worker'
+
+    def other_worker():
+        time.sleep(0.05)
+        client.data['cache:doc:1'] = json.dumps({'value': 'theirs', 'fresh_until': time.time() + 30})
+
+    threading.Thread(target=other_worker).start()
+    assert cache.get_or_compute('doc:1', lambda: 'mine') == 'theirs'
+
+def test_redis_errors_fall_back_to_computing(broken_redis):
+    """Test the cache still answers when Redis is unreachable."""
+    cache = CoalescingCache(broken_redis)
+    assert cache.get_or_compute('doc:1', lambda: 'payload') == 'payload'
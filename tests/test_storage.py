@@ -0,0 +1,98 @@
+import io
+import os
+import pytest
+from app.services.storage import (
+    LocalStorage,
+    ShardedLocalStorage,
+    MigratingStorage,
+    S3Storage,
+    StorageError,
+    migrate_file
+)
+
+def test_local_storage_roundtrip(tmp_path):
+    """Test saving, reading and deleting a file in the flat layout."""
+    storage = LocalStorage(str(tmp_path))
+    size = storage.save('1_invoice_a.pdf', io.BytesIO(b'statement'))
+
+    assert size == 9
+    assert storage.local_path('1_invoice_a.pdf') == os.path.join(str(tmp_path), '1_invoice_a.pdf')
+    with storage.open('1_invoice_a.pdf') as fh:
+        assert fh.read() == b'statement'
+
+    storage.delete('1_invoice_a.pdf')
+    assert not storage.exists('1_invoice_a.pdf')
+
+def test_local_storage_rejects_path_traversal(tmp_path):
+    """Test keys cannot escape the storage root."""
+    storage = LocalStorage(str(tmp_path))
+    with pytest.raises(StorageError):
+        storage.save('../escape.pdf', io.BytesIO(b'x'))
+
+def test_sharded_storage_layout(tmp_path):
+    """Test files are spread over two levels of hash directories."""
+    storage = ShardedLocalStorage(str(tmp_path))
+    storage.save('1_invoice_a.pdf', io.BytesIO(b'statement'))
+
+    relative = os.path.relpath(storage.local_path('1_invoice_a.pdf'), str(tmp_path))
+    first, second, name = relative.split(os.sep)
+    assert len(first) == 2 and len(second) == 2
+    assert name == '1_invoice_a.pdf'
+    assert storage.size('1_invoice_a.pdf') == 9
+
+def test_save_path_moves_file(tmp_path):
+    """Test a spooled upload is moved into place rather than copied."""
+    storage = ShardedLocalStorage(str(tmp_path / 'store'))
+    spooled = tmp_path / 'spool'
+    spooled.write_bytes(b'chunked upload')
+
+    assert storage.save_path('2_receipt_b.png', str(spooled)) == 14
+    assert not spooled.exists()
+    assert storage.exists('2_receipt_b.png')
+
+def test_migrating_storage_reads_both_writes_target(tmp_path):
+    """Test the migration backend serves old files while writing new ones to the target."""
+    source = LocalStorage(str(tmp_path))
+    target = ShardedLocalStorage(str(tmp_path))
+    source.save('old.pdf', io.BytesIO(b'old'))
+    storage = MigratingStorage(source, target)
+
+    storage.save('new.pdf', io.BytesIO(b'new'))
+
+    assert target.exists('new.pdf') and not source.exists('new.pdf')
+    with storage.open('old.pdf') as fh:
+        assert fh.read() == b'old'
+
+def test_migrate_file(tmp_path):
+    """Test migrating a file copies, verifies and optionally removes the source."""
+    source = LocalStorage(str(tmp_path))
+    target = ShardedLocalStorage(str(tmp_path))
+    source.save('old.pdf', io.BytesIO(b'old'))
+
+    assert migrate_file(source, target, 'old.pdf', delete_source=True) is True
+    assert target.exists('old.pdf') and not source.exists('old.pdf')
+    assert migrate_file(source, target, 'old.pdf') is False
+
+    with pytest.raises(FileNotFoundError):
+        migrate_file(source, target, 'absent.pdf')
+
+def test_s3_storage_roundtrip():
+    """Test the S3 backend against moto's in-process S3 stand-in."""
+    moto = pytest.importorskip('moto')
+    boto3 = pytest.importorskip('boto3')
+
+    with moto.mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='documents')
+        storage = S3Storage('documents', prefix='docs/', client=client)
+
+        assert storage.save('1_invoice_a.pdf', io.BytesIO(b'0123456789')) == 10
+        assert storage.exists('1_invoice_a.pdf')
+        assert storage.local_path('1_invoice_a.pdf') is None
+
+        with storage.open('1_invoice_a.pdf') as fh:
+            fh.seek(4)
+            assert fh.read(3) == b'456'
+
+        storage.delete('1_invoice_a.pdf')
+        assert not storage.exists('1_invoice_a.pdf')
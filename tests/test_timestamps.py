@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from app.database.base import db
+from app.database.timestamps import touch
+from app.models.user import User
+
+EARLIER = datetime(2024, 1, 1, 12, 0)
+
+def _stored(column):
+    return dict(db.session.execute(select(User.id, column).order_by(User.id)).all())
+
+def test_touches_are_buffered_and_written_in_one_batch(app):
+    """Test repeated touches collapse into one update per row on flush."""
+    coalescer = app.extensions['timestamps']
+    with app.app_context():
+        users = User.query.order_by(User.id).all()
+        for minutes in (1, 3, 2):
+            touch(users[0], 'last_login', EARLIER + timedelta(minutes=minutes))
+        touch(users[1], 'last_login', EARLIER)
+
+        assert users[1].last_login == EARLIER
+        assert not db.session.dirty
+        assert set(_stored(User.last_login).values()) == {None}
+        db.session.rollback()
+
+        assert coalescer.flush() == 2
+        assert _stored(User.last_login) == {
+            users[0].id: EARLIER + timedelta(minutes=3),
+            users[1].id: EARLIER,
+            users[2].id: None
+        }
+        # A touch is not an edit
+        assert set(_stored(User.updated_at).values()) == {EARLIER}
+
+def test_failed_flush_keeps_values_for_the_next_one(app, monkeypatch):
+    """Test a database error does not lose pending timestamps."""
+    coalescer = app.extensions['timestamps']
+    with app.app_context():
+        user = User.query.first()
+        touch(user, 'last_login', EARLIER)
+
+        def fail(*args):
+            raise RuntimeError('database unavailable')
+
+        monkeypatch.setattr(coalescer, '_write', fail)
+        assert coalescer.flush() == 0
+        monkeypatch.undo()
+
+        assert coalescer.flush() == 1
+        assert _stored(User.last_login)[user.id] == EARLIER
+
+@pytest.fixture
+def app(make_app):
+    """Create an app on SQLite with three users and flushing left to the tests."""
+    app = make_app(TIMESTAMP_FLUSH_INTERVAL=3600)
+
+    with app.app_context():
+        for name in ('a', 'b', 'c'):
+            User(
+                email=f'{name}@example.com', username=name, password_hash='x',
+                created_at=EARLIER, updated_at=EARLIER
+            ).save()
+
+    return app
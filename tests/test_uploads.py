@@ -0,0 +1,149 @@
+import hashlib
+import os
+import pytest
+from flask_jwt_extended import create_access_token
+from app.database.base import db
+from app.models.document import Document
+from app.models.upload_session import UploadSession, merge_ranges
+from app.models.user import User
+from app.services.storage import get_storage
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+def _start(client, headers, **overrides):
+    payload = {
+        'filename': 'statement.pdf',
+        'total_size': len(CONTENT),
+        'mime_type': 'application/pdf',
+        'sha256': hashlib.sha256(CONTENT).hexdigest(),
+        'title': 'Statement',
+        'document_type': 'bank_statement'
+    }
+    payload.update(overrides)
+    payload = {key: value for key, value in payload.items() if value is not None}
+    return client.post('/api/v1/uploads', json=payload, headers=headers)
+
+def _put(client, headers, upload_id, start, end, body=None, **extra):
+    chunk = CONTENT[start:end] if body is None else body
+    return client.put(
+        f'/api/v1/uploads/{upload_id}',
+        data=chunk,
+        headers={**headers, **extra, 'Content-Range': f'bytes {start}-{end - 1}/{len(CONTENT)}'}
+    )
+
+def _put_from(client, headers, upload_id, start):
+    for offset in range(start, len(CONTENT), 4096):
+        _put(client, headers, upload_id, offset, min(offset + 4096, len(CONTENT)))
+
+def test_merge_ranges():
+    """Test received ranges are merged when they touch or overlap."""
+    assert merge_ranges([[0, 10], [20, 30]], 10, 20) == [[0, 30]]
+    assert merge_ranges([[20, 30]], 0, 5) == [[0, 5], [20, 30]]
+    assert merge_ranges([[0, 10]], 5, 8) == [[0, 10]]
+
+def test_out_of_order_chunks_complete_into_document(upload_app, auth):
+    """Test chunks sent in any order assemble the original file."""
+    client = upload_app.test_client()
+    upload_id = _start(client, auth).get_json()['upload_id']
+
+    for start in (8192, 0, 4096):
+        response = _put(client, auth, upload_id, start, min(start + 4096, len(CONTENT)))
+        assert response.status_code == 200
+    assert response.get_json()['received_ranges'] == [[0, len(CONTENT)]]
+
+    response = client.post(f'/api/v1/uploads/{upload_id}/complete', headers=auth)
+    assert response.status_code == 201
+    document_id = response.get_json()['document']['id']
+
+    # Completing again returns the same document instead of a duplicate
+    again = client.post(f'/api/v1/uploads/{upload_id}/complete', headers=auth)
+    assert again.status_code == 200
+    assert again.get_json()['document']['id'] == document_id
+
+    with upload_app.app_context():
+        document = db.session.get(Document, document_id)
+        assert document.title == 'Statement' and document.file_size == len(CONTENT)
+        with get_storage().open(document.file_path) as fh:
+            assert fh.read() == CONTENT
+
+def test_bad_chunk_checksum_is_not_recorded(upload_app, auth):
+    """Test a chunk whose checksum does not match is rejected."""
+    client = upload_app.test_client()
+    upload_id = _start(client, auth).get_json()['upload_id']
+
+    response = _put(client, auth, upload_id, 0, 4096, **{'X-Chunk-SHA256': '0' * 64})
+    assert response.status_code == 422
+    assert client.get(f'/api/v1/uploads/{upload_id}', headers=auth).get_json()['received_bytes'] == 0
+
+    response = _put(client, auth, upload_id, 0, 4096, body=b'x' * 100)
+    assert response.status_code == 400
+
+def test_resume_reports_missing_ranges(upload_app, auth):
+    """Test an interrupted upload reports what is left and cannot complete early."""
+    client = upload_app.test_client()
+    upload_id = _start(client, auth).get_json()['upload_id']
+    _put(client, auth, upload_id, 0, 4096)
+
+    progress = client.get(f'/api/v1/uploads/{upload_id}', headers=auth).get_json()
+    assert progress['received_ranges'] == [[0, 4096]]
+    assert progress['status'] == 'uploading'
+
+    response = client.post(f'/api/v1/uploads/{upload_id}/complete', headers=auth)
+    assert response.status_code == 409
+
+    _put_from(client, auth, upload_id, 4096)
+    response = client.post(f'/api/v1/uploads/{upload_id}/complete', headers=auth)
+    assert response.status_code == 201
+
+def test_upload_as_new_version(upload_app, auth):
+    """Test an upload for an existing document becomes its next version."""
+    client = upload_app.test_client()
+    first = _start(client, auth).get_json()['upload_id']
+    _put_from(client, auth, first, 0)
+    original_id = client.post(f'/api/v1/uploads/{first}/complete', headers=auth).get_json()['document']['id']
+
+    second = _start(client, auth, document_id=original_id, title=None, document_type=None)
+    assert second.status_code == 201
+    upload_id = second.get_json()['upload_id']
+    _put_from(client, auth, upload_id, 0)
+    response = client.post(f'/api/v1/uploads/{upload_id}/complete', headers=auth)
+
+    document = response.get_json()['document']
+    assert response.status_code == 201
+    assert (document['version'], document['parent_id'], document['root_id']) == (2, original_id, original_id)
+
+def test_cleanup_removes_expired_sessions(upload_app, auth):
+    """Test the cleanup command deletes expired sessions and their files."""
+    client = upload_app.test_client()
+    upload_id = _start(client, auth).get_json()['upload_id']
+
+    with upload_app.app_context():
+        from app.services.uploads import partial_path
+        path = partial_path(upload_id)
+        upload = db.session.get(UploadSession, upload_id)
+        upload.expires_at = upload.created_at
+        upload.save()
+
+    result = upload_app.test_cli_runner().invoke(args=['uploads', 'cleanup'])
+    assert 'removed=1' in result.output
+    with upload_app.app_context():
+        assert db.session.get(UploadSession, upload_id) is None
+    assert not os.path.exists(path)
+
+@pytest.fixture
+def upload_app(make_app):
+    """Create an app on SQLite with small upload chunks."""
+    app = make_app(UPLOAD_CHUNK_SIZE=4096)
+
+    with app.app_context():
+        User(email='o@example.com', username='owner', password_hash='x').save()
+
+    return app
+
+@pytest.fixture
+def auth(upload_app):
+    """Create an authorization header for the document owner."""
+    with upload_app.app_context():
+        owner = User.query.filter_by(username='owner').first()
+        token = create_access_token(identity=str(owner.id))
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,63 @@
+import pytest
+from app.models.user import User
+
+def _walk(**filters):
+    """Return every page of a directory listing as lists of usernames."""
+    pages, cursor = [], None
+    while True:
+        users, cursor = User.search_directory(cursor=cursor, limit=3, **filters)
+        pages.append([user.username for user in users])
+        if cursor is None:
+            return pages
+
+def test_pages_follow_a_stable_cursor_to_the_last_page(directory_app):
+    """Test pages do not overlap, ignore rows added behind the cursor and end without a cursor."""
+    with directory_app.app_context():
+        first, cursor = User.search_directory(limit=3)
+        assert [user.username for user in first] == ['alice', 'bob', 'carol']
+        # The cursor names the last row seen, so it does not move
+        assert User.search_directory(limit=3)[1] == cursor
+
+        User.query.filter_by(username='alice').first().delete()
+        second, cursor = User.search_directory(cursor=cursor, limit=3)
+        assert [user.username for user in second] == ['dave', 'erin', 'frank']
+
+        last, cursor = User.search_directory(cursor=cursor, limit=3)
+        assert [user.username for user in last] == ['grace', 'adam', 'adele']
+        assert cursor is None
+
+def test_prefix_search_combined_with_role_filter(directory_app):
+    """Test prefix searches page by the searched column and respect role and verification."""
+    with directory_app.app_context():
+        assert _walk(prefix='a', role='admin') == [['adam', 'adele']]
+        assert _walk(prefix='a', role='admin', is_verified=True) == [['adele']]
+        assert _walk(prefix='@example.org', role='user') == [[]]
+        assert [user.email for user in User.search_directory(prefix='ad', role='admin')[0]] == [
+            'adam@example.com', 'adele@example.com'
+        ]
+        # Inactive users are never listed
+        assert _walk(prefix='g') == [['grace']]
+        assert _walk(role='admin') == [['adam', 'adele']]
+
+def test_cursor_must_match_the_ordering(directory_app):
+    """Test a cursor from an id-ordered listing is refused for a prefix search."""
+    with directory_app.app_context():
+        _, cursor = User.search_directory(limit=1)
+        with pytest.raises(ValueError):
+            User.search_directory(prefix='a', cursor=cursor)
+        with pytest.raises(ValueError):
+            User.search_directory(cursor='not-a-cursor')
+
+@pytest.fixture
+def directory_app(make_app):
+    """Create an app with seven users, two admins and one inactive account."""
+    app = make_app()
+
+    with app.app_context():
+        for name in ('alice', 'bob', 'carol', 'dave', 'erin', 'frank', 'grace'):
+            User(email=f'{name}@example.com', username=name, password_hash='x', is_verified=True).save()
+        User(email='adam@example.com', username='adam', password_hash='x', role='admin').save()
+        User(email='adele@example.com', username='adele', password_hash='x', role='admin', is_verified=True).save()
+        User(email='ghost@example.com', username='ghost', password_hash='x', role='admin', is_active=False).save()
+
+    return app